@@ -197,6 +197,7 @@ config.JobCreator.pollInterval = 120
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
 config.JobCreator.workerThreads = 1
+config.JobCreator.preloadDAOPackages = ["WMCore.WMBS"]
 # glidein restrictions used for resource estimation (per core)
 config.JobCreator.GlideInRestriction = {"MinWallTimeSecs": 1 * 60 * 60, "MaxWallTimeSecs": 45 * 60 * 60,   # pilot lifetime is usually 48h
                                         "MinRequestDiskKB": 1 * 1024 * 1024, "MaxRequestDiskKB": 20 * 1024 * 1024} # site limit is ~27GB
@@ -206,6 +207,7 @@ config.JobSubmitter.componentDir = config.General.workDir + "/JobSubmitter"
 config.JobSubmitter.logLevel = globalLogLevel
 config.JobSubmitter.maxThreads = 1
 config.JobSubmitter.pollInterval = 120
+config.JobSubmitter.useWakeup = False
 config.JobSubmitter.workerThreads = 1
 config.JobSubmitter.jobsPerWorker = 100
 config.JobSubmitter.maxJobsPerPoll = 1000
@@ -45,6 +45,62 @@ class AccountantWorkerException(WMException):
     """
 
 
+def createMissingFWKJR(errorCode = 999, errorDescription = 'Failure of unknown type'):
+    """
+    _createMissingFWKJR_
+
+    Create a report holding a single error for jobs whose framework job
+    report is missing or can't be loaded.
+    """
+    report = Report()
+    report.addError("cmsRun1", 84, errorCode, errorDescription)
+    report.data.cmsRun1.status = "Failed"
+    return report
+
+def loadJobReport(parameters):
+    """
+    _loadJobReport_
+
+    Given a framework job report on disk, load it and return a
+    FwkJobReport instance.  If there is any problem loading or parsing the
+    framework job report return a report describing the failure.
+
+    This doesn't touch the database so it can be run in the report loader
+    processes as well as in the accountant itself.
+    """
+    # The jobReportPath may be prefixed with "file://" which needs to be
+    # removed so it doesn't confuse the FwkJobReport() parser.
+    jobReportPath = parameters.get("fwjr_path", None)
+    if not jobReportPath:
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(99999, "FWJR path is empty")
+
+    jobReportPath = jobReportPath.replace("file://","")
+    if not os.path.exists(jobReportPath):
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
+
+    if os.path.getsize(jobReportPath) == 0:
+        logging.error("Empty FwkJobReport: %s" % jobReportPath)
+        return createMissingFWKJR(99998, 'jobReport of size 0: %s ' % jobReportPath)
+
+    jobReport = Report()
+
+    try:
+        jobReport.load(jobReportPath)
+    except Exception as ex:
+        msg =  "Error loading jobReport %s\n" % jobReportPath
+        msg += str(ex)
+        logging.error(msg)
+        logging.debug("Failing job: %s\n" % parameters)
+        return createMissingFWKJR(99997, 'Cannot load jobReport')
+
+    if len(jobReport.listSteps()) == 0:
+        logging.error("FwkJobReport with no steps: %s" % jobReportPath)
+        return createMissingFWKJR(99997, 'jobReport with no steps: %s ' % jobReportPath)
+
+    return jobReport
+
 class AccountantWorker(WMConnectionBase):
     """
     Class that actually does the work of parsing FWJRs for the Accountant
@@ -160,41 +216,9 @@ class AccountantWorker(WMConnectionBase):
         _loadJobReport_
 
         Given a framework job report on disk, load it and return a
-        FwkJobReport instance.  If there is any problem loading or parsing the
-        framework job report return None.
+        FwkJobReport instance.  See the module level loadJobReport().
         """
-        # The jobReportPath may be prefixed with "file://" which needs to be
-        # removed so it doesn't confuse the FwkJobReport() parser.
-        jobReportPath = parameters.get("fwjr_path", None)
-        if not jobReportPath:
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, "FWJR path is empty")
-
-        jobReportPath = jobReportPath.replace("file://","")
-        if not os.path.exists(jobReportPath):
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
-
-        if os.path.getsize(jobReportPath) == 0:
-            logging.error("Empty FwkJobReport: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
-
-        jobReport = Report()
-
-        try:
-            jobReport.load(jobReportPath)
-        except Exception as ex:
-            msg =  "Error loading jobReport %s\n" % jobReportPath
-            msg += str(ex)
-            logging.error(msg)
-            logging.debug("Failing job: %s\n" % parameters)
-            return self.createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
-
-        if len(jobReport.listSteps()) == 0:
-            logging.error("FwkJobReport with no steps: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
-
-        return jobReport
+        return loadJobReport(parameters)
 
     def isTaskExistInFWJR(self, jobReport, jobStatus):
         """
@@ -220,21 +244,28 @@ class AccountantWorker(WMConnectionBase):
 
         return
 
-    def __call__(self, parameters):
+    def __call__(self, parameters, jobReports = None):
         """
         __call__
 
         Handle a completed job.  The parameters dictionary will contain the job
-        ID and the path to the framework job report.
+        ID and the path to the framework job report.  Reports that were already
+        loaded (by the poller's loader processes) can be passed in jobReports,
+        keyed by job ID, the rest are loaded from disk here.
         """
         returnList = []
         self.reset()
 
+        if jobReports == None:
+            jobReports = {}
+
         for job in parameters:
             logging.info("Handling %s" % job["fwjr_path"])
 
             # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job)
+            fwkJobReport = jobReports.get(job["id"], None)
+            if fwkJobReport == None:
+                fwkJobReport = self.loadJobReport(job)
             fwkJobReport.setJobID(job['id'])
             
             jobSuccess = self.handleJob(jobID = job["id"],
@@ -372,23 +403,29 @@ class AccountantWorker(WMConnectionBase):
         self.dbsFilesToCreate.append(dbsFile)
         return
 
-    def findDBSParents(self, lfn):
+    def findDBSParents(self, lfns):
         """
         _findDBSParents_
 
-        Find the parent of the file in DBS
-        This is meant to be called recursively
+        Find the parents in DBS of a list of files, returned as a dictionary
+        of sets of parent lfns keyed by lfn.  The parentage of all the files
+        is walked together, one query per generation.
         """
-        parentsInfo = self.getParentInfoAction.execute([lfn],
+        newParents = dict([(lfn, set()) for lfn in lfns])
+        if len(newParents) == 0:
+            return newParents
+
+        parentsInfo = self.getParentInfoAction.execute(newParents.keys(),
                                                        conn = self.getDBConn(),
                                                        transaction = self.existingTransaction())
-        newParents = set()
+        grandParents = {}
         for parentInfo in parentsInfo:
+            childLFN = parentInfo["child_lfn"]
             # This will catch straight to merge files that do not have redneck
             # parents.  We will mark the straight to merge file from the job
             # as a child of the merged parent.
             if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
+                newParents[childLFN].add(parentInfo["lfn"])
 
             elif parentInfo['gpmerged'] == None:
                 continue
@@ -398,14 +435,18 @@ class AccountantWorker(WMConnectionBase):
             # not this file has any redneck children and update their parentage
             # information.
             elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
+                newParents[childLFN].add(parentInfo["gplfn"])
 
             # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
+            # And we have to go up another generation
             else:
-                parentSet = self.findDBSParents(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+                grandParents.setdefault(parentInfo['gplfn'], set()).add(childLFN)
+
+        if len(grandParents) > 0:
+            ancestors = self.findDBSParents(lfns = grandParents.keys())
+            for grandParentLFN, childLFNs in grandParents.items():
+                for childLFN in childLFNs:
+                    newParents[childLFN].update(ancestors[grandParentLFN])
 
         return newParents
 
@@ -620,10 +661,7 @@ class AccountantWorker(WMConnectionBase):
         Create a missing FWJR if the report can't be found by the code in the
         path location.
         """
-        report = Report()
-        report.addError("cmsRun1", 84, errorCode, errorDescription)
-        report.data.cmsRun1.status = "Failed"
-        return report
+        return createMissingFWKJR(errorCode, errorDescription)
 
     def createFilesInDBSBuffer(self):
         """
@@ -886,9 +924,9 @@ class AccountantWorker(WMConnectionBase):
         """
         outputLFNs = [f['lfn'] for f in self.mergedOutputFiles]
         bindList         = []
+        newParents = self.findDBSParents(lfns = outputLFNs)
         for lfn in outputLFNs:
-            newParents = self.findDBSParents(lfn = lfn)
-            for parentLFN in newParents:
+            for parentLFN in newParents[lfn]:
                 bindList.append({'child': lfn, 'parent': parentLFN})
 
         # Now all the parents should exist
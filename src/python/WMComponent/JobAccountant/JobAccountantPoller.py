@@ -3,18 +3,65 @@
 _JobAccountantPoller_
 
 Poll WMBS for complete jobs and process their framework job reports.
+
+If config.JobAccountant.nLoaderProcesses is set the framework job reports
+are loaded by a pool of loader processes: while the accountant worker is
+writing one slice of jobs to the database the loaders are already reading
+the reports for the next slice.  The loaders send the reports back packed
+(see WMCore.FwkJobReport.CompactReport), which the accountant decodes in a
+fraction of the time it takes to load or unpickle them.
 """
 
 import time
 import threading
 import logging
+import resource
+import Queue
+import multiprocessing
 
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Agent.Harness import Harness
 from WMCore.DAOFactory import DAOFactory
-from WMComponent.JobAccountant.AccountantWorker import AccountantWorker
+from WMCore.FwkJobReport.Report import Report
+from WMComponent.JobAccountant.AccountantWorker import AccountantWorker, loadJobReport
 from WMCore.WMException import WMException
 
+def reportLoader(workInput, results):
+    """
+    _reportLoader_
+
+    Loader process body.  Get jobs (dictionaries with the job id and the
+    fwjr_path) from the workInput queue, load their framework job reports
+    and put them, packed, in the results queue along with the memory
+    high-water mark of the loader.
+    """
+    while True:
+        try:
+            work = workInput.get()
+        except (EOFError, IOError):
+            crashMessage = "Hit EOF/IO in getting new work\n"
+            crashMessage += "Assuming this is a graceful break attempt.\n"
+            logging.error(crashMessage)
+            break
+
+        if work == 'STOP':
+            # Then halt the process
+            break
+
+        try:
+            jobReport = loadJobReport(work).pack()
+        except Exception as ex:
+            # Let the accountant load this one itself
+            msg = "Error loading or packing report %s in loader process\n" % work.get('fwjr_path', None)
+            msg += str(ex)
+            logging.error(msg)
+            jobReport = None
+
+        results.put({'id': work['id'], 'jobReport': jobReport,
+                     'maxRSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+
+    return
+
 class JobAccountantPollerException(WMException):
     """
     _JobAccountantPollerException_
@@ -29,10 +76,21 @@ class JobAccountantPoller(BaseWorkerThread):
         BaseWorkerThread.__init__(self)
         self.config = config
         self.accountantWorkSize = getattr(self.config.JobAccountant, 'accountantWorkSize', 100)
+        self.nLoaders = getattr(self.config.JobAccountant, 'nLoaderProcesses', 0)
+        self.loaderTimeout = getattr(self.config.JobAccountant, 'loaderTimeout', 300)
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
         self.initAlerts(compName = "JobAccountant")
 
+        self.pool = []
+        self.workInput = None
+        self.workResult = None
+
+        # Reports already loaded by the pool and the jobs we are waiting for
+        self.loadedReports = {}
+        self.pendingJobs = set()
+        self.loaderMaxRSS = 0
+
         return
 
     def setup(self, parameters = None):
@@ -50,41 +108,207 @@ class JobAccountantPoller(BaseWorkerThread):
         daoFactory = DAOFactory(package = "WMCore.WMBS", logger = myThread.logger,
                                 dbinterface = myThread.dbi)
         self.getJobsAction = daoFactory(classname = "Jobs.GetFWJRByState")
+
+        self.setupPool()
         return
 
-    def algorithm(self, parameters = None):
+    def setupPool(self):
         """
-        _algorithm_
+        _setupPool_
 
-        Poll WMBS for jobs in the 'Complete' state and then pass them to the
-        accountant worker.
+        Start the report loader processes, if any were configured.
         """
-        completeJobs = self.getJobsAction.execute(state = "complete")
-        logging.info("Found %d completed jobs" % len(completeJobs))
-
-        if len(completeJobs) == 0:
-            logging.debug("No work to do; exiting")
+        if self.nLoaders < 1 or len(self.pool) > 0:
             return
 
-        while len(completeJobs) > 0:
+        self.workInput  = multiprocessing.Queue()
+        self.workResult = multiprocessing.Queue()
+
+        for _ in range(self.nLoaders):
+            p = multiprocessing.Process(target = reportLoader,
+                                        args = (self.workInput,
+                                                self.workResult))
+            p.start()
+            self.pool.append(p)
+
+        return
+
+    def close(self):
+        """
+        _close_
+
+        Stop the report loader processes
+        """
+        terminate = False
+        for _ in self.pool:
             try:
-                jobsSlice = completeJobs[:self.accountantWorkSize]
-                completeJobs = completeJobs[self.accountantWorkSize:]
-                self.accountantWorker(jobsSlice)
-                logging.info("Remaining completed jobs to process: %d" % len(completeJobs))
-            except WMException:
-                myThread = threading.currentThread()
-                if getattr(myThread, 'transaction', None) != None:
-                    myThread.transaction.rollback()
-                raise
+                self.workInput.put('STOP')
             except Exception as ex:
-                myThread = threading.currentThread()
-                if getattr(myThread, 'transaction', None) != None:
-                    myThread.transaction.rollback()
-                msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
+                msg =  "Hit some exception stopping the report loaders\n"
                 msg += str(ex)
-                logging.error(msg)
-                self.sendAlert(6, msg = msg)
-                raise JobAccountantPollerException(msg)
+                logging.debug(msg)
+                terminate = True
+        try:
+            if self.workInput != None:
+                self.workInput.close()
+                self.workResult.close()
+        except Exception:
+            pass
+        for proc in self.pool:
+            if terminate:
+                proc.terminate()
+            else:
+                proc.join()
+        self.pool = []
+        self.workInput = None
+        self.workResult = None
+        self.loadedReports = {}
+        self.pendingJobs = set()
+        return
+
+    def terminate(self, parameters = None):
+        """
+        _terminate_
+
+        Shut down the report loaders with the component.
+        """
+        self.close()
+        return
+
+    def prefetchReports(self, jobs):
+        """
+        _prefetchReports_
 
+        Hand a slice of jobs to the loader processes.
+        """
+        for job in jobs:
+            self.pendingJobs.add(job["id"])
+            self.workInput.put({'id': job["id"], 'fwjr_path': job["fwjr_path"]})
+        return
+
+    def collectReports(self, jobs):
+        """
+        _collectReports_
+
+        Wait for the loader processes to return the reports of a slice of
+        jobs.  Reports belonging to the slice being prefetched are kept for
+        the next call.  If the loaders take longer than loaderTimeout the
+        reports that are still missing are loaded by the accountant worker.
+        """
+        jobIDs = set([job["id"] for job in jobs])
+        missing = jobIDs.difference(self.loadedReports.keys())
+        while len(missing) > 0:
+            try:
+                result = self.workResult.get(timeout = self.loaderTimeout)
+            except Queue.Empty:
+                logging.error("Timed out waiting for %d job reports from the loaders" % len(missing))
+                self.pendingJobs.difference_update(missing)
+                break
+
+            # Drop the results of a previous, failed, cycle
+            if result['id'] not in self.pendingJobs:
+                continue
+            self.pendingJobs.discard(result['id'])
+            self.loaderMaxRSS = max(self.loaderMaxRSS, result['maxRSS'])
+            self.loadedReports[result['id']] = result['jobReport']
+            missing.discard(result['id'])
+
+        jobReports = {}
+        for jobID in jobIDs:
+            packedReport = self.loadedReports.pop(jobID, None)
+            if packedReport != None:
+                jobReports[jobID] = Report()
+                jobReports[jobID].unpack(packedReport)
+
+        return jobReports
+
+    def sliceJobs(self, jobs):
+        """
+        _sliceJobs_
+
+        Group the jobs streamed from the database in slices of
+        accountantWorkSize jobs.
+        """
+        jobsSlice = []
+        for job in jobs:
+            jobsSlice.append(job)
+            if len(jobsSlice) == self.accountantWorkSize:
+                yield jobsSlice
+                jobsSlice = []
+        if len(jobsSlice) > 0:
+            yield jobsSlice
+        return
+
+    def algorithm(self, parameters = None):
+        """
+        _algorithm_
+
+        Poll WMBS for jobs in the 'Complete' state and then pass them to the
+        accountant worker.  The jobs are streamed from the database, only the
+        slice being processed and the next one are held in memory.
+        """
+        startTime = time.time()
+        nJobs = 0
+        self.loadedReports = {}
+        self.pendingJobs = set()
+
+        completeJobs = self.getJobsAction.execute(state = "complete", stream = True)
+        try:
+            jobSlices = self.sliceJobs(completeJobs)
+            nextSlice = next(jobSlices, None)
+            if nextSlice == None:
+                logging.debug("No work to do; exiting")
+                return
+            if len(self.pool) > 0:
+                self.prefetchReports(nextSlice)
+
+            while nextSlice != None:
+                jobsSlice = nextSlice
+                nextSlice = next(jobSlices, None)
+                try:
+                    jobReports = None
+                    if len(self.pool) > 0:
+                        # Keep the loaders busy with the next slice while
+                        # this one goes into the database
+                        if nextSlice != None:
+                            self.prefetchReports(nextSlice)
+                        jobReports = self.collectReports(jobsSlice)
+                    self.accountantWorker(jobsSlice, jobReports = jobReports)
+                    nJobs += len(jobsSlice)
+                    logging.info("Completed jobs processed so far: %d" % nJobs)
+                except WMException:
+                    myThread = threading.currentThread()
+                    if getattr(myThread, 'transaction', None) != None:
+                        myThread.transaction.rollback()
+                    raise
+                except Exception as ex:
+                    myThread = threading.currentThread()
+                    if getattr(myThread, 'transaction', None) != None:
+                        myThread.transaction.rollback()
+                    msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
+                    msg += str(ex)
+                    logging.error(msg)
+                    self.sendAlert(6, msg = msg)
+                    raise JobAccountantPollerException(msg)
+        finally:
+            # Release the cursor and connection of the stream
+            completeJobs.close()
+
+        self.logCycleStats(nJobs, time.time() - startTime)
+        return
+
+    def logCycleStats(self, nJobs, cycleTime):
+        """
+        _logCycleStats_
+
+        Report the processing rate and the memory high-water mark (in kB) of
+        the accountant and its loader processes.
+        """
+        rate = nJobs / max(cycleTime, 0.001)
+        selfMaxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        msg = "Processed %d job reports in %.2f seconds (%.2f reports/sec)." % (nJobs, cycleTime, rate)
+        msg += " Memory high-water mark: %d kB accountant" % selfMaxRSS
+        if len(self.pool) > 0:
+            msg += ", %d kB loaders" % self.loaderMaxRSS
+        logging.info(msg)
         return
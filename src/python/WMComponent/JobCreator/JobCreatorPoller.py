@@ -650,6 +650,9 @@ class JobCreatorPoller(BaseWorkerThread):
                 # in a single rollback
                 myThread.transaction.commit()
 
+                # The new jobs can be submitted right away
+                self.wakeupComponent("JobSubmitter")
+
 
             # END: While loop over jobFactory
 
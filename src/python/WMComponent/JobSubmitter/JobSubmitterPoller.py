@@ -9,11 +9,13 @@ _JobSubmitterPoller_t_
 Submit jobs for execution.
 """
 
+import heapq
 import random
 import logging
 import threading
 import os.path
 import cPickle
+import json
 
 # WMBS objects
 from WMCore.DAOFactory        import DAOFactory
@@ -44,6 +46,10 @@ def siteListCompare(a, b):
     return -1
 
 
+JOB_INFO_INDEX_VERSION = 1
+PACKAGE_COLLECTION_INDEX = "PackageCollections.json"
+
+
 class JobSubmitterPollerException(WMException):
     """
     _JobSubmitterPollerException_
@@ -94,9 +100,13 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.drainSites         = set()
         self.abortSites         = set()
         self.sortedSites        = []
+        self.siteSets           = {}
         self.packageSize        = getattr(self.config.JobSubmitter, 'packageSize', 500)
         self.collSize           = getattr(self.config.JobSubmitter, 'collectionSize',
                                           self.packageSize * 1000)
+        self.compressPackages   = getattr(self.config.JobSubmitter, 'compressPackages', False)
+        self.packageCollections = {}
+        self.changedCollections = set()
 
         # initialize the alert framework (if available)
         self.initAlerts(compName = "JobSubmitter")
@@ -108,6 +118,11 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             if not os.path.exists(self.packageDir):
                 os.makedirs(self.packageDir)
+
+            # Submit information of the created jobs, kept across restarts
+            self.jobInfoIndexPath = getattr(self.config.JobSubmitter, 'jobInfoIndex',
+                                            os.path.join(self.config.JobSubmitter.submitDir,
+                                                         'JobInfoIndex.pkl'))
         except Exception as ex:
             msg =  "Error while trying to create packageDir %s\n!"
             msg += str(ex)
@@ -131,41 +146,85 @@ class JobSubmitterPoller(BaseWorkerThread):
         # Keep a record of the thresholds in memory
         self.currentRcThresholds = {}
 
+        self.jobInfoIndex         = {}
+        self.jobInfoChanges       = {}
+        self.journalledChanges    = 0
+        self.loadJobInfoIndex()
+
         return
 
-    def getPackageCollection(self, sandboxDir):
+    def loadPackageCollections(self, sandboxDir):
         """
-        _getPackageCollection_
+        _loadPackageCollections_
 
-        Given a jobID figure out which packageCollection
-        it should belong in.
+        Find the last PackageCollection of a sandbox and the number of
+        packages in it.  This comes from the index file kept in the sandbox
+        directory, the directory is only scanned if there is no index.
         """
+        indexPath = os.path.join(sandboxDir, PACKAGE_COLLECTION_INDEX)
+        try:
+            indexHandle = open(indexPath, "r")
+            try:
+                index = json.load(indexHandle)
+            finally:
+                indexHandle.close()
+            return [index["collection"], index["packages"]]
+        except (IOError, ValueError, KeyError):
+            pass
 
-        rawList     = os.listdir(sandboxDir)
         collections = []
-        numberList  = []
-        for entry in rawList:
-            if 'PackageCollection' in entry:
-                collections.append(entry)
+        for entry in os.listdir(sandboxDir):
+            if entry.startswith('PackageCollection_'):
+                collections.append(int(entry.split('_')[1]))
 
-        # If we have no collections, return 0 (PackageCollection_0)
+        # If we have no collections, start with PackageCollection_0
         if len(collections) < 1:
-            return 0
-
-        # Loop over the list of PackageCollections
-        for collection in collections:
-            collectionPath = os.path.join(sandboxDir, collection)
-            packageList    = os.listdir(collectionPath)
-            collectionNum  = int(collection.split('_')[1])
-            if len(packageList) < self.collSize:
-                return collectionNum
-            else:
-                numberList.append(collectionNum)
+            return [0, 0]
+
+        lastCollection = max(collections)
+        collectionPath = os.path.join(sandboxDir, 'PackageCollection_%i' % lastCollection)
+        return [lastCollection, len(os.listdir(collectionPath))]
 
-        # If we got here, then all collections are full.  We'll need
-        # a new one.  Find the highest number, increment by one
-        numberList.sort()
-        return numberList[-1] + 1
+    def savePackageCollections(self):
+        """
+        _savePackageCollections_
+
+        Write the index files of the sandboxes that got new packages.
+        """
+        for sandboxDir in self.changedCollections:
+            collection, packages = self.packageCollections[sandboxDir]
+            indexPath = os.path.join(sandboxDir, PACKAGE_COLLECTION_INDEX)
+            try:
+                indexHandle = open(indexPath, "w")
+                try:
+                    json.dump({"collection": collection, "packages": packages}, indexHandle)
+                finally:
+                    indexHandle.close()
+            except IOError as ex:
+                logging.error("Error writing package collection index %s: %s", indexPath, str(ex))
+        self.changedCollections = set()
+        return
+
+    def getPackageCollection(self, sandboxDir):
+        """
+        _getPackageCollection_
+
+        Figure out which packageCollection a new package for the sandbox
+        should belong in, and count it there.  The fill level of the last
+        collection of each sandbox is kept in memory, once it's full the
+        next collection is used.
+        """
+        if sandboxDir not in self.packageCollections:
+            self.packageCollections[sandboxDir] = self.loadPackageCollections(sandboxDir)
+
+        collection = self.packageCollections[sandboxDir]
+        if collection[1] >= self.collSize:
+            collection[0] += 1
+            collection[1] = 0
+        collection[1] += 1
+        self.changedCollections.add(sandboxDir)
+
+        return collection[0]
 
     def addJobsToPackage(self, loadedJob):
         """
@@ -202,7 +261,7 @@ class JobSubmitterPoller(BaseWorkerThread):
                 os.makedirs(batchDir)
 
             batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+            jobPackage.save(batchPath, compress = self.compressPackages)
             del self.jobsToPackage[loadedJob["workflow"]]
 
         return batchDir
@@ -222,9 +281,251 @@ class JobSubmitterPoller(BaseWorkerThread):
                 os.makedirs(batchDir)
 
             batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+            jobPackage.save(batchPath, compress = self.compressPackages)
             del self.jobsToPackage[workflowName]
 
+        self.savePackageCollections()
+        return
+
+    def loadJobInfoIndex(self):
+        """
+        _loadJobInfoIndex_
+
+        Load the submit information of the jobs that were cached by a previous
+        instance of the JobSubmitter and replay the changes journalled since
+        the index was last written.  A missing or unreadable index just means
+        that the job objects will be read from disk again.
+        """
+        if not self.jobInfoIndexPath:
+            return
+
+        if os.path.isfile(self.jobInfoIndexPath):
+            try:
+                indexHandle = open(self.jobInfoIndexPath, "rb")
+                try:
+                    index = cPickle.load(indexHandle)
+                finally:
+                    indexHandle.close()
+                if index.get("version", None) != JOB_INFO_INDEX_VERSION:
+                    logging.info("Ignoring job info index %s with an old format.", self.jobInfoIndexPath)
+                    self.saveJobInfoIndex()
+                    return
+                self.jobInfoIndex = index["jobs"]
+            except Exception as ex:
+                logging.error("Error loading job info index %s: %s", self.jobInfoIndexPath, str(ex))
+                self.jobInfoIndex = {}
+                self.saveJobInfoIndex()
+                return
+
+        self.replayJobInfoJournal()
+        for jobInfo in self.jobInfoIndex.values():
+            self.internSites(jobInfo[18])
+        logging.info("Loaded submit information for %d jobs from %s.",
+                     len(self.jobInfoIndex), self.jobInfoIndexPath)
+        return
+
+    def replayJobInfoJournal(self):
+        """
+        _replayJobInfoJournal_
+
+        Apply the changes recorded in the journal to the loaded index.  Every
+        record maps job ids to their new submit information, or to None if the
+        job was dropped from the index.  Reading stops at the first record that
+        can't be unpickled, which is what a write interrupted by a crash leaves
+        behind.  The index is rewritten afterwards, so that new records never
+        end up after such a leftover.
+        """
+        journalPath = "%s.journal" % self.jobInfoIndexPath
+        if not os.path.isfile(journalPath):
+            return
+
+        journalHandle = open(journalPath, "rb")
+        try:
+            while True:
+                try:
+                    changes = cPickle.load(journalHandle)
+                except EOFError:
+                    break
+                except Exception as ex:
+                    logging.error("Error reading job info journal %s: %s", journalPath, str(ex))
+                    break
+                for jobID, jobInfo in changes.iteritems():
+                    if jobInfo == None:
+                        self.jobInfoIndex.pop(jobID, None)
+                    else:
+                        self.jobInfoIndex[jobID] = jobInfo
+        finally:
+            journalHandle.close()
+
+        self.saveJobInfoIndex()
+        return
+
+    def indexJobInfo(self, jobID, jobInfo):
+        """
+        _indexJobInfo_
+
+        Add the submit information of a job to the index.
+        """
+        self.jobInfoIndex[jobID] = jobInfo
+        self.jobInfoChanges[jobID] = jobInfo
+        return
+
+    def unindexJob(self, jobID):
+        """
+        _unindexJob_
+
+        Drop a job from the index.
+        """
+        if self.jobInfoIndex.pop(jobID, None) != None:
+            self.jobInfoChanges[jobID] = None
+        return
+
+    def journalJobInfoIndex(self):
+        """
+        _journalJobInfoIndex_
+
+        Append the changes made to the index in this cycle to the journal, so
+        the cost of keeping the index on disk follows the number of changed
+        jobs instead of the number of indexed ones.  The index is only
+        rewritten once the journal holds more changes than the index has jobs.
+        """
+        if not self.jobInfoIndexPath or not self.jobInfoChanges:
+            return
+
+        self.journalledChanges += len(self.jobInfoChanges)
+        if self.journalledChanges > max(len(self.jobInfoIndex), 10000):
+            self.saveJobInfoIndex()
+            return
+
+        journalPath = "%s.journal" % self.jobInfoIndexPath
+        try:
+            journalHandle = open(journalPath, "ab")
+            try:
+                cPickle.dump(self.jobInfoChanges, journalHandle, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                journalHandle.close()
+        except Exception as ex:
+            logging.error("Error writing job info journal %s: %s", journalPath, str(ex))
+            self.saveJobInfoIndex()
+            return
+
+        self.jobInfoChanges = {}
+        return
+
+    def saveJobInfoIndex(self):
+        """
+        _saveJobInfoIndex_
+
+        Write the submit information of all the cached jobs to disk, so that a
+        restarted JobSubmitter doesn't have to unpickle every job again.  The
+        index is written to a temporary file and moved in place, after which
+        the journal is no longer needed.  Replaying a journal left behind by a
+        crash in between gives the same index again.
+        """
+        if not self.jobInfoIndexPath:
+            return
+
+        tmpPath = "%s.tmp" % self.jobInfoIndexPath
+        try:
+            indexHandle = open(tmpPath, "wb")
+            try:
+                cPickle.dump({"version": JOB_INFO_INDEX_VERSION, "jobs": self.jobInfoIndex},
+                             indexHandle, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                indexHandle.close()
+            os.rename(tmpPath, self.jobInfoIndexPath)
+        except Exception as ex:
+            logging.error("Error writing job info index %s: %s", self.jobInfoIndexPath, str(ex))
+            return
+
+        journalPath = "%s.journal" % self.jobInfoIndexPath
+        if os.path.isfile(journalPath):
+            os.remove(journalPath)
+        self.jobInfoChanges = {}
+        self.journalledChanges = 0
+        return
+
+    def internSites(self, sites):
+        """
+        _internSites_
+
+        Return a shared frozenset for a set of sites.  Most jobs have one of
+        a handful of site lists, sharing them keeps both the cache and the
+        index on disk small.
+        """
+        sites = frozenset(sites)
+        return self.siteSets.setdefault(sites, sites)
+
+    def getPossibleLocations(self, jobType, potentialLocations):
+        """
+        _getPossibleLocations_
+
+        Remove the aborted and draining sites from the list of sites a job
+        can run at.  Returns the list of possible locations and the error
+        code to fail the job with, or None if the job can be submitted.
+        """
+        # now check for sites in drain and adjust the possible locations
+        # also check if there is at least one site left to run the job
+        if len(potentialLocations) == 0:
+            return [], 61101
+
+        possibleLocations = [x for x in potentialLocations if x not in self.abortSites]
+        if not possibleLocations:
+            # if there is at least a non aborted/down site then run there, otherwise fail the job
+            return list(potentialLocations), 61102
+
+        # try to remove draining sites if possible, this is needed to stop
+        # jobs that could run anywhere blocking draining sites
+        # if the job type is Merge, LogCollect or Cleanup this is skipped
+        if jobType not in ('LogCollect','Merge','Cleanup','Harvesting'):
+            non_draining_sites = [x for x in possibleLocations if x not in self.drainSites]
+            if non_draining_sites: # if >1 viable non-draining site remove draining ones
+                possibleLocations = non_draining_sites
+            else:
+                return possibleLocations, 61104
+
+        return possibleLocations, None
+
+    def loadJobInfo(self, newJob, packageCache):
+        """
+        _loadJobInfo_
+
+        Return the submit information of a job from the index, provided it
+        was indexed for the current retry and its job package still exists.
+        """
+        jobInfo = self.jobInfoIndex.get(newJob['id'], None)
+        if jobInfo == None or jobInfo[1] != newJob['retry_count'] or \
+               jobInfo[4] != newJob['cache_dir']:
+            return None
+
+        batchDir = jobInfo[2]
+        if batchDir not in packageCache:
+            packageCache[batchDir] = os.path.isfile(os.path.join(batchDir, "JobPackage.pkl"))
+        if not packageCache[batchDir]:
+            return None
+
+        return jobInfo
+
+    def removeJobsFromCache(self, jobIDs):
+        """
+        _removeJobsFromCache_
+
+        Remove jobs from the site/task type/workflow cache.  Their submit
+        information stays in the index.
+        """
+        self.cachedJobIDs -= jobIDs
+
+        for siteName in self.cachedJobs.keys():
+            for taskType in self.cachedJobs[siteName].keys():
+                for workflow in self.cachedJobs[siteName][taskType].keys():
+                    for cachedJobID in list(self.cachedJobs[siteName][taskType][workflow]):
+                        if cachedJobID in jobIDs:
+                            self.cachedJobs[siteName][taskType][workflow].remove(cachedJobID)
+                            try:
+                                del self.jobDataCache[workflow][cachedJobID]
+                            except KeyError:
+                                # Already gone
+                                pass
         return
 
     def refreshCache(self):
@@ -233,8 +534,9 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         Query WMBS for all jobs in the 'created' state.  For all jobs returned
         from the query, check if they already exist in the cache.  If they
-        don't, unpickle them and combine their site white and black list with
-        the list of locations they can run at.  Add them to the cache.
+        don't, get their submit information from the job info index or
+        unpickle them, and combine their site white and black list with the
+        list of locations they can run at.  Add them to the cache.
 
         Each entry in the cache is a tuple with five items:
           - WMBS Job ID
@@ -245,6 +547,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         """
         badJobs = dict([(x, []) for x in range(61101,61105)])
         dbJobs = set()
+        packageCache = {}
 
         logging.info("Refreshing priority cache...")
         workflows = self.listWorkflows.execute()
@@ -258,6 +561,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         logging.info("Determining possible sites for new jobs...")
         jobCount = 0
+        loadCount = 0
         for newJob in newJobs:
             jobID = newJob['id']
             dbJobs.add(jobID)
@@ -268,64 +572,87 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobCount % 5000 == 0:
                 logging.info("Processed %d/%d new jobs.", jobCount, len(newJobs))
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.error("Could not find pickled jobObject %s", pickledJobPath)
-                badJobs[61103].append(newJob)
-                continue
-            try:
-                jobHandle = open(pickledJobPath, "r")
-                loadedJob = cPickle.load(jobHandle)
-                jobHandle.close()
-            except Exception as ex:
-                msg =  "Error while loading pickled job object %s\n" % pickledJobPath
-                msg += str(ex)
-                logging.error(msg)
-                self.sendAlert(6, msg = msg)
-                raise JobSubmitterPollerException(msg)
-
-            loadedJob['retry_count'] = newJob['retry_count']
+            loadedJob = None
+            jobInfo = self.loadJobInfo(newJob, packageCache)
+            if jobInfo != None:
+                jobName = jobInfo[11]
+                potentialLocations = jobInfo[18]
+            else:
+                pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
 
-            # figure out possible locations for job
-            possibleLocations = loadedJob["possiblePSN"]
+                if not os.path.isfile(pickledJobPath):
+                    # Then we have a problem - there's no file
+                    logging.error("Could not find pickled jobObject %s", pickledJobPath)
+                    badJobs[61103].append(newJob)
+                    continue
+                try:
+                    jobHandle = open(pickledJobPath, "r")
+                    loadedJob = cPickle.load(jobHandle)
+                    jobHandle.close()
+                except Exception as ex:
+                    msg =  "Error while loading pickled job object %s\n" % pickledJobPath
+                    msg += str(ex)
+                    logging.error(msg)
+                    self.sendAlert(6, msg = msg)
+                    raise JobSubmitterPollerException(msg)
 
-            # Create another set of locations that may change when a site goes white/black listed
-            # Does not care about the non_draining or aborted sites, they may change and that is the point
-            potentialLocations = set()
-            potentialLocations.update(possibleLocations)
+                loadCount += 1
+                loadedJob['retry_count'] = newJob['retry_count']
+                jobName = loadedJob['name']
 
-            # now check for sites in drain and adjust the possible locations
-            # also check if there is at least one site left to run the job
-            if len(possibleLocations) == 0:
-                newJob['name'] = loadedJob['name']
-                badJobs[61101].append(newJob)
-                continue
-            else :
-                non_abort_sites = [x for x in possibleLocations if x not in self.abortSites]
-                if non_abort_sites: # if there is at least a non aborted/down site then run there, otherwise fail the job
-                    possibleLocations = non_abort_sites
-                else:
-                    newJob['name'] = loadedJob['name']
-                    newJob['possibleLocations'] = possibleLocations
-                    badJobs[61102].append(newJob)
-                    continue
+                # Create another set of locations that may change when a site goes white/black listed
+                # Does not care about the non_draining or aborted sites, they may change and that is the point
+                potentialLocations = self.internSites(loadedJob["possiblePSN"])
 
-            # try to remove draining sites if possible, this is needed to stop
-            # jobs that could run anywhere blocking draining sites
-            # if the job type is Merge, LogCollect or Cleanup this is skipped
-            if newJob['type'] not in ('LogCollect','Merge','Cleanup','Harvesting'):
-                non_draining_sites = [x for x in possibleLocations if x not in self.drainSites]
-                if non_draining_sites: # if >1 viable non-draining site remove draining ones
-                    possibleLocations = non_draining_sites
-                else:
-                    newJob['name'] = loadedJob['name']
+            possibleLocations, errorCode = self.getPossibleLocations(newJob['type'], potentialLocations)
+            if errorCode != None:
+                newJob['name'] = jobName
+                if errorCode != 61101:
                     newJob['possibleLocations'] = possibleLocations
-                    badJobs[61104].append(newJob)
-                    continue
+                badJobs[errorCode].append(newJob)
+                self.unindexJob(jobID)
+                continue
 
-            batchDir = self.addJobsToPackage(loadedJob)
+            if loadedJob != None:
+                batchDir = self.addJobsToPackage(loadedJob)
+
+                # allow job baggage to override numberOfCores
+                #       => used for repacking to get more slots/disk
+                numberOfCores = loadedJob.get('numberOfCores', 1)
+                if numberOfCores == 1:
+                    baggage = loadedJob.getBaggage()
+                    numberOfCores = getattr(baggage, "numberOfCores", 1)
+                loadedJob['numberOfCores'] = numberOfCores
+
+                jobInfo = (jobID,
+                           newJob["retry_count"],
+                           batchDir,
+                           loadedJob["sandbox"],
+                           loadedJob["cache_dir"],
+                           loadedJob.get("ownerDN", None),
+                           loadedJob.get("ownerGroup", ''),
+                           loadedJob.get("ownerRole", ''),
+                           None,
+                           loadedJob.get("scramArch", None),
+                           loadedJob.get("swVersion", None),
+                           loadedJob["name"],
+                           loadedJob.get("proxyPath", None),
+                           newJob['request_name'],
+                           loadedJob.get("estimatedJobTime", None),
+                           loadedJob.get("estimatedDiskUsage", None),
+                           loadedJob.get("estimatedMemoryUsage", None),
+                           newJob['task_name'],
+                           potentialLocations,
+                           loadedJob.get("numberOfCores", 1),
+                           newJob['task_id'],
+                           loadedJob.get('inputDataset', None),
+                           loadedJob.get('inputDatasetLocations', None),
+                           loadedJob.get('allowOpportunistic', False)
+                           )
+                self.indexJobInfo(jobID, jobInfo)
+
+            # The possible locations depend on the current site states
+            jobInfo = jobInfo[:8] + (self.internSites(possibleLocations),) + jobInfo[9:]
             self.cachedJobIDs.add(jobID)
 
             for possibleLocation in possibleLocations:
@@ -349,43 +676,11 @@ class JobSubmitterPoller(BaseWorkerThread):
 
                 locTypeCache[workflowName].add(jobID)
 
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
-
             # Now that we're out of that loop, put the job data in the cache
-            jobInfo = (jobID,
-                       newJob["retry_count"],
-                       batchDir,
-                       loadedJob["sandbox"],
-                       loadedJob["cache_dir"],
-                       loadedJob.get("ownerDN", None),
-                       loadedJob.get("ownerGroup", ''),
-                       loadedJob.get("ownerRole", ''),
-                       frozenset(possibleLocations),
-                       loadedJob.get("scramArch", None),
-                       loadedJob.get("swVersion", None),
-                       loadedJob["name"],
-                       loadedJob.get("proxyPath", None),
-                       newJob['request_name'],
-                       loadedJob.get("estimatedJobTime", None),
-                       loadedJob.get("estimatedDiskUsage", None),
-                       loadedJob.get("estimatedMemoryUsage", None),
-                       newJob['task_name'],
-                       frozenset(potentialLocations),
-                       loadedJob.get("numberOfCores", 1),
-                       newJob['task_id'],
-                       loadedJob.get('inputDataset', None),
-                       loadedJob.get('inputDatasetLocations', None),
-                       loadedJob.get('allowOpportunistic', False)
-                       )
-
             self.jobDataCache[workflowName][jobID] = jobInfo
 
+        logging.info("Cached %d new jobs, %d of them loaded from disk.", jobCount, loadCount)
+
         # Register failures in submission
         for errorCode in badJobs:
             if badJobs[errorCode]:
@@ -394,27 +689,22 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         # If there are any leftover jobs, we want to get rid of them.
         self.flushJobPackages()
+
+        # Jobs that are no longer in the created state don't need to be indexed
+        for jobID in set(self.jobInfoIndex.keys()) - dbJobs:
+            self.unindexJob(jobID)
+        self.journalJobInfoIndex()
+
         logging.info("Done with refreshCache() loop, pruning killed jobs.")
 
         # We need to remove any jobs from the cache that were not returned in
         # the last call to the database.
         jobIDsToPurge = self.cachedJobIDs - dbJobs
-        self.cachedJobIDs -= jobIDsToPurge
 
         if len(jobIDsToPurge) == 0:
             return
 
-        for siteName in self.cachedJobs.keys():
-            for taskType in self.cachedJobs[siteName].keys():
-                for workflow in self.cachedJobs[siteName][taskType].keys():
-                    for cachedJobID in list(self.cachedJobs[siteName][taskType][workflow]):
-                        if cachedJobID in jobIDsToPurge:
-                            self.cachedJobs[siteName][taskType][workflow].remove(cachedJobID)
-                            try:
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except KeyError:
-                                # Already gone
-                                pass
+        self.removeJobsFromCache(jobIDsToPurge)
 
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
@@ -475,14 +765,19 @@ class JobSubmitterPoller(BaseWorkerThread):
                 if not siteName in self.siteKeys[pnn]:
                     self.siteKeys[pnn].append(siteName)
 
-        # When the list of drain/abort sites changes between iteration then a location
-        # refresh is needed, for now it forces a full cache refresh
-        # TODO: Make it more efficient, only reshuffle locations when this happens
-        if newDrainSites != self.drainSites or  newAbortSites != self.abortSites:
-            logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
-            self.cachedJobIDs       = set()
-            self.cachedJobs         = {}
-            self.jobDataCache       = {}
+        # When the list of drain/abort sites changes between iteration then the
+        # jobs that could run at the affected sites are dropped from the cache.
+        # refreshCache() recomputes their locations from the job info index.
+        changedSites = (newDrainSites ^ self.drainSites) | (newAbortSites ^ self.abortSites)
+        if changedSites:
+            jobIDsToRelocate = set()
+            for workflow in self.jobDataCache.keys():
+                for jobID, jobInfo in self.jobDataCache[workflow].items():
+                    if not changedSites.isdisjoint(jobInfo[18]):
+                        jobIDsToRelocate.add(jobID)
+            logging.info("Draining or Aborted sites have changed, relocating %d jobs.",
+                         len(jobIDsToRelocate))
+            self.removeJobsFromCache(jobIDsToRelocate)
 
         # Sort the sites, utilizing the fact python has a stable sort function - we can simply
         # sort twice.
@@ -504,6 +799,24 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         return
 
+    def workflowQueue(self, workflows):
+        """
+        _workflowQueue_
+
+        Build a heap of workflows with the highest priority, and then the
+        oldest timestamp, on top.  Workflows we don't have a priority or a
+        timestamp for go first.
+        """
+        workflowQueue = []
+        for workflow in workflows:
+            if workflow in self.workflowPrios and workflow in self.workflowTimestamps:
+                workflowQueue.append((1, -self.workflowPrios[workflow],
+                                      self.workflowTimestamps[workflow], workflow))
+            else:
+                workflowQueue.append((0, 0, 0, workflow))
+        heapq.heapify(workflowQueue)
+        return workflowQueue
+
     def assignJobLocations(self):
         """
         _assignJobLocations_
@@ -589,6 +902,11 @@ class JobSubmitterPoller(BaseWorkerThread):
                 breakLoop = False
                 logging.debug("nJobsRequired for task %s: %i", taskType, nJobsRequired)
 
+                # Order the workflows by prio and timestamp on the subscription
+                # once, the order doesn't change while we pull jobs out.
+                workflowQueue = self.workflowQueue(taskCache)
+                prunedWorkflows = set()
+
                 while nJobsRequired > 0:
                     # Do this until we have all the jobs for this threshold
 
@@ -597,41 +915,34 @@ class JobSubmitterPoller(BaseWorkerThread):
                     cachedJob = None
                     cachedJobWorkflow = None
 
-                    workflows = taskCache.keys()
-                    # Sorting by prio and timestamp on the subscription
-                    def sortingCmp(x, y):
-                        if (x not in self.workflowTimestamps) or (y not in self.workflowTimestamps):
-                            return -1
-                        if (x not in self.workflowPrios) or (y not in self.workflowPrios):
-                            return -1
-                        if self.workflowPrios[x] > self.workflowPrios[y]:
-                            return -1
-                        elif self.workflowPrios[x] == self.workflowPrios[y]:
-                            return cmp(self.workflowTimestamps[x], self.workflowTimestamps[y])
-                        else:
-                            return 1
-                    workflows.sort(cmp = sortingCmp)
-
-                    for workflow in workflows:
+                    while workflowQueue:
+                        workflow = workflowQueue[0][-1]
+                        workflowJobs = taskCache[workflow]
+                        workflowData = self.jobDataCache.get(workflow, {})
+                        workflowPruned = jobsToPrune.get(workflow, ())
+
+                        # Drop the jobs already assigned to other sites in one go
+                        if workflow not in prunedWorkflows:
+                            prunedWorkflows.add(workflow)
+                            if workflowPruned:
+                                workflowJobs -= workflowPruned
+
                         # Run a while loop until you get a job
-                        while len(taskCache[workflow]) > 0:
-                            cachedJobID = taskCache[workflow].pop()
-                            try:
-                                cachedJob   = self.jobDataCache[workflow].get(cachedJobID, None)
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except:
-                                pass
+                        while workflowJobs:
+                            cachedJobID = workflowJobs.pop()
+                            cachedJob = workflowData.pop(cachedJobID, None)
 
-                            if cachedJobID not in jobsToPrune.get(workflow, set()):
+                            if cachedJobID not in workflowPruned:
                                 cachedJobWorkflow = workflow
                                 break
                             else:
                                 cachedJob = None
 
                         # Remove the entry in the cache for the workflow if it is empty.
-                        if len(self.cachedJobs[siteName][taskType][workflow]) == 0:
-                            del self.cachedJobs[siteName][taskType][workflow]
-                        if workflow in self.jobDataCache and len(self.jobDataCache[workflow].keys()) == 0:
+                        if not workflowJobs:
+                            heapq.heappop(workflowQueue)
+                            del taskCache[workflow]
+                        if workflow in self.jobDataCache and not workflowData:
                             del self.jobDataCache[workflow]
 
                         if cachedJob:
@@ -639,10 +950,10 @@ class JobSubmitterPoller(BaseWorkerThread):
                             break
 
                     # Check to see if we need to delete this site from the cache
-                    if len(self.cachedJobs[siteName][taskType].keys()) == 0:
+                    if not taskCache:
                         del self.cachedJobs[siteName][taskType]
                         breakLoop = True
-                    if len(self.cachedJobs[siteName].keys()) == 0:
+                    if not self.cachedJobs[siteName]:
                         del self.cachedJobs[siteName]
                         breakLoop = True
 
@@ -660,7 +971,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
                     # Sort jobs by jobPackage
                     package = cachedJob[2]
-                    if not package in jobsToSubmit.keys():
+                    if not package in jobsToSubmit:
                         jobsToSubmit[package] = []
 
                     # Add the sandbox to a global list
@@ -696,7 +1007,7 @@ class JobSubmitterPoller(BaseWorkerThread):
                                'estimatedJobTime' : cachedJob[14],
                                'estimatedDiskUsage' : cachedJob[15],
                                'estimatedMemoryUsage' : cachedJob[16],
-                               'taskPriority' : self.workflowPrios[workflow],
+                               'taskPriority' : self.workflowPrios[cachedJobWorkflow],
                                'taskName' : cachedJob[17],
                                'potentialSites' : potentialSites,
                                'numberOfCores' : cachedJob[19],
@@ -727,7 +1038,7 @@ class JobSubmitterPoller(BaseWorkerThread):
             for taskType in self.cachedJobs[siteName].keys():
                 for workflow in self.cachedJobs[siteName][taskType].keys():
                     allWorkflows.add(workflow)
-                    if workflow in jobsToPrune.keys():
+                    if workflow in jobsToPrune:
                         self.cachedJobs[siteName][taskType][workflow] -= jobsToPrune[workflow]
 
         # Remove workflows from the timestamp dictionary which are not anymore in the cache
@@ -859,3 +1170,4 @@ class JobSubmitterPoller(BaseWorkerThread):
         """
         logging.debug("terminating. doing one more pass before we die")
         self.algorithm(params)
+        self.saveJobInfoIndex()
@@ -158,8 +158,11 @@ class RetryManagerPoller(BaseWorkerThread):
         myThread = threading.currentThread()
         try:
             myThread.transaction.begin()
-            self.doRetries()
+            nRetried = self.doRetries()
             myThread.transaction.commit()
+            if nRetried:
+                # The retried jobs can be submitted right away
+                self.wakeupComponent("JobSubmitter")
         except WMException as ex:
             if getattr(myThread, 'transaction', None) and \
                getattr(myThread.transaction, 'transaction', None):
@@ -185,11 +188,12 @@ class RetryManagerPoller(BaseWorkerThread):
         _processRetries_
 
         Actually does the dirty work of figuring out what to do with jobs
+        Returns the number of jobs retried
         """
 
         if len(jobs) < 1:
             # We got no jobs?
-            return
+            return 0
 
         transitions = Transitions()
         oldstate = '%scooloff' % (cooloffType)
@@ -197,7 +201,7 @@ class RetryManagerPoller(BaseWorkerThread):
             msg = 'Unknown job type %s' % (cooloffType)
             logging.error(msg)
             self.sendAlert(6, msg = msg)
-            return
+            return 0
         propList = []
 
         newJobState  = transitions[oldstate][0]
@@ -211,7 +215,7 @@ class RetryManagerPoller(BaseWorkerThread):
             self.changeState.propagate(propList, newJobState, oldstate)
 
 
-        return
+        return len(propList)
 
 
     def loadJobsFromList(self, idList):
@@ -290,21 +294,25 @@ class RetryManagerPoller(BaseWorkerThread):
         """
         Queries DB for all watched filesets, if matching filesets become
         available, create the subscriptions
+
+        Returns the number of jobs retried
         """
+        nRetried = 0
+
         # Discover the jobs that are in create cooloff
         jobs = self.getJobs.execute(state = 'createcooloff')
         logging.info("Found %s jobs in createcooloff" % len(jobs))
-        self.processRetries(jobs, 'create')
+        nRetried += self.processRetries(jobs, 'create')
 
         # Discover the jobs that are in submit cooloff
         jobs = self.getJobs.execute(state = 'submitcooloff')
         logging.info("Found %s jobs in submitcooloff" % len(jobs))
-        self.processRetries(jobs, 'submit')
+        nRetried += self.processRetries(jobs, 'submit')
 
             # Discover the jobs that are in run cooloff
         jobs = self.getJobs.execute(state = 'jobcooloff')
         logging.info("Found %s jobs in jobcooloff" % len(jobs))
-        self.processRetries(jobs, 'job')
+        nRetried += self.processRetries(jobs, 'job')
 
         # Discover the jobs that are in paused, logging only purpose:
         jobs = self.getJobs.execute(state = 'jobpaused')
@@ -315,3 +323,5 @@ class RetryManagerPoller(BaseWorkerThread):
 
         jobs = self.getJobs.execute(state = 'submitpaused')
         logging.info("Found %s jobs in submitpaused" % len(jobs))
+
+        return nRetried
@@ -0,0 +1,41 @@
+"""
+_UpdateWorkers_
+
+MySQL implementation of UpdateWorkers
+"""
+
+__all__ = []
+
+
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class UpdateWorkers(DBFormatter):
+
+    sql = """UPDATE wm_workers
+                SET last_updated = :last_updated, state = :state
+             WHERE component_id = (SELECT id FROM wm_components
+                                   WHERE name = :component_name)
+               AND name = :worker_name
+               AND state != 'Error'"""
+
+    def execute(self, componentName, workers, conn = None,
+                transaction = False):
+        """
+        _execute_
+
+        Update the state and heartbeat time of several workers of a component.
+        workers is a list of dictionaries with the worker_name, state and
+        last_updated keys.  Workers in the Error state are left alone, their
+        buffered heartbeats may be older than the error.
+        """
+        binds = []
+        for worker in workers:
+            binds.append({"component_name": componentName,
+                          "worker_name": worker["worker_name"],
+                          "state": worker["state"],
+                          "last_updated": worker["last_updated"]})
+
+        self.dbi.processData(self.sql, binds, conn = conn,
+                             transaction = transaction)
+        return
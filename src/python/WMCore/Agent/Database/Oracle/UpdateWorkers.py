@@ -0,0 +1,15 @@
+"""
+_UpdateWorkers_
+
+Oracle implementation of UpdateWorkers
+"""
+
+__all__ = []
+
+
+
+from WMCore.Agent.Database.MySQL.UpdateWorkers import UpdateWorkers \
+     as UpdateWorkersMySQL
+
+class UpdateWorkers(UpdateWorkersMySQL):
+    pass
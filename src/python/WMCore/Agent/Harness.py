@@ -42,6 +42,7 @@ from WMCore import WMLogging
 from WMCore.WorkerThreads.WorkerThreadManager import WorkerThreadManager
 from WMCore.Agent.ConfigDBMap import ConfigDBMap
 from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
+from WMCore.DAOFactory import DAOFactory
 
 class HarnessException(WMException):
     """
@@ -187,6 +188,12 @@ class Harness:
                 myThread.dbi = myThread.dbFactory.connect()
                 myThread.transaction = Transaction(myThread.dbi)
 
+                # Import the DAOs the component uses up front
+                for package in getattr(compSect, 'preloadDAOPackages', []):
+                    daoFactory = DAOFactory(package = package, logger = myThread.logger,
+                                            dbinterface = myThread.dbi)
+                    logging.info(">>>Preloaded %i DAOs from %s" % (daoFactory.preload(), package))
+
             else:
 
                 myThread.dbi = myThread.config.CoreDatabase.connectUrl
@@ -10,14 +10,145 @@ A simple object representing a file in WMBS.
 import threading
 import os
 import logging
+import bisect
+import time
 
 from WMCore.WMConnectionBase import WMConnectionBase
 
+# Upper bounds in seconds of the algorithm duration histogram buckets, the
+# last bucket holds the longer cycles
+DURATION_BUCKETS = [0.1, 1, 10, 60, 300, 1800]
+
+_aggregators = {}
+_aggregatorsLock = threading.Lock()
+
+def getHeartbeatAggregator(componentName):
+    """
+    _getHeartbeatAggregator_
+
+    Return the HeartbeatAggregator shared by all the workers of a component
+    running in this process.
+    """
+    _aggregatorsLock.acquire()
+    try:
+        aggregator = _aggregators.get(componentName, None)
+        if aggregator == None:
+            aggregator = HeartbeatAggregator()
+            _aggregators[componentName] = aggregator
+        return aggregator
+    finally:
+        _aggregatorsLock.release()
+
+class HeartbeatAggregator:
+    """
+    _HeartbeatAggregator_
+
+    Keep the latest heartbeat of every worker thread of a component until it
+    is written to the database, and the histogram of the durations of their
+    algorithm cycles.
+    """
+    def __init__(self, buckets = DURATION_BUCKETS):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.pending = {}
+        self.histograms = {}
+        self.lastFlush = time.time()
+        # workers whose error state must not be overwritten by a buffered
+        # heartbeat
+        self.failed = set()
+
+    def record(self, workerName, state, duration = None):
+        """
+        _record_
+
+        Buffer a heartbeat, and the duration of the last algorithm cycle of
+        the worker if known.
+        """
+        self.lock.acquire()
+        try:
+            self.failed.discard(workerName)
+            self.pending[workerName] = (state, int(time.time()))
+            if duration != None:
+                histogram = self.histograms.get(workerName, None)
+                if histogram == None:
+                    histogram = [0] * (len(self.buckets) + 1)
+                    self.histograms[workerName] = histogram
+                histogram[bisect.bisect_left(self.buckets, duration)] += 1
+        finally:
+            self.lock.release()
+
+    def isFlushDue(self, flushInterval):
+        """
+        _isFlushDue_
+
+        Check if the buffered heartbeats are older than flushInterval seconds.
+        """
+        return len(self.pending) > 0 and time.time() - self.lastFlush >= flushInterval
+
+    def takePending(self):
+        """
+        _takePending_
+
+        Remove and return the buffered heartbeats, a dictionary of
+        (state, timestamp) keyed by worker name.
+        """
+        self.lock.acquire()
+        try:
+            pending = self.pending
+            self.pending = {}
+            self.lastFlush = time.time()
+            return pending
+        finally:
+            self.lock.release()
+
+    def putBack(self, pending):
+        """
+        _putBack_
+
+        Buffer again heartbeats that couldn't be written, unless the workers
+        sent newer ones meanwhile.
+        """
+        self.lock.acquire()
+        try:
+            for workerName, heartbeat in pending.items():
+                if workerName not in self.failed:
+                    self.pending.setdefault(workerName, heartbeat)
+        finally:
+            self.lock.release()
+
+    def discard(self, workerName):
+        """
+        _discard_
+
+        Drop the buffered heartbeat of a worker that failed, so that writing
+        the heartbeats doesn't overwrite its error state.
+        """
+        self.lock.acquire()
+        try:
+            self.pending.pop(workerName, None)
+            self.failed.add(workerName)
+        finally:
+            self.lock.release()
+
+    def getDurationHistogram(self, workerName):
+        """
+        _getDurationHistogram_
+
+        Return the histogram of the algorithm cycle durations of a worker as
+        a list of (upper bound, number of cycles), None being the overflow.
+        """
+        self.lock.acquire()
+        try:
+            histogram = self.histograms.get(workerName, [0] * (len(self.buckets) + 1))
+            return zip(self.buckets + [None], histogram)
+        finally:
+            self.lock.release()
+
 class HeartbeatAPI(WMConnectionBase):
     """
     Generic methods used by all of the WMBS classes.
     """
-    def __init__(self, componentName, logger=None, dbi=None):
+    def __init__(self, componentName, logger=None, dbi=None, flushInterval=0):
         """
         ___init___
 
@@ -25,12 +156,17 @@ class HeartbeatAPI(WMConnectionBase):
         attritbutes.  Create a DAO factory for WMCore.WorkQueue as well. Finally,
         check to see if a transaction object has been created.  If none exists,
         create one but leave the transaction closed.
+
+        The heartbeats sent with recordWorkerHeartbeat are written at most
+        every flushInterval seconds, for all the workers of the component.
         """
         WMConnectionBase.__init__(self, daoPackage = "WMCore.Agent.Database",
                                   logger = logger, dbi = dbi)
 
         self.componentName = componentName
         self.pid = os.getpid()
+        self.flushInterval = flushInterval
+        self.aggregator = getHeartbeatAggregator(componentName)
 
     def registerComponent(self):
 
@@ -56,8 +192,57 @@ class HeartbeatAPI(WMConnectionBase):
                            conn = self.getDBConn(),
                            transaction = self.existingTransaction())
 
+    def recordWorkerHeartbeat(self, workerName, state = "Running", duration = None):
+        """
+        _recordWorkerHeartbeat_
+
+        Buffer the heartbeat of an existing worker, with the duration of its
+        last algorithm cycle.  The buffered heartbeats of the component are
+        written if flushInterval passed since they were last written.
+        """
+        self.aggregator.record(workerName, state, duration)
+        if self.aggregator.isFlushDue(self.flushInterval):
+            self.flushWorkerHeartbeats()
+
+    def flushWorkerHeartbeats(self):
+        """
+        _flushWorkerHeartbeats_
+
+        Write the buffered heartbeats of the component in a single statement.
+        """
+        pending = self.aggregator.takePending()
+        if not pending:
+            return
+
+        workers = []
+        for workerName, (state, lastUpdated) in pending.items():
+            workers.append({"worker_name": workerName, "state": state,
+                            "last_updated": lastUpdated})
+        action = self.daofactory(classname = "UpdateWorkers")
+        try:
+            action.execute(self.componentName, workers,
+                           conn = self.getDBConn(),
+                           transaction = self.existingTransaction())
+        except Exception:
+            self.aggregator.putBack(pending)
+            raise
+
+        for workerName in pending.keys():
+            logging.debug("Algorithm duration histogram of %s: %s" % \
+                          (workerName, self.aggregator.getDurationHistogram(workerName)))
+
+    def getDurationHistogram(self, workerName):
+        """
+        _getDurationHistogram_
+
+        Histogram of the algorithm cycle durations of a worker, see
+        HeartbeatAggregator.getDurationHistogram
+        """
+        return self.aggregator.getDurationHistogram(workerName)
+
     def updateWorkerError(self, workerName, errorMessage):
 
+        self.aggregator.discard(workerName)
         action = self.daofactory(classname = "UpdateWorkerError")
         action.execute(self.componentName, workerName, errorMessage,
                            conn = self.getDBConn(),
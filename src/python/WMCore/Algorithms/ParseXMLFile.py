@@ -76,7 +76,7 @@ def expat_parse(f, target):
 
     """
     parser = xml.parsers.expat.ParserCreate()
-    #parser.buffer_size = 65536
+    parser.buffer_size = 65536
     parser.buffer_text = True
     parser.returns_unicode = False
     parser.StartElementHandler = \
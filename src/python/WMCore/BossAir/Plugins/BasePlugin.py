@@ -6,6 +6,7 @@ Base class for BossAir plugins
 """
 
 from WMCore.WMException import WMException
+from WMCore.Algorithms  import SubprocessAlgos
 
 
 
@@ -50,6 +51,13 @@ class BasePlugin:
         # However stateMap should be implemented in child class.
         self.states = self.stateMap().keys()
 
+        # Runs the batch system commands, returns stdout, stderr and exit code.
+        # Replace it to run the commands against something else.
+        self.commandRunner = SubprocessAlgos.runCommand
+
+        # Maximum number of jobs edited or removed by a single command
+        self.bulkCommandSize = 500
+
 
 
     def submit(self, jobs, info = None):
@@ -97,6 +105,68 @@ class BasePlugin:
 
         return
 
+    def groupJobEdits(self, edits):
+        """
+        _groupJobEdits_
+
+        Group a dictionary of new attribute values keyed by job id by value.
+        Returns a list of (value, jobIDs) with at most bulkCommandSize jobs
+        each.
+        """
+        groups = {}
+        for jobID, value in edits.items():
+            groups.setdefault(value, []).append(jobID)
+
+        editGroups = []
+        for value in sorted(groups.keys()):
+            jobIDs = sorted(groups[value])
+            for index in range(0, len(jobIDs), self.bulkCommandSize):
+                editGroups.append((value, jobIDs[index:index + self.bulkCommandSize]))
+        return editGroups
+
+
+    def editJobs(self, edits, attribute):
+        """
+        _editJobs_
+
+        Set attribute to edits[jobID] for every job in the edits dictionary,
+        editing all the jobs that get the same value at once.
+        """
+        for value, jobIDs in self.groupJobEdits(edits):
+            self.editJobGroup(jobIDs, attribute, value)
+        return
+
+
+    def removeJobs(self, jobIDs):
+        """
+        _removeJobs_
+
+        Remove the jobs from the batch system, bulkCommandSize jobs at once.
+        """
+        jobIDs = sorted(jobIDs)
+        for index in range(0, len(jobIDs), self.bulkCommandSize):
+            self.removeJobGroup(jobIDs[index:index + self.bulkCommandSize])
+        return
+
+
+    def editJobGroup(self, jobIDs, attribute, value):
+        """
+        _editJobGroup_
+
+        Set attribute to value for a group of jobs with a single command
+        """
+        return
+
+
+    def removeJobGroup(self, jobIDs):
+        """
+        _removeJobGroup_
+
+        Remove a group of jobs with a single command
+        """
+        return
+
+
     def updateJobInformation(self, workflow, task, **kwargs):
         """
         _updateJobInformation_
@@ -126,6 +126,176 @@ def parseError(error):
     return errorCondition, errorMsg
 
 
+# The classAd attributes read from condor_q, in the order condor_q prints them
+CLASSAD_FIELDS = ('JobStatus', 'stateTime', 'runningTime', 'submitTime',
+                  'DESIRED_Sites', 'ExtDESIRED_Sites', 'runningCMSSite', 'WMAgentID')
+
+# One (key:value) statement of a condor_q -format line
+CLASSAD_RE = re.compile(r"\(([^(:]*):([^(:)]*)")
+
+# Condor JobStatus codes, 6 (transferring output) fits best in Running
+JOB_STATUS_NAMES = {1: 'Idle',
+                    2: 'Running',
+                    3: 'Error',
+                    4: 'Complete',
+                    5: 'Held',
+                    6: 'Running'}
+
+
+class CondorJobAd(tuple):
+    """
+    _CondorJobAd_
+
+    The classAd of a job, a tuple with the values of CLASSAD_FIELDS (None for
+    the attributes condor_q didn't print) that can be read like a dictionary.
+    """
+    __slots__ = ()
+    _index = dict([(key, index) for (index, key) in enumerate(CLASSAD_FIELDS)])
+
+    def get(self, key, default = None):
+        index = self._index.get(key, None)
+        if index == None or self[index] == None:
+            return default
+        return self[index]
+
+    def items(self):
+        return [(key, value) for (key, value) in zip(CLASSAD_FIELDS, self) if value != None]
+
+    def keys(self):
+        return [key for (key, value) in self.items()]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def parseClassAds(stream, chunkSize = 65536):
+    """
+    _parseClassAds_
+
+    Parse condor_q -format output, one ad per job ended by ':::', reading it
+    from stream chunkSize bytes at a time.  Returns a dictionary of
+    CondorJobAds keyed by WMAgent job id.
+    """
+    jobInfo = {}
+    fieldIndex = CondorJobAd._index
+    nFields = len(CLASSAD_FIELDS)
+    idIndex = fieldIndex['WMAgentID']
+    tail = ''
+    while True:
+        chunk = stream.read(chunkSize)
+        ads = (tail + chunk).split(':::')
+        if chunk:
+            # The last ad may continue in the next chunk
+            tail = ads.pop()
+        for ad in ads:
+            statements = CLASSAD_RE.findall(ad)
+            if not statements:
+                # There is no ad.
+                continue
+            values = [None] * nFields
+            for key, value in statements:
+                index = fieldIndex.get(key, None)
+                if index != None:
+                    values[index] = value
+            if values[idIndex] == None:
+                # Then we have an invalid job somehow
+                logging.error("Invalid job discovered in condor_q")
+                logging.error(ad)
+                continue
+            jobInfo[int(values[idIndex])] = CondorJobAd(values)
+        if not chunk:
+            break
+
+    return jobInfo
+
+
+def jobIDConstraint(jobIDs):
+    """
+    _jobIDConstraint_
+
+    Condor constraint matching the jobs with the given WMAgent job ids.
+    """
+    return "member(WMAgent_JobID, {%s})" % ", ".join([str(int(x)) for x in jobIDs])
+
+
+def reconcileJobs(jobs, jobInfo, removeTime):
+    """
+    _reconcileJobs_
+
+    Compare the jobs BossAir thinks are running with the classAds from
+    condor_q, a dictionary keyed by job id, updating the status, status time
+    and location of the jobs.  Returns the running, changed and completed
+    jobs like track().
+    """
+    changeList   = []
+    completeList = []
+    runningList  = []
+    noInfoFlag   = len(jobInfo) == 0
+    stateMap     = CondorPlugin.stateMap()
+    currentTime  = time.time()
+
+    for job in jobs:
+        jobAd = jobInfo.get(job['jobid'], None)
+        if jobAd == None:
+            # Two options here, either put in removed, or not
+            # Only cycle through Removed if condor_q is sending
+            # us no information
+            if noInfoFlag:
+                if not job['status'] == 'Removed':
+                    # If the job is not in removed, move it to removed
+                    job['status']      = 'Removed'
+                    job['status_time'] = int(currentTime)
+                    changeList.append(job)
+                elif currentTime - float(job['status_time']) > removeTime:
+                    # If the job is in removed, and it's been missing for more
+                    # then removeTime, remove it.
+                    completeList.append(job)
+            else:
+                completeList.append(job)
+            continue
+
+        try:
+            # sometimes it returns 'undefined' (probably over high load)
+            jobStatus = int(jobAd.get('JobStatus', 0))
+        except ValueError:
+            jobStatus = 0  # unknown
+        statName = JOB_STATUS_NAMES.get(jobStatus, None)
+        if statName == None:
+            # What state are we in?
+            logging.info("Job in unknown state %i" % jobStatus)
+            statName = 'Unknown'
+
+        # Get the global state
+        job['globalState'] = stateMap[statName]
+
+        if statName != job['status']:
+            # Then the status has changed
+            job['status']      = statName
+            job['status_time'] = 0
+
+        #Check if we have a valid status time
+        if not job['status_time']:
+            if statName == 'Running':
+                timeKey = 'runningTime'
+                # If we transitioned to running then check the site we are running at
+                job['location'] = jobAd.get('runningCMSSite', None)
+                if job['location'] is None:
+                    logging.debug('Something is not right here, a job (%s) is running with no CMS site' % str(jobAd))
+            elif statName == 'Idle':
+                timeKey = 'submitTime'
+            else:
+                timeKey = 'stateTime'
+            try:
+                job['status_time'] = int(jobAd.get(timeKey, 0))
+            except ValueError:
+                job['status_time'] = 0
+            changeList.append(job)
+
+        runningList.append(job)
+
+    return runningList, changeList, completeList
+
+
 
 
 
@@ -194,6 +364,7 @@ class CondorPlugin(BasePlugin):
         self.errorCount    = 0
         self.defaultTaskPriority = getattr(config.BossAir, 'defaultTaskPriority', 0)
         self.maxTaskPriority     = getattr(config.BossAir, 'maxTaskPriority', 1e7)
+        self.bulkCommandSize     = getattr(config.BossAir, 'bulkCommandSize', 500)
 
         # Required for global pool accounting
         self.acctGroup = getattr(config.BossAir, 'acctGroup', "production")
@@ -551,99 +722,12 @@ class CondorPlugin(BasePlugin):
         Third, the jobs that need to be completed
         """
 
-        changeList   = []
-        completeList = []
-        runningList  = []
-        noInfoFlag   = False
-
         # Get the job
         jobInfo = self.getClassAds()
         if jobInfo == None:
-            return runningList, changeList, completeList
-        if len(jobInfo.keys()) == 0:
-            noInfoFlag = True
-
-        for job in jobs:
-            # Now go over the jobs from WMBS and see what we have
-            if not job['jobid'] in jobInfo.keys():
-                # Two options here, either put in removed, or not
-                # Only cycle through Removed if condor_q is sending
-                # us no information
-                if noInfoFlag:
-                    if not job['status'] == 'Removed':
-                        # If the job is not in removed, move it to removed
-                        job['status']      = 'Removed'
-                        job['status_time'] = int(time.time())
-                        changeList.append(job)
-                    elif time.time() - float(job['status_time']) > self.removeTime:
-                        # If the job is in removed, and it's been missing for more
-                        # then self.removeTime, remove it.
-                        completeList.append(job)
-                else:
-                    completeList.append(job)
-            else:
-                jobAd     = jobInfo.get(job['jobid'])
-                try:
-                    # sometimes it returns 'undefined' (probably over high load)
-                    jobStatus = int(jobAd.get('JobStatus', 0))
-                except ValueError as ex:
-                    jobStatus = 0  # unknown
-                statName  = 'Unknown'
-                if jobStatus == 1:
-                    # Job is Idle, waiting for something to happen
-                    statName = 'Idle'
-                elif jobStatus == 5:
-                    # Job is Held; experienced an error
-                    statName = 'Held'
-                elif jobStatus == 2 or jobStatus == 6:
-                    # Job is Running, doing what it was supposed to
-                    # NOTE: Status 6 is transferring output
-                    # I'm going to list this as running for now because it fits.
-                    statName = 'Running'
-                elif jobStatus == 3:
-                    # Job is in X-state: List as error
-                    statName = 'Error'
-                elif jobStatus == 4:
-                    # Job is completed
-                    statName = 'Complete'
-                else:
-                    # What state are we in?
-                    logging.info("Job in unknown state %i" % jobStatus)
-
-                # Get the global state
-                job['globalState'] = CondorPlugin.stateMap()[statName]
-
-                if statName != job['status']:
-                    # Then the status has changed
-                    job['status']      = statName
-                    job['status_time'] = 0
-
-                #Check if we have a valid status time
-                if not job['status_time']:
-                    if job['status'] == 'Running':
-                        try:
-                            job['status_time'] = int(jobAd.get('runningTime', 0))
-                        except ValueError as ex:
-                            job['status_time'] = 0
-                        # If we transitioned to running then check the site we are running at
-                        job['location'] = jobAd.get('runningCMSSite', None)
-                        if job['location'] is None:
-                            logging.debug('Something is not right here, a job (%s) is running with no CMS site' % str(jobAd))
-                    elif job['status'] == 'Idle':
-                        try:
-                            job['status_time'] = int(jobAd.get('submitTime', 0))
-                        except ValueError as ex:
-                            job['status_time'] = 0
-                    else:
-                        try:
-                            job['status_time'] = int(jobAd.get('stateTime', 0))
-                        except ValueError as ex:
-                            job['status_time'] = 0
-                    changeList.append(job)
-
-                runningList.append(job)
+            return [], [], []
 
-        return runningList, changeList, completeList
+        return reconcileJobs(jobs, jobInfo, self.removeTime)
 
 
     def complete(self, jobs):
@@ -733,6 +817,7 @@ class CondorPlugin(BasePlugin):
         """
         jobInfo = self.getClassAds()
         jobtokill=[]
+        siteEdits = {}
         for job in jobs:
             jobID = job['id']
             jobAd = jobInfo.get(jobID)
@@ -748,11 +833,7 @@ class CondorPlugin(BasePlugin):
                         usi = desiredSites
                         if len(usi) > 1:
                             usi.remove(siteName)
-                            usi = ','.join(map(str, usi))
-                            command = 'condor_qedit  -constraint \'WMAgent_JobID==%i\' DESIRED_Sites \'"%s"\'' %(jobID, usi)
-                            proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                                    stdout = subprocess.PIPE, shell = True)
-                            out, err = proc.communicate()
+                            siteEdits[jobID] = ','.join(map(str, usi))
                         else:
                             jobtokill.append(job)
                     else:
@@ -763,15 +844,14 @@ class CondorPlugin(BasePlugin):
                     if siteName not in desiredSites and siteName in extDesiredSites:
                         usi = desiredSites
                         usi.append(siteName)
-                        usi = ','.join(map(str, usi))
-                        command = 'condor_qedit  -constraint \'WMAgent_JobID==%i\' DESIRED_Sites \'"%s"\'' %(jobID, usi)
-                        proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                                stdout = subprocess.PIPE, shell = True)
-                        out, err = proc.communicate()
+                        siteEdits[jobID] = ','.join(map(str, usi))
                     else :
                         #If job doesn't have the siteName in the siteList, just ignore it
                         logging.debug("Cannot find siteName %s in the sitelist" % siteName)
 
+        # Jobs with the same new site list are edited together
+        self.editJobs(siteEdits, 'DESIRED_Sites')
+
         return jobtokill
 
 
@@ -781,13 +861,7 @@ class CondorPlugin(BasePlugin):
 
         Kill a list of jobs based on the WMBS job names.
         """
-        for job in jobs:
-            jobID = job['jobid']
-            # This is a very long and painful command to run
-            command = 'condor_rm -constraint \"WMAgent_JobID =?= %i\"' % (jobID)
-            proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                    stdout = subprocess.PIPE, shell = True)
-            out, err = proc.communicate()
+        self.removeJobs([job['jobid'] for job in jobs])
 
         return
 
@@ -797,13 +871,47 @@ class CondorPlugin(BasePlugin):
 
         Kill all the jobs belonging to a specif workflow.
         """
-        command = 'condor_rm -constraint \'WMAgent_RequestName == "%s"\'' % workflow
-        proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                stdout = subprocess.PIPE, shell = True)
-        out, err = proc.communicate()
+        command = ['condor_rm', '-constraint', 'WMAgent_RequestName == "%s"' % workflow]
+        self.runCondorCommand(command)
+
+        return
+
+    def editJobGroup(self, jobIDs, attribute, value):
+        """
+        _editJobGroup_
+
+        Set a string attribute of a group of jobs with a single condor_qedit
+        """
+        command = ['condor_qedit', '-constraint', jobIDConstraint(jobIDs),
+                   attribute, '"%s"' % value]
+        self.runCondorCommand(command)
 
         return
 
+    def removeJobGroup(self, jobIDs):
+        """
+        _removeJobGroup_
+
+        Remove a group of jobs with a single condor_rm
+        """
+        command = ['condor_rm', '-constraint', jobIDConstraint(jobIDs)]
+        self.runCondorCommand(command)
+
+        return
+
+    def runCondorCommand(self, command):
+        """
+        _runCondorCommand_
+
+        Run a condor command through the command runner and log its errors
+        """
+        stdout, stderr, returnCode = self.commandRunner(cmd = command, shell = False)
+        if returnCode != 0:
+            logging.error("%s returned non-zero value %s" % (command[0], str(returnCode)))
+            logging.error("Command: %s\nstderr: %s" % (" ".join(command), stderr))
+
+        return returnCode
+
     def updateJobInformation(self, workflow, task, **kwargs):
         """
         _updateJobInformation_
@@ -1083,11 +1191,9 @@ class CondorPlugin(BasePlugin):
         """
         _getClassAds_
 
-        Grab classAds from condor_q using xml parsing
+        Grab classAds from condor_q, parsing its output while it is read
         """
 
-        jobInfo = {}
-
         command = ['condor_q', '-constraint', 'WMAgent_JobID =!= UNDEFINED',
                    '-constraint', 'WMAgent_AgentName == \"%s\"' % (self.agent),
                    '-format', '(JobStatus:\%s)  ', 'JobStatus',
@@ -1099,9 +1205,13 @@ class CondorPlugin(BasePlugin):
                    '-format', '(runningCMSSite:\%s)  ', 'MATCH_EXP_JOBGLIDEIN_CMSSite',
                    '-format', '(WMAgentID:\%d):::',  'WMAgent_JobID']
 
-        pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = subprocess.PIPE, shell = False)
-        stdout, _ = pipe.communicate()
-        classAdsRaw = stdout.split(':::')
+        devNull = open(os.devnull, 'w')
+        try:
+            pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = devNull, shell = False)
+            jobInfo = parseClassAds(pipe.stdout)
+            pipe.wait()
+        finally:
+            devNull.close()
 
         if not pipe.returncode == 0:
             # Then things have gotten bad - condor_q is not responding
@@ -1109,34 +1219,6 @@ class CondorPlugin(BasePlugin):
             logging.error("Skipping classAd processing this round")
             return None
 
-        if classAdsRaw == '':
-            # We have no jobs
-            return jobInfo
-
-        for ad in classAdsRaw:
-            # There should be one for every job
-            if not re.search("\(", ad):
-                # There is no ad.
-                # Don't know what happened here
-                continue
-            statements = ad.split('(')
-            tmpDict = {}
-            for statement in statements:
-                # One for each value
-                if not re.search(':', statement):
-                    # Then we have an empty statement
-                    continue
-                key = str(statement.split(':')[0])
-                value = statement.split(':')[1].split(')')[0]
-                tmpDict[key] = value
-            if not 'WMAgentID' in tmpDict.keys():
-                # Then we have an invalid job somehow
-                logging.error("Invalid job discovered in condor_q")
-                logging.error(tmpDict)
-                continue
-            else:
-                jobInfo[int(tmpDict['WMAgentID'])] = tmpDict
-
         logging.info("Retrieved %i classAds" % len(jobInfo))
 
         return jobInfo
@@ -29,6 +29,7 @@ from WMCore.DAOFactory                 import DAOFactory
 from WMCore.WMException                import WMException
 from WMCore.WMInit                     import getWMBASE
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
+from WMCore.BossAir.Plugins.CondorPlugin import jobIDConstraint
 from WMCore.FwkJobReport.Report        import Report
 from WMCore.Algorithms                 import SubprocessAlgos
 
@@ -215,6 +216,10 @@ class PyCondorPlugin(BasePlugin):
         self.errorCount    = 0
         self.defaultTaskPriority = getattr(config.BossAir, 'defaultTaskPriority', 0)
         self.maxTaskPriority     = getattr(config.BossAir, 'maxTaskPriority', 1e7)
+        self.bulkCommandSize     = getattr(config.BossAir, 'bulkCommandSize', 500)
+
+        # Connects to the schedd, replace it to work against something else
+        self.scheddFactory = condor.Schedd
 
         # Required for global pool accounting
         self.acctGroup = getattr(config.BossAir, 'acctGroup', "production")
@@ -592,12 +597,12 @@ class PyCondorPlugin(BasePlugin):
         else:
             logging.debug("PyCondor retrieved %s classAds from condor schedd" % (len(jobInfo)))
 
-        if len(jobInfo.keys()) == 0:
+        if len(jobInfo) == 0:
             noInfoFlag = True
 
         # Now go over the jobs from WMBS and see what we have
         for job in jobs:
-            if not job['jobid'] in jobInfo.keys():
+            if not job['jobid'] in jobInfo:
                 if noInfoFlag:
                     self.procJobNoInfo(job, changeList, completeList)
                 else:
@@ -699,6 +704,7 @@ class PyCondorPlugin(BasePlugin):
         """
         jobInfo, sd = self.getClassAds()
         jobtokill=[]
+        siteEdits = {}
         for job in jobs:
             jobID = job['id']
             jobAd = jobInfo.get(jobID)
@@ -713,8 +719,7 @@ class PyCondorPlugin(BasePlugin):
                         usi = desiredSites
                         if len(usi) > 1:
                             usi.remove(siteName)
-                            usi = ','.join(map(str, usi))
-                            sd.edit('WMAgent_JobID == %i'%jobID, "DESIRED_Sites", classad.ExprTree('"%s"'% usi))
+                            siteEdits[jobID] = ','.join(map(str, usi))
                         else:
                             jobtokill.append(job)
                     else:
@@ -725,12 +730,14 @@ class PyCondorPlugin(BasePlugin):
                     if siteName not in desiredSites and siteName in extDesiredSites:
                         usi = desiredSites
                         usi.append(siteName)
-                        usi = ','.join(map(str, usi))
-                        sd.edit('WMAgent_JobID == %i'%jobID, "DESIRED_Sites", classad.ExprTree('"%s"'% usi))
+                        siteEdits[jobID] = ','.join(map(str, usi))
                     else:
                         #If job doesn't have the siteName in the siteList, just ignore it
                         logging.debug("Cannot find siteName %s in the sitelist" % siteName)
 
+        # Jobs with the same new site list are edited together
+        self.editJobs(siteEdits, 'DESIRED_Sites')
+
         return jobtokill
 
 
@@ -742,11 +749,39 @@ class PyCondorPlugin(BasePlugin):
         Kill a list of jobs based on the WMBS job names.
         Kill can happen for schedd running on localhost... TBC.
         """
-        sd = condor.Schedd()
-        for job in jobs:
-            logging.debug("Going to remove jobid=%i from the queue" % job['jobid'])
-            sd.act(condor.JobAction.Remove, 'WMAgent_JobID == %i' % job['jobid'])
-            logging.debug("Removed jobid=%i from the queue" % job['jobid'])
+        logging.debug("Going to remove %i jobs from the queue" % len(jobs))
+        self.removeJobs([job['jobid'] for job in jobs])
+
+        return
+
+    def editJobs(self, edits, attribute):
+        """
+        _editJobs_
+
+        Set attribute to edits[jobID] for every job in the edits dictionary,
+        one edit per group of jobs getting the same value, all of them in a
+        single schedd transaction.
+        """
+        editGroups = self.groupJobEdits(edits)
+        if not editGroups:
+            return
+
+        sd = self.scheddFactory()
+        with sd.transaction():
+            for value, jobIDs in editGroups:
+                sd.edit(jobIDConstraint(jobIDs), attribute, classad.ExprTree('"%s"' % value))
+
+        return
+
+    def removeJobGroup(self, jobIDs):
+        """
+        _removeJobGroup_
+
+        Remove a group of jobs with a single schedd action
+        """
+        sd = self.scheddFactory()
+        sd.act(condor.JobAction.Remove, jobIDConstraint(jobIDs))
+        logging.debug("Removed %i jobs from the queue" % len(jobIDs))
 
         return
 
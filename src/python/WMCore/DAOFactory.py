@@ -3,44 +3,181 @@ A basic action is a thing that will run a SQL statement
 
 A more complex one would be something that ran multiple SQL
 objects to produce a single output.
+
+DAO classes are resolved once per process: the dialect of a database
+interface is worked out once per SQLAlchemy dialect type and the classes
+imported by any DAOFactory are kept in a registry keyed by package, dialect
+and class name, so acquiring a DAO in a loop only costs its instantiation.
 """
+
+import logging
+import os
+import threading
+
+_daoClasses = {}
+_dialectNames = {}
+_registryLock = threading.Lock()
+
+
+def resolveDialect(dbinterface):
+    """
+    _resolveDialect_
+
+    Name of the DAO dialect (Oracle, MySQL, SQLite or CouchDB) used with a
+    database interface.
+    """
+    if isinstance(dbinterface, str):
+        return 'CouchDB'
+
+    dia = dbinterface.engine.dialect
+    dialect = _dialectNames.get(type(dia), None)
+    if dialect != None:
+        return dialect
+
+    from WMCore.Database.Dialects import MySQLDialect
+    from WMCore.Database.Dialects import SQLiteDialect
+    from WMCore.Database.Dialects import OracleDialect
+    dialects = {"Oracle" : OracleDialect,
+                "MySQL" : MySQLDialect,
+                "SQLite" : SQLiteDialect}
+    for i in dialects.keys():
+        if isinstance(dia, dialects[i]):
+            dialect = i
+    if not dialect:
+        raise TypeError("unknown connection type: %s" % dia)
+
+    _dialectNames[type(dia)] = dialect
+    return dialect
+
+
+def loadDAOClass(package, dialect, classname):
+    """
+    _loadDAOClass_
+
+    Import package.dialect.classname and return the DAO class it holds,
+    from the registry if it was already loaded by this process.
+    """
+    key = (package, dialect, classname)
+    daoClass = _daoClasses.get(key, None)
+    if daoClass != None:
+        return daoClass
+
+    _registryLock.acquire()
+    try:
+        daoClass = _daoClasses.get(key, None)
+        if daoClass == None:
+            module = "%s.%s.%s" % (package, dialect, classname)
+            module = __import__(module, globals(), locals(), [classname])
+            daoClass = getattr(module, classname.split('.')[-1])
+            _daoClasses[key] = daoClass
+        return daoClass
+    finally:
+        _registryLock.release()
+
+
+def clearDAOCache():
+    """
+    _clearDAOCache_
+
+    Forget all the DAO classes and dialects resolved so far.
+    """
+    _registryLock.acquire()
+    try:
+        _daoClasses.clear()
+        _dialectNames.clear()
+    finally:
+        _registryLock.release()
+
+
 class DAOFactory(object):
-    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner=""):
+    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner="",
+                 cacheInstances = False):
         self.package = package
         self.logger = logger
         self.dbinterface = dbinterface
         self.owner = owner
         #self.logger.debug("Instantiating DAOFactory for %s package" % self.package)
-        from WMCore.Database.Dialects import MySQLDialect
-        from WMCore.Database.Dialects import SQLiteDialect
-        from WMCore.Database.Dialects import OracleDialect
-        self.dialects = {"Oracle" : OracleDialect,
-                    "MySQL" : MySQLDialect,
-                    "SQLite" : SQLiteDialect}
+        # Reusing DAO objects is only safe for DAOs that keep no state
+        # between calls, so it has to be asked for.
+        self.cacheInstances = cacheInstances
+        self.instances = {}
+        self._dialect = None
+        self._dialectInterface = None
+
+    @property
+    def dialect(self):
+        """
+        Dialect of the database interface, resolved once per interface
+        """
+        if self._dialect == None or self._dialectInterface is not self.dbinterface:
+            self._dialect = resolveDialect(self.dbinterface)
+            self._dialectInterface = self.dbinterface
+        return self._dialect
 
     def __call__(self, classname):
         """
         Somewhat fugly method to load generic SQL classes...
         """
-        if not isinstance(self.dbinterface, str):
+        if self.cacheInstances:
+            instance = self.instances.get(classname, None)
+            if instance != None and getattr(instance, 'dbi', None) is self.dbinterface:
+                return instance
 
-            dia = self.dbinterface.engine.dialect
-            #TODO: Make good
-            dialect = None
-            for i in self.dialects.keys():
-                if isinstance(dia, self.dialects[i]):
-                    dialect = i
-            if not dialect:
-                raise TypeError("unknown connection type: %s" % dia)
+        daoClass = loadDAOClass(self.package, self.dialect, classname)
+        if self.owner:
+            instance = daoClass(self.logger, self.dbinterface, self.owner)
         else:
-            dialect = 'CouchDB'
+            instance = daoClass(self.logger, self.dbinterface)
 
+        if self.cacheInstances:
+            self.instances[classname] = instance
+        return instance
 
-        module = "%s.%s.%s" % (self.package, dialect, classname)
-        #self.logger.debug("importing %s, %s" % (module, classname))
-        module = __import__(module, globals(), locals(), [classname])#, -1)
-        instance = getattr(module, classname.split('.')[-1])
-        if self.owner:
-            return instance(self.logger, self.dbinterface, self.owner)
-        else:
-            return instance(self.logger, self.dbinterface)
+    def preload(self, classnames = None):
+        """
+        _preload_
+
+        Import the given DAO classes, or all the DAO classes of the package
+        for the dialect in use, so that the first call for them doesn't pay
+        for the import.  Returns the number of classes loaded, failures are
+        logged and skipped.
+        """
+        if classnames == None:
+            classnames = self.listClassnames()
+
+        logger = self.logger or logging
+        loaded = 0
+        for classname in classnames:
+            try:
+                loadDAOClass(self.package, self.dialect, classname)
+                loaded += 1
+            except (ImportError, AttributeError) as ex:
+                logger.debug("Could not preload DAO %s.%s.%s: %s" % \
+                             (self.package, self.dialect, classname, str(ex)))
+        return loaded
+
+    def listClassnames(self):
+        """
+        _listClassnames_
+
+        Names of all the DAO modules of the package for the dialect in use,
+        as passed to __call__.
+        """
+        module = "%s.%s" % (self.package, self.dialect)
+        module = __import__(module, globals(), locals(), ['__name__'])
+        baseDir = os.path.dirname(module.__file__)
+
+        classnames = []
+        for dirPath, dirNames, fileNames in os.walk(baseDir):
+            dirNames[:] = [x for x in dirNames \
+                           if os.path.exists(os.path.join(dirPath, x, '__init__.py'))]
+            relPath = os.path.relpath(dirPath, baseDir)
+            for fileName in fileNames:
+                name, ext = os.path.splitext(fileName)
+                if ext != '.py' or name == '__init__':
+                    continue
+                if relPath == os.curdir:
+                    classnames.append(name)
+                else:
+                    classnames.append("%s.%s" % (relPath.replace(os.sep, '.'), name))
+        return sorted(classnames)
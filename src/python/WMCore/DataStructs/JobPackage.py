@@ -9,9 +9,13 @@ Data structure for storing and retreiving multiple job objects.
 
 
 import cPickle
+import zlib
 
 from WMCore.DataStructs.WMObject import WMObject
 
+# First byte of a zlib stream with the default window size
+ZLIB_HEADER = "\x78"
+
 class JobPackage(WMObject, dict):
     """
     _JobPackage_
@@ -28,25 +32,39 @@ class JobPackage(WMObject, dict):
         dict.__init__(self)
         self.setdefault('directory', directory)
 
-    def save(self, fileName):
+    def save(self, fileName, compress = False):
         """
         _save_
 
-        Pickle this object and save it to disk.
+        Pickle this object and save it to disk, optionally zlib compressed.
+        The whole package is written with a single write as packages often
+        live on network filesystems.
         """
-        fileHandle = open(fileName, "w")
-        cPickle.dump(self, fileHandle, -1)
-        fileHandle.close()
+        data = cPickle.dumps(self, cPickle.HIGHEST_PROTOCOL)
+        if compress:
+            data = zlib.compress(data, 1)
+        fileHandle = open(fileName, "wb")
+        try:
+            fileHandle.write(data)
+        finally:
+            fileHandle.close()
         return
 
     def load(self, fileName):
         """
         _load_
 
-        Load a pickled JobPackage object.
+        Load a pickled JobPackage object.  Compressed packages are
+        recognized by the zlib header, no pickle starts with it.
         """
-        fileHandle = open(fileName, "r")
-        loadedJobPackage = cPickle.load(fileHandle)
+        fileHandle = open(fileName, "rb")
+        try:
+            data = fileHandle.read()
+        finally:
+            fileHandle.close()
+        if data[:1] == ZLIB_HEADER:
+            data = zlib.decompress(data)
+        loadedJobPackage = cPickle.loads(data)
         self.clear()
         self.update(loadedJobPackage)
         return
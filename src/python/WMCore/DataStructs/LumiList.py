@@ -13,10 +13,75 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
-import copy
 import json
 import re
 import urllib2
+from array import array
+from bisect import bisect_right
+from itertools import repeat
+
+
+def _subtractRanges(aRanges, bRanges):
+    """
+    Ranges of aRanges not in bRanges.  Both are sorted lists of disjoint
+    [first, last] ranges, they are merged in a single pass.
+    """
+    result = []
+    j = 0
+    nB = len(bRanges)
+    for first, last in aRanges:
+        current = first
+        while j < nB and bRanges[j][1] < current:
+            j += 1
+        k = j
+        while k < nB and bRanges[k][0] <= last:
+            if bRanges[k][0] > current:
+                result.append([current, bRanges[k][0] - 1])
+            current = max(current, bRanges[k][1] + 1)
+            if current > last:
+                break
+            k += 1
+        if current <= last:
+            result.append([current, last])
+    return result
+
+
+def _intersectRanges(aRanges, bRanges):
+    """
+    Ranges in both aRanges and bRanges, in a single pass over both.
+    """
+    result = []
+    i = j = 0
+    nA, nB = len(aRanges), len(bRanges)
+    while i < nA and j < nB:
+        first = max(aRanges[i][0], bRanges[j][0])
+        last = min(aRanges[i][1], bRanges[j][1])
+        if first <= last:
+            if result and result[-1][1] + 1 == first:
+                result[-1][1] = last
+            else:
+                result.append([first, last])
+        if aRanges[i][1] < bRanges[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _unionRanges(aRanges, bRanges):
+    """
+    Ranges in either aRanges or bRanges.  Sorting two sorted lists is a
+    linear merge.
+    """
+    result = []
+    for first, last in sorted(aRanges + bRanges):
+        if result and first <= result[-1][1] + 1:
+            if last > result[-1][1]:
+                result[-1][1] = last
+        else:
+            result.append([first, last])
+    return result
+
 
 class LumiList(object):
     """
@@ -43,6 +108,11 @@ class LumiList(object):
         '1:1-1:33,1:35,1:37-1:47,2:1-2:45,2:50-2:80'
         The string used by CMSSW in lumisToProcess or lumisToSkip
         is a subset of the compactList example above
+
+    The ranges of every run are kept sorted and disjoint, the set operations
+    merge them in a single pass.  For lookups (contains, filterLumis) the
+    ranges of each run are also kept in two arrays of first and last lumis,
+    built on first use, which are binary searched.
     """
 
 
@@ -53,6 +123,7 @@ class LumiList(object):
         """
         self.compactList = {}
         self.duplicates = {}
+        self._rangeArrays = {}
         if filename:
             self.filename = filename
             jsonFile = open(self.filename,'r')
@@ -118,28 +189,9 @@ class LumiList(object):
 
     def __sub__(self, other): # Things from self not in other
         result = {}
-        for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
+        for run in self.compactList.keys():
+            result[run] = _subtractRanges(self.compactList[run],
+                                          other.compactList.get(run, []))
 
         return LumiList(compactList = result)
 
@@ -149,29 +201,8 @@ class LumiList(object):
         aruns = set(self.compactList.keys())
         bruns = set(other.compactList.keys())
         for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
+            result[run] = _intersectRanges(self.compactList[run],
+                                           other.compactList[run])
         return LumiList(compactList = result)
 
 
@@ -181,14 +212,8 @@ class LumiList(object):
         bruns = other.compactList.keys()
         runs = set(aruns + bruns)
         for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
+            result[run] = _unionRanges(self.compactList.get(run, []),
+                                       other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
@@ -200,22 +225,75 @@ class LumiList(object):
         '''Returns number of runs in list'''
         return len(self.compactList)
 
+    def _getRangeArrays(self, run):
+        """
+        Return the arrays of first and last lumis of the ranges of a run and
+        the first lumi of a range open to the end of the run (last lumi 0),
+        or None if the run isn't in the list.
+        """
+        if run not in self._rangeArrays:
+            lumiRanges = self.compactList.get(run)
+            if not lumiRanges:
+                self._rangeArrays[run] = None
+            else:
+                openFirst = None
+                for first, last in lumiRanges:
+                    if last == 0 and (openFirst is None or first < openFirst):
+                        openFirst = first
+                self._rangeArrays[run] = (array('l', [x[0] for x in lumiRanges]),
+                                          array('l', [x[1] for x in lumiRanges]),
+                                          openFirst)
+        return self._rangeArrays[run]
+
     def filterLumis(self, lumiList):
         """
         Return a list of lumis that are in compactList.
         lumilist is of the simple form
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
+        or any other iterable of (run, lumi) pairs
         """
         filteredList = []
+        runArrays = {}
         for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
+            try:
+                ranges = runArrays[run]
+            except KeyError:
+                ranges = runArrays[run] = self._getRangeArrays(str(run))
+            if ranges is None:
+                continue
+            index = bisect_right(ranges[0], lumi) - 1
+            if index >= 0 and lumi <= ranges[1][index]:
+                filteredList.append((run, lumi))
         return filteredList
 
 
+    def filterRunLumis(self, run, lumis):
+        """
+        Return the lumis of a single run that are in compactList, keeping
+        their order, like filterLumis does for (run, lumi) pairs.  Sorted
+        lumis are filtered in a single pass over the ranges of the run.
+        """
+        ranges = self._getRangeArrays(str(run))
+        if ranges is None:
+            return []
+        firstLumis, lastLumis = ranges[0], ranges[1]
+
+        filteredLumis = []
+        index = 0
+        nRanges = len(firstLumis)
+        previous = None
+        for lumi in lumis:
+            if previous is not None and lumi < previous:
+                # Not sorted, start over from the first range
+                index = 0
+            previous = lumi
+            while index < nRanges and lastLumis[index] < lumi:
+                index += 1
+            if index < nRanges and firstLumis[index] <= lumi:
+                filteredLumis.append(lumi)
+        return filteredLumis
+
+
     def __str__ (self):
         doubleBracketRE = re.compile (r']],')
         return doubleBracketRE.sub (']],\n',
@@ -245,9 +323,9 @@ class LumiList(object):
         runs.sort(key=int)
         for run in runs:
             lumis = self.compactList[run]
+            runNumber = int(run)
             for lumiPair in sorted(lumis):
-                for lumi in range(lumiPair[0], lumiPair[1]+1):
-                    theList.append((int(run), lumi))
+                theList.extend(zip(repeat(runNumber), xrange(lumiPair[0], lumiPair[1]+1)))
 
         return theList
 
@@ -321,6 +399,7 @@ class LumiList(object):
             if run in self.compactList:
                 del self.compactList[run]
 
+        self._rangeArrays = {}
         return
 
 
@@ -336,6 +415,7 @@ class LumiList(object):
         for run in runsToDelete:
             del self.compactList[run]
 
+        self._rangeArrays = {}
         return
 
     def contains (self, run, lumiSection = None):
@@ -356,21 +436,22 @@ class LumiList(object):
                 run         = run[0]
             except:
                 raise RuntimeError("Improper format for run '%s'" % run)
-        lumiRangeList = self.compactList.get( str(run) )
-        if not lumiRangeList:
+        try:
+            ranges = self._rangeArrays[str(run)]
+        except KeyError:
+            ranges = self._getRangeArrays(str(run))
+        if ranges is None:
             # the run isn't there, so no need to look any further
             return False
-        for lumiRange in lumiRangeList:
-            # we want to make this as found if either the lumiSection
-            # is inside the range OR if the lumi section is greater
-            # than or equal to the lower bound of the lumi range and
-            # the upper bound is 0 (which means extends to the end of
-            # the run)
-            if lumiRange[0] <= lumiSection and \
-               (0 == lumiRange[1] or lumiSection <= lumiRange[1]):
-                # got it
-                return True
-        return False
+        # we want to make this as found if either the lumiSection
+        # is inside the range OR if the lumi section is greater
+        # than or equal to the lower bound of the lumi range and
+        # the upper bound is 0 (which means extends to the end of
+        # the run)
+        if ranges[2] is not None and ranges[2] <= lumiSection:
+            return True
+        index = bisect_right(ranges[0], lumiSection) - 1
+        return index >= 0 and lumiSection <= ranges[1][index]
 
 
     def __contains__ (self, runTuple):
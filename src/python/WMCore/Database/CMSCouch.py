@@ -7,6 +7,10 @@ A simple API to CouchDB that sends HTTP requests to the REST interface.
 http://wiki.apache.org/couchdb/API_Cheatsheet
 
 NOT A THREAD SAFE CLASS.
+
+A Database can hand the documents it queues to a CommitQueue instead, which
+commits them in batches on a background thread, see
+Database.startCommitQueue.
 """
 
 
@@ -17,6 +21,7 @@ import re
 import hashlib
 import base64
 import logging
+import threading
 from httplib import HTTPException
 from datetime import timedelta, datetime
 
@@ -169,6 +174,7 @@ class Database(CouchDBRequests):
         self._queue_size = size
         self.threads = []
         self.last_seq = 0
+        self.commitQueue = None
 
     def _reset_queue(self):
         """
@@ -202,7 +208,9 @@ class Database(CouchDBRequests):
         """
         if timestamp:
             self.timestamp(doc, timestamp)
-        #TODO: Thread this off so that it's non blocking...
+        if self.commitQueue:
+            self.commitQueue.put(doc, callback = callback)
+            return
         if len(self._queue) >= self._queue_size:
             print 'queue larger than %s records, committing' % self._queue_size
             self.commit(viewlist=viewlist, callback = callback)
@@ -257,9 +265,16 @@ class Database(CouchDBRequests):
 
         Returns a list of good documents
             throws an exception otherwise
+
+        With a commit queue running, the documents are committed by the queue
+        and this waits for all the queued documents to be committed, returning
+        the rows of the documents that failed, see CommitQueue.flush.
         """
         if (doc):
-            self.queue(doc, timestamp, viewlist)
+            self.queue(doc, timestamp, viewlist, callback)
+
+        if self.commitQueue:
+            return self.commitQueue.flush()
 
         if len(self._queue) == 0:
             return
@@ -282,6 +297,43 @@ class Database(CouchDBRequests):
 
         return retval
 
+    def startCommitQueue(self, batchSize = None, interval = 5, maxPending = None):
+        """
+        Commit the documents queued from now on in the background, in batches
+        of up to batchSize documents (the queue size by default) at least
+        every interval seconds.  Queueing blocks while maxPending documents
+        (10 batches by default) are waiting to be committed.
+        """
+        if self.commitQueue:
+            return self.commitQueue
+        batchSize = batchSize or self._queue_size
+        self.commitQueue = CommitQueue(self, batchSize, interval,
+                                       maxPending or 10 * batchSize)
+        for doc in self._queue:
+            self.commitQueue.put(doc)
+        self._reset_queue()
+        return self.commitQueue
+
+    def stopCommitQueue(self):
+        """
+        Commit the documents left in the commit queue, stop it and go back
+        to committing synchronously.  Returns the rows of the documents that
+        failed.
+        """
+        if not self.commitQueue:
+            return []
+        commitQueue = self.commitQueue
+        self.commitQueue = None
+        return commitQueue.close()
+
+    def flush(self, timeout = None):
+        """
+        Wait for all the queued documents to be committed.
+        """
+        if self.commitQueue:
+            return self.commitQueue.flush(timeout)
+        return self.commit()
+
     def document(self, id, rev = None):
         """
         Load a document identified by id. You can specify a rev to see an older revision
@@ -608,6 +660,231 @@ class Database(CouchDBRequests):
             self.queueDelete(doc)
         return self.commit()
 
+class CommitQueue(object):
+    """
+    _CommitQueue_
+
+    Bounded buffer of documents committed to a database in batches by a
+    background thread.  A batch is committed as soon as batchSize documents
+    are waiting, when the oldest waiting document has been queued for
+    interval seconds, or on flush.  The conflict callback of a document is
+    applied to its row of the bulk commit result.
+
+    The rows of the documents that failed are kept until the next flush.  If
+    a batch can't be posted it is retried every interval seconds, and the
+    error is raised by flush.
+    """
+    def __init__(self, database, batchSize = 1000, interval = 5, maxPending = 10000):
+        self.database = database
+        self.batchSize = batchSize
+        self.interval = interval
+        self.maxPending = max(maxPending, batchSize)
+        self.condition = threading.Condition()
+        self.pending = []
+        self.firstQueued = None
+        self.inFlight = 0
+        self.flushing = 0
+        self.closing = False
+        self.failed = []
+        self.error = None
+        self.counters = {'queued': 0, 'committed': 0, 'batches': 0,
+                         'conflicts': 0, 'failed': 0, 'errors': 0,
+                         'blocked_time': 0.0}
+
+        self.thread = threading.Thread(target = self.run,
+                                       name = "CommitQueue-%s" % database.name)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def put(self, doc, callback = None, timeout = None):
+        """
+        _put_
+
+        Queue a document, waiting for room if maxPending documents are
+        waiting already.  Returns False if there was no room after timeout
+        seconds.
+        """
+        self.condition.acquire()
+        try:
+            if self.closing:
+                raise RuntimeError("Commit queue of %s is closed" % self.database.name)
+            if len(self.pending) >= self.maxPending:
+                startTime = time.time()
+                while len(self.pending) >= self.maxPending:
+                    remaining = None
+                    if timeout != None:
+                        remaining = startTime + timeout - time.time()
+                        if remaining <= 0:
+                            return False
+                    self.condition.wait(remaining)
+                self.counters['blocked_time'] += time.time() - startTime
+            if not self.pending:
+                self.firstQueued = time.time()
+            self.pending.append((doc, callback))
+            self.counters['queued'] += 1
+            if len(self.pending) >= self.batchSize:
+                self.condition.notifyAll()
+            return True
+        finally:
+            self.condition.release()
+
+    def flush(self, timeout = None):
+        """
+        _flush_
+
+        Commit the queued documents now and wait until they are.  Returns the
+        rows of the documents that failed since the last flush, raises the
+        error if a batch couldn't be posted.
+        """
+        self.condition.acquire()
+        try:
+            self.flushing += 1
+            self.condition.notifyAll()
+            startTime = time.time()
+            try:
+                while (self.pending or self.inFlight) and self.error == None:
+                    remaining = None
+                    if timeout != None:
+                        remaining = startTime + timeout - time.time()
+                        if remaining <= 0:
+                            break
+                    self.condition.wait(remaining)
+            finally:
+                self.flushing -= 1
+
+            error = self.error
+            self.error = None
+            failed = self.failed
+            self.failed = []
+        finally:
+            self.condition.release()
+        if error != None:
+            raise error
+        return failed
+
+    def close(self):
+        """
+        _close_
+
+        Commit the queued documents and stop the background thread.  Returns
+        the rows of the documents that failed.
+        """
+        self.condition.acquire()
+        try:
+            self.closing = True
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+        self.thread.join()
+        return self.flush()
+
+    def stats(self):
+        """
+        _stats_
+
+        Counters of the queue, for monitoring.
+        """
+        self.condition.acquire()
+        try:
+            stats = dict(self.counters)
+            stats['pending'] = len(self.pending)
+            return stats
+        finally:
+            self.condition.release()
+
+    def batchReady(self):
+        """
+        _batchReady_
+
+        Whether a batch should be committed now.
+        """
+        if not self.pending:
+            return False
+        if self.closing or self.flushing or len(self.pending) >= self.batchSize:
+            return True
+        return time.time() - self.firstQueued >= self.interval
+
+    def run(self):
+        """
+        _run_
+
+        Commit batches until the queue is closed and empty.
+        """
+        while True:
+            self.condition.acquire()
+            try:
+                while not self.batchReady():
+                    if self.closing and not self.pending:
+                        return
+                    if self.pending:
+                        self.condition.wait(max(self.firstQueued + self.interval - time.time(), 0.01))
+                    else:
+                        self.condition.wait()
+                batch = self.pending[:self.batchSize]
+                del self.pending[:len(batch)]
+                self.inFlight = len(batch)
+                self.firstQueued = time.time()
+                # make room for the blocked producers
+                self.condition.notifyAll()
+            finally:
+                self.condition.release()
+
+            try:
+                failed, conflicts = self.commitBatch(batch)
+                error = None
+            except Exception as ex:
+                logging.error("Could not commit %i documents to %s: %s" % \
+                              (len(batch), self.database.name, str(ex)))
+                error = ex
+
+            self.condition.acquire()
+            try:
+                self.inFlight = 0
+                if error == None:
+                    self.failed.extend(failed)
+                    self.counters['committed'] += len(batch)
+                    self.counters['batches'] += 1
+                    self.counters['conflicts'] += conflicts
+                    self.counters['failed'] += len(failed)
+                else:
+                    # try again, keeping the order of the documents
+                    self.pending[0:0] = batch
+                    self.error = error
+                    self.counters['errors'] += 1
+                self.condition.notifyAll()
+                if error != None and not self.closing:
+                    self.condition.wait(self.interval)
+                elif error != None:
+                    # don't retry forever on close
+                    self.counters['failed'] += len(self.pending)
+                    self.pending = []
+            finally:
+                self.condition.release()
+
+    def commitBatch(self, batch):
+        """
+        _commitBatch_
+
+        Post a batch with the bulk docs API and apply the conflict callbacks.
+        Returns the rows of the documents that failed and the number of
+        conflicts.
+        """
+        uri = '/%s/_bulk_docs/' % self.database.name
+        data = {'docs': [doc for doc, _ in batch]}
+        retval = self.database.post(uri, data)
+        failed = []
+        conflicts = 0
+        for idx, result in enumerate(retval):
+            if result.get('error', None) == 'conflict':
+                conflicts += 1
+                callback = batch[idx][1]
+                if callback:
+                    result = callback(self.database, data, result)
+            if isinstance(result, dict) and result.get('error', None):
+                failed.append(result)
+        return failed, conflicts
+
+
 class RotatingDatabase(Database):
     """
     A rotating database is actually multiple databases:
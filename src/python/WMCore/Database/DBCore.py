@@ -9,11 +9,93 @@ Core Database APIs
 
 
 
+import re
+
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet, resultRowType
 from copy import copy
 import WMCore.WMLogging
 
+# Column alias used to tag the rows of a bulk select with their bind
+BULK_KEY_COLUMN = "wmcore_bulk_key"
+
+_selectHead = re.compile(r"^\s*select(\s+distinct)?\s", re.IGNORECASE)
+_whereClause = re.compile(r"\bwhere\b", re.IGNORECASE)
+_fromClause = re.compile(r"\bfrom\b", re.IGNORECASE)
+_starColumn = re.compile(r"(^|,)\s*(\w+\.)?\*\s*(,|$)")
+_notBulkSelect = re.compile(r"\b(count|sum|min|max|avg)\s*\(|"
+                            r"\b(group\s+by|having|union|intersect|minus|rownum|limit|or|for\s+update)\b",
+                            re.IGNORECASE)
+
+def _depth(sql, position):
+    """
+    _depth_
+
+    Parenthesis nesting level of a position in a statement.
+    """
+    return sql.count("(", 0, position) - sql.count(")", 0, position)
+
+def _collationKey(value):
+    """
+    _collationKey_
+
+    What a string compares as under a case insensitive, trailing space
+    padded collation like the MySQL defaults.
+    """
+    if isinstance(value, basestring):
+        return value.lower().rstrip(" ")
+    return value
+
+def bulkSelectTemplate(sql, bindName):
+    """
+    _bulkSelectTemplate_
+
+    Check if a select with a single bind variable can be run for many binds
+    at once, i.e. the bind is only used in a "column = :bind" condition of
+    the top level WHERE clause, ANDed with the other conditions, and the
+    select has no aggregates, grouping or row limits outside of subqueries.
+
+    Selects of "*" or "table.*" can't have the key column put in front of
+    them, so they aren't run in bulk either.
+
+    Returns None if it can't, otherwise the column and the statement split
+    around the condition:
+
+      (column, "SELECT column AS wmcore_bulk_key, ... WHERE column IN (", ") ...")
+    """
+    head = _selectHead.match(sql)
+    if head == None:
+        return None
+    for match in _notBulkSelect.finditer(sql):
+        # Scalar subqueries may use them
+        if _depth(sql, match.start()) == 0:
+            return None
+
+    topFrom = [x.start() for x in _fromClause.finditer(sql, head.end())
+               if _depth(sql, x.start()) == 0]
+    if len(topFrom) == 0 or _starColumn.search(sql[head.end():topFrom[0]].strip()):
+        return None
+
+    bindPattern = r":%s(?!\w)" % re.escape(bindName)
+    if len(re.findall(bindPattern, sql, re.IGNORECASE)) != 1:
+        return None
+    condition = re.search(r"([\w\.]+)\s*=\s*" + bindPattern, sql, re.IGNORECASE)
+    if condition == None:
+        return None
+
+    if _depth(sql, condition.start()) != 0:
+        return None
+    topWhere = [x.start() for x in _whereClause.finditer(sql, 0, condition.start())
+                if _depth(sql, x.start()) == 0]
+    if len(topWhere) == 0:
+        return None
+
+    column = condition.group(1)
+    prefix = "%s%s AS %s, %s%s IN (" % (sql[:head.end()], column, BULK_KEY_COLUMN,
+                                       sql[head.end():condition.start()], column)
+    suffix = ")" + sql[condition.end():]
+    return (column, prefix, suffix)
+
 class DBInterface(WMObject):
     """
     Base class for doing SQL operations using a SQLAlchemy engine, or
@@ -37,6 +119,11 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        # Rows fetched from the cursor at a time
+        self.fetchSize = 1000
+        # Binds per query of a bulk select, 0 runs selects once per bind
+        self.bulkSelectSize = 500
+        self.bulkSelectTemplates = {}
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -68,10 +155,25 @@ class DBInterface(WMObject):
             return resultProxy
 
         result = ResultSet()
-        result.add(resultProxy)
+        result.add(resultProxy, self.fetchSize)
         resultProxy.close()
         return result
 
+    def executestream(self, s=None, b=None, connection=None, fetchSize=None):
+        """
+        _executestream_
+
+        Execute a select and return a StreamingResultSet that fetches its
+        rows fetchSize at a time.  Server side cursors are used where the
+        driver supports them.
+        """
+        connection = connection.execution_options(stream_results=True)
+        if b == None:
+            resultProxy = connection.execute(s)
+        else:
+            resultProxy = connection.execute(s, b)
+        return StreamingResultSet(resultProxy, fetchSize or self.fetchSize)
+
     def executemanybinds(self, s=None, b=None, connection=None,
                          returnCursor=False):
         """
@@ -95,6 +197,11 @@ class DBInterface(WMObject):
             """
             Trying to select many
             """
+            if not returnCursor:
+                result = self.bulkselect(s, b, connection)
+                if result != None:
+                    return self.makelist(result)
+
             if returnCursor:
                 result = []
                 for bind in b:
@@ -103,7 +210,7 @@ class DBInterface(WMObject):
                 result = ResultSet()
                 for bind in b:
                     resultproxy = connection.execute(s, bind)
-                    result.add(resultproxy)
+                    result.add(resultproxy, self.fetchSize)
                     resultproxy.close()
 
             return self.makelist(result)
@@ -114,6 +221,85 @@ class DBInterface(WMObject):
         result = connection.execute(s, b)
         return self.makelist(result)
 
+    def bulkselect(self, s, b, connection):
+        """
+        _bulkselect_
+
+        Run a select that has a list of binds with a single bind variable
+        as a few "column IN (...)" queries instead of one query per bind.
+
+        The rows are tagged with the value of the column and put back in
+        bind order, so the ResultSet holds the same rows as running the
+        select once per bind.  If a row can't be matched to a bind (e.g. the
+        database converted the bind to the column type or compared it case
+        insensitively), if some binds only differ in case or trailing spaces
+        or if the bulk query fails, the binds are run one by one.
+
+        Returns None if the select can't be run this way.
+        """
+        if self.bulkSelectSize < 1 or len(b) < 2:
+            return None
+        if not isinstance(b[0], dict) or len(b[0]) != 1:
+            return None
+        bindName = b[0].keys()[0]
+        for bind in b:
+            if len(bind) != 1 or bindName not in bind:
+                return None
+
+        templateKey = (s, bindName)
+        if templateKey not in self.bulkSelectTemplates:
+            self.bulkSelectTemplates[templateKey] = bulkSelectTemplate(s, bindName)
+        template = self.bulkSelectTemplates[templateKey]
+        if template == None:
+            return None
+        column, prefix, suffix = template
+
+        values = [bind[bindName] for bind in b]
+        try:
+            uniqueValues = list(set(values))
+        except TypeError:
+            # Unhashable binds, e.g. lists
+            return None
+        if len(set([_collationKey(value) for value in uniqueValues])) != len(uniqueValues):
+            # Rows matching both binds would all be tagged with one of them
+            return None
+        taggedRows = dict([(value, []) for value in uniqueValues])
+        keys = None
+        rowType = None
+        for start in range(0, len(uniqueValues), self.bulkSelectSize):
+            chunk = uniqueValues[start:start + self.bulkSelectSize]
+            bulkBinds = {}
+            bindNames = []
+            for index, value in enumerate(chunk):
+                name = "%s_%i" % (bindName, index)
+                bulkBinds[name] = value
+                bindNames.append(":%s" % name)
+            try:
+                chunkResult = self.executebinds(prefix + ", ".join(bindNames) + suffix,
+                                                bulkBinds, connection = connection)
+            except Exception as ex:
+                self.logger.debug("Bulk select failed, running it once per bind: %s" % str(ex))
+                self.bulkSelectTemplates[templateKey] = None
+                return None
+
+            if keys == None and len(chunkResult.keys) > 0:
+                keys = tuple(chunkResult.keys[1:])
+                rowType = resultRowType(keys)
+            for row in chunkResult.data:
+                rows = taggedRows.get(row[0], None)
+                if rows == None:
+                    # Can't tell which bind this row belongs to
+                    self.bulkSelectTemplates[templateKey] = None
+                    return None
+                rows.append(rowType(tuple(row)[1:]))
+
+        result = ResultSet()
+        if keys != None:
+            result.keys.extend(keys)
+        for value in values:
+            result.data.extend(taggedRows[value])
+        return result
+
     def connection(self):
         """
         Return a connection to the engine (from the connection pool)
@@ -121,6 +307,47 @@ class DBInterface(WMObject):
         return self.engine.connect()
 
 
+    def streamData(self, sqlstmt, binds={}, conn=None, fetchSize=None):
+        """
+        _streamData_
+
+        Generator version of processData for selects that return more rows
+        than should be held in memory.  Yields a StreamingResultSet for
+        every statement or set of binds, each of them has to be read before
+        the next one is requested.
+
+        set conn if you already have an active connection to reuse
+        """
+        connection = None
+        try:
+            if not conn:
+                connection = self.connection()
+            else:
+                connection = conn
+
+            sqlstmt = self.makelist(sqlstmt)
+            binds = self.makelist(binds)
+            if len(binds) == 0 or binds[0] == {} or binds[0] == None:
+                queries = [(s, None) for s in sqlstmt]
+            elif len(sqlstmt) == 1:
+                queries = [(sqlstmt[0], b) for b in binds]
+            elif len(binds) == len(sqlstmt):
+                queries = zip(sqlstmt, binds)
+            else:
+                raise Exception("""DBInterface.streamData Nothing executed, problem with your arguments
+                Probably mismatched sizes for sql (%i) and binds (%i)""" % (len(sqlstmt), len(binds)))
+
+            for s, b in queries:
+                result = self.executestream(s, b, connection=connection,
+                                            fetchSize=fetchSize)
+                try:
+                    yield result
+                finally:
+                    result.close()
+        finally:
+            if not conn and connection != None:
+                connection.close() # Return connection to the pool
+
     def processData(self, sqlstmt, binds={}, conn=None,
                     transaction=False, returnCursor=False):
         """
@@ -42,15 +42,17 @@ class DBFormatter(WMObject):
         """
         Some standard formatting, put all records into a list
         """
-        out = []
+        return list(self.iterFormat(result))
+
+    def iterFormat(self, result):
+        """
+        Generator version of format: yield the records one at a time, so
+        streamed results can be formatted without holding them in memory
+        """
         for r in result:
-            for i in r.fetchall():
-                row = []
-                for j in i:
-                    row.append(j)
-                out.append(row)
+            for i in r:
+                yield list(i)
             r.close()
-        return out
 
     def formatOne(self, result):
         """
@@ -66,26 +68,29 @@ class DBFormatter(WMObject):
         """
         Returns an array of dictionaries representing the results
         """
-        dictOut = []
+        return list(self.iterDict(result))
+
+    def iterDict(self, result):
+        """
+        Generator version of formatDict: yield the dictionaries one at a
+        time, so streamed results can be formatted without holding them in
+        memory
+        """
         for r in result:
-            descriptions = r.keys
-            for i in r.fetchall():
+            # WARNING: Oracle returns table names in CAP!
+            descriptions = [str(x.lower()) for x in r.keys]
+            for i in r:
                 #WARNING: this can generate errors for some stupid reason
                 # in both oracle and mysql.
-                entry = {}
-                for index in xrange(0,len(descriptions)):
-                    # WARNING: Oracle returns table names in CAP!
-                    if type(i[index]) == unicode:
-                        entry[str(descriptions[index].lower())] = str(i[index])
-                    else:
-                        entry[str(descriptions[index].lower())] = i[index]
+                entry = dict(zip(descriptions, i))
+                for key, value in entry.items():
+                    if type(value) == unicode:
+                        entry[key] = str(value)
 
-                dictOut.append(entry)
+                yield entry
 
             r.close()
 
-        return dictOut
-
     def formatOneDict(self, result):
         """
         Return a dictionary representing the first record
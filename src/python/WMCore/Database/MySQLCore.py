@@ -133,8 +133,26 @@ class MySQLInterface(DBInterface):
 
         Execute a SQL statement that has multiple sets of bind variables.
         Transform the bind variables into the format that MySQL expects.
+        Selects that can be run in bulk are handled before that, they go
+        through executebinds.
         """
+        if not returnCursor and s.strip().lower().startswith('select'):
+            result = self.bulkselect(s.strip(), b, connection)
+            if result != None:
+                return self.makelist(result)
+
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
                                             returnCursor)
+
+    def executestream(self, s = None, b = None, connection = None,
+                      fetchSize = None):
+        """
+        _executestream_
+
+        Execute a select that returns a StreamingResultSet.  Transform the
+        bind variables into the format that MySQL expects.
+        """
+        s, b = self.substitute(s, b)
+        return DBInterface.executestream(self, s, b, connection, fetchSize)
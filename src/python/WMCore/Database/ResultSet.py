@@ -4,6 +4,10 @@ _ResultSet_
 A class to read in a SQLAlchemy result proxy and hold the data, such that the
 SQLAlchemy result sets (aka cursors) can be closed. Make this class look as much
 like the SQLAlchemy class to minimise the impact of adding this class.
+
+The rows are kept as ResultRow tuples, which are as compact as plain tuples
+but can still be accessed like SQLAlchemy RowProxy objects.  Results too big
+to be held in memory can be read with a StreamingResultSet instead.
 """
 
 
@@ -11,11 +15,90 @@ like the SQLAlchemy class to minimise the impact of adding this class.
 
 import threading
 
+_rowTypes = {}
+
+def resultRowType(keys):
+    """
+    _resultRowType_
+
+    Return the ResultRow class for a list of column names.  The column names
+    live in the class, so the rows themselves only hold the values.
+    """
+    keys = tuple(keys)
+    rowType = _rowTypes.get(keys, None)
+    if rowType == None:
+        index = {}
+        for position, key in enumerate(keys):
+            index.setdefault(key, position)
+            index.setdefault(key.lower(), position)
+        rowType = type("ResultRow", (ResultRow,), {"__slots__": (),
+                                                   "_keys": keys,
+                                                   "_index": index})
+        _rowTypes[keys] = rowType
+    return rowType
+
+def _makeRow(keys, values):
+    """
+    _makeRow_
+
+    Unpickle a ResultRow.
+    """
+    return resultRowType(keys)(values)
+
+class ResultRow(tuple):
+    """
+    _ResultRow_
+
+    A row that isn't attached to a cursor.  Can be accessed like a SQLAlchemy
+    RowProxy: by position, by column name or as an attribute.  Use
+    resultRowType() to get the class for a set of columns.
+    """
+    __slots__ = ()
+    _keys = ()
+    _index = {}
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return zip(self._keys, self)
+
+    def has_key(self, key):
+        return key in self._index or key.lower() in self._index
+
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            index = self._index.get(key, None)
+            if index == None:
+                index = self._index[key.lower()]
+            return tuple.__getitem__(self, index)
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getslice__(self, i, j):
+        return tuple(self)[i:j]
+
+    def __reduce__(self):
+        return (_makeRow, (self._keys, tuple(self)))
+
 class ResultSet:
     def __init__(self):
         self.data = []
         self.keys = []
 
+    def __iter__(self):
+        return iter(self.data)
+
     def close(self):
         return
 
@@ -28,16 +111,67 @@ class ResultSet:
     def fetchall(self):
         return self.data
 
-    def add(self, resultproxy):
+    def add(self, resultproxy, fetchSize = 1000):
 
         myThread = threading.currentThread()
 
         if resultproxy.closed:
             return
         else:
-            for r in resultproxy:
-                if len(self.keys) == 0:
-                    self.keys.extend(r.keys())
-                self.data.append(r)
+            rowType = None
+            while True:
+                rows = resultproxy.fetchmany(fetchSize)
+                if len(rows) == 0:
+                    break
+                if rowType == None:
+                    rowType = resultRowType(rows[0].keys())
+                    if len(self.keys) == 0:
+                        self.keys.extend(rows[0].keys())
+                self.data.extend([rowType(r) for r in rows])
+
+        return
+
+class StreamingResultSet:
+    """
+    _StreamingResultSet_
+
+    ResultSet that reads the rows from the cursor fetchSize rows at a time
+    while it is iterated over, so only one batch of rows is held in memory.
+    It can only be iterated over once and the cursor stays open until all
+    the rows are read or it is closed.
+    """
+    def __init__(self, resultproxy, fetchSize = 1000):
+        self.resultproxy = resultproxy
+        self.fetchSize = fetchSize
+        if resultproxy.closed:
+            self.keys = []
+        else:
+            self.keys = list(resultproxy.keys())
+        self.rowType = resultRowType(self.keys)
+
+    def __iter__(self):
+        while not self.resultproxy.closed:
+            rows = self.resultproxy.fetchmany(self.fetchSize)
+            if len(rows) == 0:
+                self.close()
+                break
+            for row in rows:
+                yield self.rowType(row)
+        return
 
+    def close(self):
+        if not self.resultproxy.closed:
+            self.resultproxy.close()
         return
+
+    def fetchone(self):
+        if self.resultproxy.closed:
+            return []
+        row = self.resultproxy.fetchone()
+        if row == None:
+            self.close()
+            return []
+        return self.rowType(row)
+
+    def fetchall(self):
+        return list(self)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+"""
+_CompactReport_
+
+Compact on-disk format for framework job reports.
+
+The old format was a single cPickle (protocol 0) of the whole report
+ConfigSection tree, so every reader had to unpickle everything even if
+it only wanted the exit codes.  The compact format is:
+
+  MAGIC | version, header length | header | top section | step sections
+
+The header is a small binary pickle holding a per step summary (status,
+exit codes, start/stop times, number of output files) and the offset and
+length of every section.  Each section is an independent binary pickle,
+optionally zlib compressed, so the steps of a report can be loaded only
+when they are accessed.
+
+Reports passed between processes are packed as a marshal string of plain
+dictionaries and lists instead, which is decoded several times faster than
+unpickling the ConfigSection tree.
+"""
+
+import cPickle
+import marshal
+import struct
+import zlib
+
+from WMCore.Configuration import ConfigSection
+
+MAGIC = "WMFWJR"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("!HI")
+
+# Attributes of a section that don't travel in a packed report
+_LOCAL_ATTRIBUTES = set(["_internal_parent_ref", "_internal_filename",
+                         "_internal_header", "_internal_pending"])
+
+
+def isCompactReport(filename):
+    """
+    _isCompactReport_
+
+    Check if the report on disk is in the compact format.
+    """
+    handle = open(filename, 'rb')
+    try:
+        return handle.read(len(MAGIC)) == MAGIC
+    finally:
+        handle.close()
+
+
+def _newConfigSection():
+    """
+    _newConfigSection_
+
+    Create an empty ConfigSection to be filled by unpickling.
+    """
+    return ConfigSection.__new__(ConfigSection)
+
+
+def _dumpSection(section, compress):
+    """
+    _dumpSection_
+
+    Pickle a ConfigSection without following the reference to its parent.
+    """
+    parent = section._internal_parent_ref
+    section._internal_parent_ref = None
+    try:
+        blob = cPickle.dumps(section, cPickle.HIGHEST_PROTOCOL)
+    finally:
+        section._internal_parent_ref = parent
+    if compress:
+        blob = zlib.compress(blob)
+    return blob
+
+
+def _loadSection(blob, compress):
+    """
+    _loadSection_
+
+    Inverse of _dumpSection.
+    """
+    if compress:
+        blob = zlib.decompress(blob)
+    return cPickle.loads(blob)
+
+
+def writeCompactReport(data, summary, filename, compress = False):
+    """
+    _writeCompactReport_
+
+    Write the report ConfigSection data to filename.  summary is a dictionary
+    of per step summaries, keyed by step name, that will be stored in the
+    header.
+    """
+    steps = list(data.steps)
+
+    # The top level section is everything but the steps.  Its child
+    # sections still point to data, detach them while pickling.
+    top = ConfigSection.__new__(ConfigSection)
+    for key, value in data.__dict__.items():
+        if key not in steps:
+            top.__dict__[key] = value
+    top._internal_settings = data._internal_settings.difference(steps)
+    top._internal_children = data._internal_children.difference(steps)
+    top._internal_parent_ref = None
+
+    children = [getattr(top, x) for x in top._internal_children]
+    parents = [x._internal_parent_ref for x in children]
+    for child in children:
+        child._internal_parent_ref = None
+    try:
+        blobs = [("top", _dumpSection(top, compress))]
+    finally:
+        for child, parent in zip(children, parents):
+            child._internal_parent_ref = parent
+
+    for stepName in steps:
+        blobs.append((stepName, _dumpSection(getattr(data, stepName), compress)))
+
+    sections = {}
+    offset = 0
+    for name, blob in blobs:
+        sections[name] = (offset, len(blob))
+        offset += len(blob)
+
+    header = {"version": FORMAT_VERSION,
+              "steps": steps,
+              "compressed": compress,
+              "summary": summary,
+              "sections": sections}
+    headerBlob = cPickle.dumps(header, cPickle.HIGHEST_PROTOCOL)
+
+    handle = open(filename, 'wb')
+    try:
+        handle.write(MAGIC)
+        handle.write(_PREAMBLE.pack(FORMAT_VERSION, len(headerBlob)))
+        handle.write(headerBlob)
+        for _, blob in blobs:
+            handle.write(blob)
+    finally:
+        handle.close()
+    return
+
+
+def readReportHeader(filename):
+    """
+    _readReportHeader_
+
+    Read only the header of a compact report.  Returns None if the
+    file is not a compact report.
+    """
+    handle = open(filename, 'rb')
+    try:
+        if handle.read(len(MAGIC)) != MAGIC:
+            return None
+        version, headerLength = _PREAMBLE.unpack(handle.read(_PREAMBLE.size))
+        if version > FORMAT_VERSION:
+            msg = "Report %s has format version %i, " % (filename, version)
+            msg += "only versions up to %i are supported" % FORMAT_VERSION
+            raise RuntimeError(msg)
+        header = cPickle.loads(handle.read(headerLength))
+    finally:
+        handle.close()
+
+    header["dataOffset"] = len(MAGIC) + _PREAMBLE.size + headerLength
+    return header
+
+
+def readCompactReport(filename, lazy = True):
+    """
+    _readCompactReport_
+
+    Load the ConfigSection tree of a compact report.  With lazy set the step
+    sections are only read from disk the first time they are accessed.
+    """
+    header = readReportHeader(filename)
+    if header == None:
+        raise RuntimeError("Report %s is not in the compact format" % filename)
+
+    data = LazyReportSection(filename, header)
+    if not lazy:
+        data.loadAll_()
+    return data
+
+
+def _flattenSection(section):
+    """
+    _flattenSection_
+
+    Turn a ConfigSection tree into nested (settings, children) tuples.
+    """
+    settings = {}
+    children = []
+    for key, value in section.__dict__.iteritems():
+        if key in _LOCAL_ATTRIBUTES:
+            continue
+        if isinstance(value, ConfigSection):
+            children.append((key, _flattenSection(value)))
+        else:
+            settings[key] = value
+    return (settings, children)
+
+
+def _buildSection(flatSection, parent):
+    """
+    _buildSection_
+
+    Inverse of _flattenSection.
+    """
+    settings, children = flatSection
+    section = _newConfigSection()
+    section.__dict__.update(settings)
+    section.__dict__["_internal_parent_ref"] = parent
+    for name, child in children:
+        section.__dict__[name] = _buildSection(child, section)
+    return section
+
+
+def packReportData(data):
+    """
+    _packReportData_
+
+    Pack the report ConfigSection data into a string to be sent to another
+    process.  Lazily loaded steps are loaded first.  Raises ValueError if
+    the report holds a value marshal can't handle.
+    """
+    if isinstance(data, LazyReportSection):
+        data.loadAll_()
+    return marshal.dumps(_flattenSection(data))
+
+
+def unpackReportData(blob):
+    """
+    _unpackReportData_
+
+    Rebuild the report ConfigSection data packed by packReportData.
+    """
+    return _buildSection(marshal.loads(blob), None)
+
+
+class LazyReportSection(ConfigSection):
+    """
+    _LazyReportSection_
+
+    Top level section of a report read from the compact format.  The step
+    sections are loaded from the file when they are first accessed; until
+    then the header summary of the step is available via pendingSummary_.
+
+    Pickling or copying it loads all the steps and produces a plain
+    ConfigSection.
+    """
+    def __init__(self, filename, header):
+        ConfigSection.__init__(self, "FrameworkJobReport")
+        self._internal_filename = filename
+        self._internal_header = header
+        self._internal_pending = set(header["steps"])
+
+        top = self._readBlob("top")
+        self._internal_documentation = top._internal_documentation
+        self._internal_docstrings = top._internal_docstrings
+        for key in top._internal_settings:
+            setattr(self, key, getattr(top, key))
+
+        self._internal_settings.update(self._internal_pending)
+        self._internal_children.update(self._internal_pending)
+        return
+
+    def _readBlob(self, name):
+        """
+        _readBlob_
+
+        Read and unpickle a section from the file.
+        """
+        offset, length = self._internal_header["sections"][name]
+        handle = open(self._internal_filename, 'rb')
+        try:
+            handle.seek(self._internal_header["dataOffset"] + offset)
+            blob = handle.read(length)
+        finally:
+            handle.close()
+        return _loadSection(blob, self._internal_header["compressed"])
+
+    def __getattr__(self, name):
+        """
+        Only called when regular lookup fails: load pending steps.
+        """
+        if name.startswith("_internal_") or name not in self._internal_pending:
+            raise AttributeError(name)
+        self._internal_pending.discard(name)
+        ConfigSection.__setattr__(self, name, self._readBlob(name))
+        return object.__getattribute__(self, name)
+
+    def __delattr__(self, name):
+        if name in self._internal_pending:
+            self._internal_pending.discard(name)
+            self._internal_settings.discard(name)
+            self._internal_children.discard(name)
+            return
+        ConfigSection.__delattr__(self, name)
+        return
+
+    def __reduce_ex__(self, protocol):
+        self.loadAll_()
+        state = dict([(key, value) for (key, value) in self.__dict__.items()
+                      if key not in ["_internal_filename", "_internal_header",
+                                     "_internal_pending"]])
+        return (_newConfigSection, (), state)
+
+    def section_(self, sectionName):
+        if sectionName in self._internal_pending:
+            getattr(self, sectionName)
+        return ConfigSection.section_(self, sectionName)
+
+    def loadAll_(self):
+        """
+        _loadAll_
+
+        Load all the pending steps.
+        """
+        for stepName in list(self._internal_pending):
+            getattr(self, stepName)
+        return
+
+    def pendingSummary_(self, stepName):
+        """
+        _pendingSummary_
+
+        Return the header summary of a step that hasn't been loaded yet,
+        None if the step is loaded (and may have been modified).
+        """
+        if stepName not in self._internal_pending:
+            return None
+        return self._internal_header["summary"].get(stepName, None)
@@ -21,6 +21,9 @@ from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 
 from WMCore.FwkJobReport.FileInfo import FileInfo
+from WMCore.FwkJobReport.CompactReport import LazyReportSection, isCompactReport
+from WMCore.FwkJobReport.CompactReport import readCompactReport, writeCompactReport
+from WMCore.FwkJobReport.CompactReport import packReportData, unpackReportData
 from WMCore.WMException           import WMException
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
 
@@ -288,6 +291,10 @@ class Report:
 
         Returns a list of all non-zero exit codes in the step
         """
+        summary = self.getPendingStepSummary(stepName)
+        if summary != None:
+            return set(summary["exitCodes"])
+
         returnCodes = set()
         reportStep = self.retrieveStep(stepName)
         errorCount = getattr(reportStep.errors, "errorCount", 0)
@@ -324,6 +331,10 @@ class Report:
         Get the exit code for a particular step
         Return 0 if none
         """
+        summary = self.getPendingStepSummary(stepName)
+        if summary != None:
+            return summary["exitCode"]
+
         returnCode = 0
         reportStep = self.retrieveStep(stepName)
         errorCount = getattr(reportStep.errors, "errorCount", 0)
@@ -336,26 +347,71 @@ class Report:
 
         return returnCode
 
-    def persist(self, filename):
+    def getPendingStepSummary(self, stepName):
+        """
+        _getPendingStepSummary_
+
+        If the report was loaded lazily and the step hasn't been read from
+        disk yet return the step summary stored in the report header,
+        otherwise return None.
+        """
+        if isinstance(self.data, LazyReportSection):
+            return self.data.pendingSummary_(stepName)
+        return None
+
+    def getStepSummary(self, stepName):
+        """
+        _getStepSummary_
+
+        Summarize a step for the header of the compact report format.
+        """
+        reportStep = self.retrieveStep(stepName)
+        outputFiles = 0
+        for outputModule in getattr(reportStep, "outputModules", []):
+            outputModuleRef = getattr(reportStep.output, outputModule, None)
+            if outputModuleRef != None:
+                outputFiles += getattr(outputModuleRef.files, "fileCount", 0)
+
+        summary = {"status": getattr(reportStep, "status", 1),
+                   "exitCode": self.getStepExitCode(stepName),
+                   "exitCodes": list(self.getStepExitCodes(stepName)),
+                   "outputFiles": outputFiles}
+        summary.update(self.getTimes(stepName))
+        return summary
+
+    def persist(self, filename, compress = False):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Save this object to disk in the compact report format.
         """
-        handle = open(filename, 'w')
-        cPickle.dump(self.data, handle)
-        handle.close()
+        if isinstance(self.data, LazyReportSection):
+            # We may be about to overwrite the file the steps come from
+            self.data.loadAll_()
+
+        summary = {}
+        for stepName in self.listSteps():
+            if self.retrieveStep(stepName) != None:
+                summary[stepName] = self.getStepSummary(stepName)
+
+        writeCompactReport(self.data, summary, filename, compress = compress)
         return
 
-    def unpersist(self, filename, reportname = None):
+    def unpersist(self, filename, reportname = None, lazy = True):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a FWJR from disk, either in the compact format or an old style
+        pickle.  Compact reports are loaded lazily by default: the steps are
+        only read from the file when they are first needed, so the file must
+        not be removed before that.
         """
-        handle = open(filename, 'r')
-        self.data = cPickle.load(handle)
-        handle.close()
+        if isCompactReport(filename):
+            self.data = readCompactReport(filename, lazy = lazy)
+        else:
+            handle = open(filename, 'r')
+            self.data = cPickle.load(handle)
+            handle.close()
 
         # old self.report (if it existed) became unattached
         if reportname:
@@ -363,6 +419,23 @@ class Report:
 
         return
 
+    def pack(self):
+        """
+        _pack_
+
+        Pack the report into a string, to pass it to another process.
+        """
+        return packReportData(self.data)
+
+    def unpack(self, blob):
+        """
+        _unpack_
+
+        Load a report packed by pack.
+        """
+        self.data = unpackReportData(blob)
+        return
+
     def addOutputModule(self, moduleName):
         """
         _addOutputModule_
@@ -986,8 +1059,12 @@ class Report:
 
         Determine wether or not a step was successful.
         """
-        stepReport = self.retrieveStep(step = stepName)
-        status = getattr(stepReport, 'status', 1)
+        summary = self.getPendingStepSummary(stepName)
+        if summary != None:
+            status = summary["status"]
+        else:
+            stepReport = self.retrieveStep(step = stepName)
+            status = getattr(stepReport, 'status', 1)
         # We have too many possibilities
         if status not in [0, '0', 'success', 'Success']:
             return False
@@ -1152,6 +1229,10 @@ class Report:
 
         Return a dictionary with the start and stop times
         """
+        summary = self.getPendingStepSummary(stepName)
+        if summary != None:
+            return {'startTime': summary['startTime'], 'stopTime': summary['stopTime']}
+
         reportStep = self.retrieveStep(stepName)
 
         startTime = getattr(reportStep, 'startTime', None)
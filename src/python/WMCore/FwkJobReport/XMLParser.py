@@ -43,24 +43,32 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send( (report, subnode) )
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send( (report, subnode) )
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send( (report, subnode) )
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send( (report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send( (report, subnode) )
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send( (report, subnode) )
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send( (report, subnode) )
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send( (report, subnode) )
-            else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+            dispatchReportNode(targets, report, subnode)
+
+def dispatchReportNode(targets, report, subnode):
+    """
+    _dispatchReportNode_
+
+    Send a child node of the FrameworkJobReport element to its handler.
+    """
+    if subnode.name == "File":
+        targets['File'].send( (report, subnode) )
+    elif subnode.name == "InputFile":
+        targets['InputFile'].send( (report, subnode) )
+    elif subnode.name == "AnalysisFile":
+        targets['AnalysisFile'].send( (report, subnode) )
+    elif subnode.name == "PerformanceReport":
+        targets['PerformanceReport'].send( (report, subnode))
+    elif subnode.name == "FrameworkError":
+        targets['FrameworkError'].send( (report, subnode) )
+    elif subnode.name == "SkippedFile":
+        targets['SkippedFile'].send( (report, subnode) )
+    elif subnode.name == "FallbackAttempt":
+        targets['FallbackAttempt'].send( (report, subnode) )
+    elif subnode.name == "SkippedEvent":
+        targets['SkippedEvent'].send( (report, subnode) )
+    else:
+        setattr(report.report.parameters, subnode.name, subnode.text)
 
 @coroutine
 def fileHandler(targets):
@@ -220,6 +228,9 @@ def runHandler():
     Create a WMCore.DataStructs.Run object for each run and call the
     addRunInfoToFile() function to add the run information to the file
     section.
+
+    Run nodes built by the streaming parser already carry the list of
+    lumis instead of one child node per LumiSection.
     """
     while True:
         fileSection, node = (yield)
@@ -228,9 +239,11 @@ def runHandler():
                 runId = subnode.attrs.get("ID", None)
                 if runId == None: continue
 
-                lumis = [ int(lumi.attrs['ID'])
-                          for lumi in subnode.children
-                          if "ID" in lumi.attrs]
+                lumis = getattr(subnode, "lumis", None)
+                if lumis == None:
+                    lumis = [ int(lumi.attrs['ID'])
+                              for lumi in subnode.children
+                              if "ID" in lumi.attrs]
 
                 runInfo = Run(runNumber = runId)
                 runInfo.lumis.extend(lumis)
@@ -482,20 +495,85 @@ def perfStoreHandler():
 
 
 
-def xmlToJobReport(reportInstance, xmlFile):
+class StreamingReportBuilder:
     """
-    _xmlToJobReport_
+    _StreamingReportBuilder_
 
-    parse the XML file and insert the information into the
-    Report instance provided
+    expat handlers that build the Node structure of the children of the
+    FrameworkJobReport element while the XML is being read.  LumiSection
+    elements don't get a Node, their IDs are collected directly in the lumis
+    list of the enclosing Run node, which is where most of the time and
+    memory went for reports with many lumis.  The nodes are only dispatched
+    to the handlers once the whole file has been parsed so that a corrupt
+    file leaves the report untouched.
 
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
+    def __init__(self):
+        self.reportNodes = []
+        self.depth = 0
+        self.skipDepth = None
+        self.nodeStack = []
+        self.charCache = []
+        self.currentRun = None
+        self.runDepth = None
+
+    def startElement(self, name, attrs):
+        self.depth += 1
+        self.charCache = []
+        if self.skipDepth != None:
+            return
+        if self.depth == 1:
+            if name != "FrameworkJobReport":
+                print "Not Handling: ", name
+                self.skipDepth = self.depth
+            return
+
+        if self.currentRun != None:
+            if "ID" in attrs:
+                self.currentRun.lumis.append(int(attrs["ID"]))
+            return
+
+        newnode = Node(name, attrs)
+        if len(self.nodeStack) > 0:
+            self.nodeStack[-1].children.append(newnode)
+            if name == "Run" and self.nodeStack[-1].name == "Runs":
+                newnode.lumis = []
+                self.currentRun = newnode
+                self.runDepth = self.depth
+        self.nodeStack.append(newnode)
+
+    def endElement(self, name):
+        self.depth -= 1
+        if self.skipDepth != None:
+            if self.depth < self.skipDepth:
+                self.skipDepth = None
+            return
+        if self.depth == 0:
+            return
+        if self.currentRun != None and self.depth >= self.runDepth:
+            # A LumiSection, nothing to do
+            self.charCache = []
+            return
+
+        node = self.nodeStack.pop()
+        node.text = str(''.join(self.charCache)).strip()
+        self.charCache = []
+        if node is self.currentRun:
+            self.currentRun = None
+        if len(self.nodeStack) == 0:
+            self.reportNodes.append(node)
+
+    def characters(self, data):
+        self.charCache.append(data)
+
+def buildDispatchers():
+    """
+    _buildDispatchers_
 
-    #  //
-    # // Set up coroutine pipeline
-    #//
+    Set up the coroutine pipeline that handles the children of the
+    FrameworkJobReport element.
+
+    """
     fileDispatchers = {
         "Runs" : runHandler(),
         "Branches" : branchHandler(),
@@ -520,6 +598,60 @@ def xmlToJobReport(reportInstance, xmlFile):
         "SkippedEvent" : skippedEventHandler(),
         }
 
+    return dispatchers
+
+def streamXMLToJobReport(reportInstance, xmlFile, bufferSize = 1048576):
+    """
+    _streamXMLToJobReport_
+
+    parse the XML file into the Report instance provided with the
+    StreamingReportBuilder
+
+    """
+    builder = StreamingReportBuilder()
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    parser.buffer_size = bufferSize
+    parser.returns_unicode = False
+    parser.StartElementHandler = builder.startElement
+    parser.EndElementHandler = builder.endElement
+    parser.CharacterDataHandler = builder.characters
+
+    handle = open(xmlFile, 'r')
+    try:
+        parser.ParseFile(handle)
+    finally:
+        handle.close()
+
+    dispatchers = buildDispatchers()
+    for node in builder.reportNodes:
+        dispatchReportNode(dispatchers, reportInstance, node)
+
+    return
+
+def xmlToJobReport(reportInstance, xmlFile, streaming = True):
+    """
+    _xmlToJobReport_
+
+    parse the XML file and insert the information into the
+    Report instance provided.  By default the streaming parser is
+    used, set streaming to False to use the generic Node structure
+    of ParseXMLFile.
+
+    """
+    if streaming:
+        streamXMLToJobReport(reportInstance, xmlFile)
+        return
+
+    # read XML, build node structure
+    node = xmlFileToNode(xmlFile)
+
+    #  //
+    # // Set up coroutine pipeline
+    #//
+    dispatchers = buildDispatchers()
+
     #  //
     # // Feed pipeline with node structure and report result instance
     #//
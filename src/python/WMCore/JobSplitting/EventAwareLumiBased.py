@@ -19,7 +19,7 @@ import math
 
 from WMCore.DataStructs.Run         import Run
 from WMCore.JobSplitting.JobFactory import JobFactory
-from WMCore.JobSplitting.LumiBased  import isGoodLumi, isGoodRun, LumiChecker
+from WMCore.JobSplitting.LumiBased  import LumiChecker, LumiMask
 from WMCore.WMBS.File               import File
 from WMCore.WMSpec.WMTask           import buildLumiMask
 
@@ -95,6 +95,9 @@ class EventAwareLumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        # Compile the mask once, it is checked for every lumi of every file
+        lumiMask = LumiMask(goodRunList)
+
         lDict = self.sortByLocation()
         locationDict = {}
 
@@ -191,7 +194,7 @@ class EventAwareLumiBased(JobFactory):
                     lumisPerJob = max(lumisInJob + lumisAllowed, 1)
 
                 for run in f['runs']:
-                    if not isGoodRun(goodRunList = goodRunList, run = run.run):
+                    if not lumiMask.isGoodRun(run.run):
                         # Then skip this one
                         continue
                     if len(runWhitelist) > 0 and not run.run in runWhitelist:
@@ -205,7 +208,7 @@ class EventAwareLumiBased(JobFactory):
 
                     # Now loop over the lumis
                     for lumi in run:
-                        if (not isGoodLumi(goodRunList, run = run.run, lumi = lumi) or
+                        if (not lumiMask.isGoodLumi(run.run, lumi) or
                             self.lumiChecker.isSplitLumi(run.run, lumi, f)):
                             # Kill the chain of good lumis
                             # Skip this lumi
@@ -9,7 +9,7 @@ a set of jobs based on file boundaries
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File import File
 from WMCore.WMSpec.WMTask import buildLumiMask
-from WMCore.JobSplitting.LumiBased import isGoodRun, isGoodLumi
+from WMCore.JobSplitting.LumiBased import LumiMask
 
 
 class FileBased(JobFactory):
@@ -37,6 +37,7 @@ class FileBased(JobFactory):
         goodRunList = {}
         if runs and lumis:
             goodRunList = buildLumiMask(runs, lumis)
+        lumiMask = LumiMask(goodRunList)
 
         #Get a dictionary of sites, files
         lDict = self.sortByLocation()
@@ -72,20 +73,7 @@ class FileBased(JobFactory):
         if len(files):
             files = sorted(files, key = lambda f: f['lfn'])
             if runs and lumis:
-                skippedFiles = []
-                for f in files:
-                    skipFile = True
-                    for run in f['runs']:
-                        if not isGoodRun(goodRunList, run.run):
-                            continue
-                        for lumi in run:
-                            if not isGoodLumi(goodRunList, run.run, lumi):
-                                continue
-                            skipFile = False
-                    if skipFile:
-                        skippedFiles.append(f)
-                for f in skippedFiles:
-                    files.remove(f)
+                files = [f for f in files if lumiMask.filterRuns(f['runs'])]
             
         ## Keep only the first totalFiles files. Remove the other files from the locationDict.
         if totalFiles > 0 and totalFiles < len(files):
@@ -117,12 +105,12 @@ class FileBased(JobFactory):
                     createNewJob = True
                 if runs and lumis:
                     for run in f['runs']:
-                        if not isGoodRun(goodRunList, run.run):
+                        if not lumiMask.isGoodRun(run.run):
                             continue
                         firstLumi = None
                         lastLumi = None
                         for lumi in run:
-                            if not isGoodLumi(goodRunList, run.run, lumi): 
+                            if not lumiMask.isGoodLumi(run.run, lumi):
                                 if firstLumi != None and lastLumi != None:
                                     self.currentJob['mask'].addRunAndLumis(run = run.run, lumis = [firstLumi, lastLumi])
                                     addedEvents = ((lastLumi - firstLumi + 1) * f['avgEvtsPerLumi'])
@@ -9,8 +9,7 @@ import os
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.Services.UUID import makeUUID
 from WMCore.DAOFactory import DAOFactory
-from WMCore.JobSplitting.LumiBased import isGoodRun, isGoodLumi
-from WMCore.DataStructs.Run import Run
+from WMCore.JobSplitting.LumiBased import LumiMask
 from WMCore.WMSpec.WMTask import buildLumiMask
 
 class Harvest(JobFactory):
@@ -44,6 +43,7 @@ class Harvest(JobFactory):
         myThread = threading.currentThread()
         fileset.loadData(parentage = 0)
         allFiles = fileset.getFiles()
+        lumiMask = LumiMask(goodRunList)
 
         # sort by location and run
         locationDict = {}
@@ -66,7 +66,7 @@ class Harvest(JobFactory):
 
             fileInfo['runs'] = set()
             # Handle jobs without lumiMask
-            if not goodRunList:
+            if not lumiMask:
                 runDict[fileInfo['lfn']] = runSet
                 for run in runSet:
                     if run.run in locationDict[locSet].keys():
@@ -75,22 +75,8 @@ class Harvest(JobFactory):
                         locationDict[locSet][run.run] = [fileInfo]
             else:
                 # it has lumiMask, thus we consider only good run/lumis
-                newRunSet = []
-                for run in runSet:
-                    if not isGoodRun(goodRunList, run.run):
-                        continue
-                    # then loop over lumis
-                    maskedLumis = []
-                    for lumi in run.lumis:
-                        if not isGoodLumi(goodRunList, run.run, lumi):
-                            continue
-                        maskedLumis.append(lumi)
-
-                    if not maskedLumis:
-                        continue
-                    maskedRun = Run(run.run, *maskedLumis)
-                    newRunSet.append(maskedRun)
-
+                newRunSet = lumiMask.filterRuns(runSet)
+                for run in newRunSet:
                     if run.run in locationDict[locSet].keys():
                         locationDict[locSet][run.run].append(fileInfo)
                     else:
@@ -15,6 +15,7 @@ import logging
 import threading
 import traceback
 
+from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.Run import Run
 
 from WMCore.JobSplitting.JobFactory import JobFactory
@@ -25,9 +26,13 @@ def isGoodLumi(goodRunList, run, lumi):
     """
     _isGoodLumi_
 
-    Checks to see if runs match a run-lumi combination in the goodRunList
-    This is a pain in the ass.
+    Checks to see if runs match a run-lumi combination in the goodRunList.
+    goodRunList can also be a LumiMask, which is much faster when
+    checking many lumis.
     """
+    if isinstance(goodRunList, LumiMask):
+        return goodRunList.isGoodLumi(run, lumi)
+
     if goodRunList == None or goodRunList == {}:
         return True
 
@@ -50,15 +55,100 @@ def isGoodRun(goodRunList, run):
 
     Tell if this is a good run
     """
+    if isinstance(goodRunList, LumiMask):
+        return goodRunList.isGoodRun(run)
+
     if goodRunList == None or goodRunList == {}:
         return True
 
-    if str(run) in goodRunList.keys():
+    if str(run) in goodRunList:
         # @e can find a run
         return True
 
     return False
 
+class LumiMask(object):
+    """
+    _LumiMask_
+
+    A goodRunList ({'run': [[firstLumi, lastLumi], ...]}) compiled once per
+    splitting call into a LumiList, so checking a lumi is a dictionary
+    lookup and a bisection of the sorted ranges of the run instead of a scan
+    of all the runs and ranges.
+
+    An empty goodRunList lets everything through.
+    """
+    def __init__(self, goodRunList = None):
+        self.runs = set()
+        self.maskAll = not goodRunList
+        compactList = {}
+        if not self.maskAll:
+            for run, runRanges in goodRunList.items():
+                # Keep the run even if none of its lumis are good
+                self.runs.add(int(run))
+                validRanges = []
+                for runRange in runRanges:
+                    if len(runRange) != 2:
+                        logging.error("Invalid run range %s for run %s!  Failing its lumis!" % (runRange, run))
+                        continue
+                    first, last = int(runRange[0]), int(runRange[1])
+                    # A last lumi of 0 would be open ended in a LumiList
+                    if 0 < last and first <= last:
+                        validRanges.append([first, last])
+                compactList[str(int(run))] = validRanges
+        self.lumiList = LumiList(compactList = compactList)
+        return
+
+    def __nonzero__(self):
+        """
+        A mask is true if it filters anything
+        """
+        return not self.maskAll
+
+    def isGoodRun(self, run):
+        """
+        _isGoodRun_
+
+        Tell if the run is in the mask
+        """
+        return self.maskAll or int(run) in self.runs
+
+    def isGoodLumi(self, run, lumi):
+        """
+        _isGoodLumi_
+
+        Tell if the run/lumi pair is in the mask
+        """
+        return self.maskAll or self.lumiList.contains(run, lumi)
+
+    def filterLumis(self, run, lumis):
+        """
+        _filterLumis_
+
+        Return the lumis of a run that are in the mask, keeping their order.
+        """
+        if self.maskAll:
+            return list(lumis)
+        return self.lumiList.filterRunLumis(run, lumis)
+
+    def filterRuns(self, runs):
+        """
+        _filterRuns_
+
+        Return Run objects holding only the good lumis of runs, runs without
+        any good lumi are dropped.
+        """
+        if self.maskAll:
+            return list(runs)
+        goodRuns = []
+        for run in runs:
+            if not self.isGoodRun(run.run):
+                continue
+            goodLumis = self.filterLumis(run.run, run.lumis)
+            if goodLumis:
+                goodRuns.append(Run(run.run, *goodLumis))
+        return goodRuns
+
 class LumiChecker:
     """ Simple utility class that helps correcting dataset that have lumis split across jobs:
 
@@ -203,6 +293,9 @@ class LumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        # Compile the mask once, it is checked for every lumi of every file
+        lumiMask = LumiMask(goodRunList)
+
         lDict = self.sortByLocation()
         locationDict = {}
 
@@ -272,7 +365,7 @@ class LumiBased(JobFactory):
                     stopJob = True
 
                 for run in f['runs']:
-                    if not isGoodRun(goodRunList = goodRunList, run = run.run):
+                    if not lumiMask.isGoodRun(run.run):
                         # Then skip this one
                         continue
                     if len(runWhitelist) > 0 and not run.run in runWhitelist:
@@ -286,7 +379,7 @@ class LumiBased(JobFactory):
 
                     # Now loop over the lumis
                     for lumi in run:
-                        if (not isGoodLumi(goodRunList, run = run.run, lumi = lumi)
+                        if (not lumiMask.isGoodLumi(run.run, lumi)
                                 or self.lumiChecker.isSplitLumi(run.run, lumi, f)): # splitLumi checks if the lumi is split across jobs
                             # Kill the chain of good lumis
                             # Skip this lumi
@@ -21,6 +21,21 @@ from WMCore.JobStateMachine.SummaryDB import updateSummaryDB
 
 CMSSTEP = re.compile(r'^cmsRun[0-9]+$')
 
+def addStateTransitions(doc, transitions):
+    """
+    _addStateTransitions_
+
+    Append state transitions to a job document the same way the
+    JobDump stateTransition update handler does it.
+    """
+    states = doc.setdefault("states", {})
+    for transition in transitions:
+        maxKey = 0
+        for key in states.keys():
+            maxKey = max(maxKey, int(key))
+        states[str(maxKey + 1)] = transition
+    return doc
+
 def discardConflictingDocument(couchDbInstance, data, result):
     """
     _discardConflictingDocument_
@@ -89,6 +104,13 @@ class ChangeState(WMObject, WMConnectionBase):
         self.updateLocationDAO = self.daofactory("Jobs.UpdateLocation")
 
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
+
+        # Transitions of jobs already in couch are pushed with _bulk_docs in
+        # batches of this size, 0 goes back to one update handler call per job
+        self.transitionBatchSize = getattr(self.config.JobStateMachine, 'transitionBatchSize', 1000)
+        self.transitionRetries = getattr(self.config.JobStateMachine, 'transitionRetries', 3)
+        # Number of documents, conflicts and time spent per batch in the last call
+        self.transitionTimings = []
         return
 
     def _connectDatabases(self):
@@ -197,6 +219,7 @@ class ChangeState(WMObject, WMConnectionBase):
 
         timestamp = int(time.time())
         couchRecordsToUpdate = []
+        transitionsToRecord = {}
 
         for job in jobs:
             couchDocID = job.get("couch_record", None)
@@ -260,6 +283,12 @@ class ChangeState(WMObject, WMConnectionBase):
                 couchRecordsToUpdate.append({"jobid": job["id"],
                                              "couchid": jobDocument["_id"]})
                 self.jobsdatabase.queue(jobDocument, callback = discardConflictingDocument)
+            elif self.transitionBatchSize > 0:
+                transition = {"oldstate": oldstate,
+                              "newstate": newstate,
+                              "location": jobLocation,
+                              "timestamp": timestamp}
+                transitionsToRecord.setdefault(couchDocID, []).append(transition)
             else:
                 # We send a PUT request to the stateTransition update handler.
                 # Couch expects the parameters to be passed as arguments to in
@@ -405,11 +434,69 @@ class ChangeState(WMObject, WMConnectionBase):
                                      conn = self.getDBConn(),
                                      transaction = self.existingTransaction())
 
+        self.recordStateTransitions(transitionsToRecord)
         self.jobsdatabase.commit(callback = discardConflictingDocument)
         self.fwjrdatabase.commit(callback = discardConflictingDocument)
         self.jsumdatabase.commit()
         return
 
+    def recordStateTransitions(self, transitions):
+        """
+        _recordStateTransitions_
+
+        Add state transitions to job documents that are already in couch.
+        transitions maps couch document ids to the list of transitions to
+        append.  The documents are fetched with a single _all_docs request
+        and pushed back with a single _bulk_docs request per batch of
+        transitionBatchSize documents.  Documents that conflict (because
+        someone else updated them in the meantime) are fetched again and get
+        the transitions reapplied, up to transitionRetries times.  Missing
+        documents are created, like the update handler would.
+        """
+        self.transitionTimings = []
+        docIDs = transitions.keys()
+
+        for i in range(0, len(docIDs), self.transitionBatchSize):
+            startTime = time.time()
+            pending = docIDs[i:i + self.transitionBatchSize]
+            nDocs = len(pending)
+            nConflicts = 0
+
+            for attempt in range(self.transitionRetries + 1):
+                if attempt > 0:
+                    nConflicts += len(pending)
+
+                rows = self.jobsdatabase.allDocs(options = {"include_docs": True},
+                                                 keys = pending)["rows"]
+                docs = []
+                for row in rows:
+                    doc = row.get("doc", None)
+                    if doc == None:
+                        doc = {"_id": row["key"]}
+                    docs.append(addStateTransitions(doc, transitions[row["key"]]))
+
+                results = self.jobsdatabase.post("/%s/_bulk_docs/" % self.jobsdatabase.name,
+                                                 {"docs": docs})
+                pending = []
+                for result in results:
+                    if result.get("error", None) == "conflict":
+                        pending.append(result["id"])
+                    elif result.get("error", None):
+                        logging.error("Error recording state transition for job doc %s: %s" % \
+                                      (result["id"], result.get("reason", result["error"])))
+                if len(pending) == 0:
+                    break
+
+            if len(pending) > 0:
+                logging.error("Gave up recording state transitions for %d conflicting job docs" % len(pending))
+
+            batchTime = time.time() - startTime
+            self.transitionTimings.append({"docs": nDocs, "conflicts": nConflicts,
+                                           "time": batchTime})
+            logging.debug("Recorded state transitions for %d job docs (%d conflicts) in %.3f secs" % \
+                          (nDocs, nConflicts, batchTime))
+        return
+
     def persist(self, jobs, newstate, oldstate):
         """
         _persist_
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+_Framing_
+
+Message framing for the batched ProcessPool transport.
+
+By default every work item and every result travels as its own JSON message.
+In batched mode a message holds a list of items, pickled with protocol 2 and
+optionally zlib compressed, behind a one byte header.  JSON never starts with
+a control character, so both kinds of message can be told apart and share the
+same sockets.
+"""
+
+import cPickle
+import zlib
+
+BATCH_FRAME            = "\x01"
+COMPRESSED_BATCH_FRAME = "\x02"
+
+
+def isBatchFrame(message):
+    """
+    _isBatchFrame_
+
+    Check if a message holds a batch of items rather than one JSON item.
+    """
+    return message[:1] in (BATCH_FRAME, COMPRESSED_BATCH_FRAME)
+
+
+def isCompressedFrame(message):
+    """
+    _isCompressedFrame_
+
+    Check if a message holds a compressed batch.
+    """
+    return message[:1] == COMPRESSED_BATCH_FRAME
+
+
+def encodeBatch(items, compress = False):
+    """
+    _encodeBatch_
+
+    Frame a list of items as a single message.
+    """
+    payload = cPickle.dumps(items, 2)
+    if compress:
+        return COMPRESSED_BATCH_FRAME + zlib.compress(payload, 1)
+    return BATCH_FRAME + payload
+
+
+def decodeBatch(message):
+    """
+    _decodeBatch_
+
+    Return the list of items framed by encodeBatch.
+    """
+    if isCompressedFrame(message):
+        return cPickle.loads(zlib.decompress(message[1:]))
+    elif isBatchFrame(message):
+        return cPickle.loads(message[1:])
+    raise ValueError("Message is not a ProcessPool batch")
@@ -15,6 +15,7 @@ import os
 import threading
 import traceback
 import cPickle
+import collections
 
 from logging.handlers import RotatingFileHandler
 
@@ -26,6 +27,8 @@ from WMCore.Services.Requests import JSONRequests
 
 from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
 
+from WMCore.ProcessPool.Framing import isBatchFrame, isCompressedFrame, encodeBatch, decodeBatch
+
 from WMCore.WMException import WMException
 
 
@@ -63,7 +66,8 @@ class ProcessPoolWorker:
 class ProcessPool:
     def __init__(self, slaveClassName, totalSlaves, componentDir,
                  config, namespace = 'WMComponent', inPort = '5555',
-                 outPort = '5558'):
+                 outPort = '5558', batchSize = 0, maxInFlight = 2,
+                 compress = False):
         """
         __init__
 
@@ -77,11 +81,22 @@ class ProcessPool:
         parameters.  It is not passed to the slave class.  The slaveInit
         parameter will be serialized and passed to the slave class's
         constructor.
+
+        With a batchSize the work is sent in batches of up to batchSize items,
+        pickled instead of JSON encoded and zlib compressed if compress is set.
+        The results of a batch come back in a single message.  No more than
+        maxInFlight batches per slave are sent before their results are read.
         """
         self.enqueueIndex = 0
         self.dequeueIndex = 0
         self.runningWork  = 0
 
+        self.batchSize      = batchSize
+        self.maxInFlight    = maxInFlight
+        self.compress       = compress
+        self.inFlight       = 0
+        self.pendingResults = collections.deque()
+
         #Use the Services.Requests JSONizer, which handles __to_json__ calls
         self.jsonHandler = JSONRequests()
 
@@ -123,9 +138,9 @@ class ProcessPool:
         try:
             context = zmq.Context()
             self.sender = context.socket(zmq.PUSH)
-            self.sender.bind("tcp://*:%s" % inPort)
+            self.sender.bind("tcp://127.0.0.1:%s" % inPort)
             self.sink = context.socket(zmq.PULL)
-            self.sink.bind("tcp://*:%s" % outPort)
+            self.sink.bind("tcp://127.0.0.1:%s" % outPort)
         except zmq.ZMQError:
             # Try this again in a moment to see
             # if it's just being held by something pre-existing
@@ -135,9 +150,9 @@ class ProcessPool:
             try:
                 context = zmq.Context()
                 self.sender = context.socket(zmq.PUSH)
-                self.sender.bind("tcp://*:%s" % inPort)
+                self.sender.bind("tcp://127.0.0.1:%s" % inPort)
                 self.sink = context.socket(zmq.PULL)
-                self.sink.bind("tcp://*:%s" % outPort)
+                self.sink.bind("tcp://127.0.0.1:%s" % outPort)
             except Exception as ex:
                 msg =  "Error attempting to open TCP sockets\n"
                 msg += str(ex)
@@ -246,6 +261,8 @@ class ProcessPool:
                     logging.error(str(ex2))
                     continue
         self.workers = []
+        self.inFlight = 0
+        self.pendingResults.clear()
         return
 
     def enqueue(self, work, list = False):
@@ -256,6 +273,9 @@ class ProcessPool:
         list where each item in the list can be serialized into JSON.
 
         If list is True, the entire list is sent as one piece of work
+
+        In batched mode the work is sent batchSize items at a time, reading
+        results while the slaves have too many batches to work on.
         """
         if len(self.workers) < 1:
             # Someone's shut down the system
@@ -263,7 +283,17 @@ class ProcessPool:
             logging.error(msg)
             raise ProcessPoolException(msg)
 
-        if not list:
+        if self.batchSize:
+            if list:
+                work = [work]
+            for index in range(0, len(work), self.batchSize):
+                batch = work[index:index + self.batchSize]
+                while self.inFlight >= self.nSlaves * self.maxInFlight:
+                    self._receiveResults()
+                self.sender.send(encodeBatch(batch, self.compress))
+                self.inFlight    += 1
+                self.runningWork += len(batch)
+        elif not list:
             for w in work:
                 encodedWork = self.jsonHandler.encode(w)
                 self.sender.send(encodedWork)
@@ -276,6 +306,21 @@ class ProcessPool:
         return
 
 
+    def _receiveResults(self):
+        """
+        _receiveResults_
+
+        Read one message from the slaves and keep the results it holds until
+        they are dequeued.
+        """
+        output = self.sink.recv()
+        if isBatchFrame(output):
+            self.inFlight -= 1
+            self.pendingResults.extend(decodeBatch(output))
+        else:
+            self.pendingResults.append(self.jsonHandler.decode(output))
+        return
+
 
     def dequeue(self, totalItems = 1):
         """
@@ -294,8 +339,10 @@ class ProcessPool:
 
         while totalItems > 0:
             try:
-                output = self.sink.recv()
-                decode = self.jsonHandler.decode(output)
+                if not self.pendingResults:
+                    self._receiveResults()
+                    continue
+                decode = self.pendingResults.popleft()
                 if type(decode) == type({}) and decode.get('type', None) == 'ERROR':
                     # Then we had some kind of error
                     msg = decode.get('msg', 'Unknown Error in ProcessPool')
@@ -420,50 +467,65 @@ if __name__ == "__main__":
 
     logging.info("Have slave class")
 
-    while(True):
+    crashed = False
+    while(not crashed):
         encodedInput = receiver.recv()
+        batchMode    = isBatchFrame(encodedInput)
 
         try:
-            input = jsonHandler.decode(encodedInput)
+            if batchMode:
+                inputs = decodeBatch(encodedInput)
+            else:
+                inputs = [jsonHandler.decode(encodedInput)]
         except Exception as ex:
             logging.error("Error decoding: %s" % str(ex))
             break
 
-        if input == "STOP":
+        if not batchMode and inputs[0] == "STOP":
             break
 
-        try:
-            logging.error(input)
-            output = slaveClass(input)
-        except Exception as ex:
-            crashMessage = "Slave process crashed with exception: " + str(ex)
-            crashMessage += "\nStacktrace:\n"
+        outputs = []
+        for input in inputs:
+            try:
+                logging.debug(input)
+                output = slaveClass(input)
+            except Exception as ex:
+                crashMessage = "Slave process crashed with exception: " + str(ex)
+                crashMessage += "\nStacktrace:\n"
 
-            stackTrace = traceback.format_tb(sys.exc_info()[2], None)
-            for stackFrame in stackTrace:
-                crashMessage += stackFrame
+                stackTrace = traceback.format_tb(sys.exc_info()[2], None)
+                for stackFrame in stackTrace:
+                    crashMessage += stackFrame
 
-            logging.error(crashMessage)
-            try:
-                output        = {'type': 'ERROR', 'msg': crashMessage}
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
-                logging.error("Sent error message and now breaking")
+                logging.error(crashMessage)
+                outputs.append({'type': 'ERROR', 'msg': crashMessage})
+                crashed = True
                 break
-            except Exception as ex:
-                logging.error("Failed to send error message")
-                logging.error(str(ex))
-                del jsonHandler
-                sys.exit(1)
-
-        if output != None:
-            if type(output) == list:
-                for item in output:
+
+            if output != None:
+                if type(output) == list:
+                    outputs.extend(output)
+                else:
+                    outputs.append(output)
+
+        try:
+            if batchMode:
+                # One answer per batch, the master counts them
+                sender.send(encodeBatch(outputs, isCompressedFrame(encodedInput)))
+            else:
+                for item in outputs:
                     encodedOutput = jsonHandler.encode(item)
                     sender.send(encodedOutput)
-            else:
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
+        except Exception as ex:
+            if not crashed:
+                raise
+            logging.error("Failed to send error message")
+            logging.error(str(ex))
+            del jsonHandler
+            sys.exit(1)
+
+        if crashed:
+            logging.error("Sent error message and now breaking")
 
 
     logging.info("Process with PID %s finished" %(os.getpid()))
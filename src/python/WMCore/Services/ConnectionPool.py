@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+_ConnectionPool_
+
+Process wide pool of the httplib2 connections used by Requests.
+
+httplib2.Http objects keep their connections alive between requests but
+can't be used by more than one thread at a time, so every request takes an
+idle Http object for its host and credentials from the pool, or makes a new
+one, and gives it back when done.  Connections that stayed idle for longer
+than the idle timeout are closed rather than reused, and no more than
+maxSize idle connections are kept per host.  Reusing a kept alive HTTPS
+connection also saves its TLS handshake.
+
+Failed requests are retried on a new connection, after waiting for an
+exponentially growing backoff unless the failed connection was an idle one
+the server may have closed in the meantime.
+"""
+
+import socket
+import threading
+import time
+
+_pool = None
+_poolLock = threading.Lock()
+
+
+def getConnectionPool(maxSize = 10, idleTimeout = 60):
+    """
+    _getConnectionPool_
+
+    Return the connection pool shared by the whole process.  The limits are
+    the ones given when it was first created.
+    """
+    global _pool
+    _poolLock.acquire()
+    try:
+        if _pool == None:
+            _pool = ConnectionPool(maxSize, idleTimeout)
+        return _pool
+    finally:
+        _poolLock.release()
+
+
+def closeConnections(http):
+    """
+    _closeConnections_
+
+    Close all the connections of an httplib2.Http object.
+    """
+    for conn in http.connections.values():
+        try:
+            conn.close()
+        except Exception:
+            pass
+    http.connections = {}
+    return
+
+
+class ConnectionPool(object):
+    """
+    _ConnectionPool_
+
+    Idle httplib2.Http objects, by host and credentials.
+    """
+    def __init__(self, maxSize = 10, idleTimeout = 60):
+        self.maxSize = maxSize
+        self.idleTimeout = idleTimeout
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.counters = {'opened': 0, 'reused': 0, 'expired': 0,
+                         'discarded': 0, 'retries': 0, 'failures': 0}
+
+    def checkout(self, key, factory):
+        """
+        _checkout_
+
+        Take the most recently used idle Http object for key, or make a new
+        one with factory.  Returns the Http object and whether it was reused.
+        """
+        now = time.time()
+        expired = []
+        http = None
+        self.lock.acquire()
+        try:
+            idle = self.idle.get(key, [])
+            while idle:
+                candidate, lastUsed = idle.pop()
+                if now - lastUsed > self.idleTimeout:
+                    expired.append(candidate)
+                    # the others have been idle for even longer
+                    expired.extend([x[0] for x in idle])
+                    del idle[:]
+                    break
+                http = candidate
+                break
+            self.counters['expired'] += len(expired)
+            if http != None:
+                self.counters['reused'] += 1
+            else:
+                self.counters['opened'] += 1
+        finally:
+            self.lock.release()
+
+        for oldHttp in expired:
+            closeConnections(oldHttp)
+        if http != None:
+            return http, True
+        return factory(), False
+
+    def checkin(self, key, http):
+        """
+        _checkin_
+
+        Give back an Http object after a successful request, closing it if
+        there are enough idle ones for key already.
+        """
+        self.lock.acquire()
+        try:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.maxSize:
+                idle.append((http, time.time()))
+                return
+            self.counters['discarded'] += 1
+        finally:
+            self.lock.release()
+        closeConnections(http)
+        return
+
+    def request(self, key, factory, uri, method = 'GET', body = None,
+                headers = None, cache = None, retries = 2, backoff = 0.5):
+        """
+        _request_
+
+        Make a request with a pooled Http object, retrying it up to retries
+        times on connection errors and on 408 (request timeout) responses.
+        Returns the httplib2 response and content.
+        """
+        attempt = 0
+        while True:
+            http, reused = self.checkout(key, factory)
+            http.cache = cache
+            try:
+                response, content = http.request(uri, method = method, body = body,
+                                                 headers = headers)
+            except (socket.error, AttributeError) as ex:
+                # AttributeError implies an initial connection error, httplib
+                # state isn't cleared so the connection can't be reused
+                closeConnections(http)
+                self.countRetry(attempt < retries)
+                if attempt >= retries:
+                    if isinstance(ex, AttributeError):
+                        raise socket.error('Error contacting: %s' % uri)
+                    raise
+            else:
+                if response.status != 408 or attempt >= retries:
+                    self.checkin(key, http)
+                    return response, content
+                # timeout can indicate a socket error
+                closeConnections(http)
+                self.countRetry(True)
+                reused = False
+
+            if not reused:
+                time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+    def countRetry(self, retrying):
+        """
+        _countRetry_
+
+        Count a request that failed and is retried, or has failed for good.
+        """
+        self.lock.acquire()
+        try:
+            if retrying:
+                self.counters['retries'] += 1
+            else:
+                self.counters['failures'] += 1
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        """
+        _clear_
+
+        Close all the idle connections.
+        """
+        self.lock.acquire()
+        try:
+            idle = self.idle
+            self.idle = {}
+        finally:
+            self.lock.release()
+        for connections in idle.values():
+            for http, _ in connections:
+                closeConnections(http)
+        return
+
+    def stats(self):
+        """
+        _stats_
+
+        Counters of the pool, for monitoring.
+        """
+        self.lock.acquire()
+        try:
+            stats = dict(self.counters)
+            stats['idle'] = sum([len(x) for x in self.idle.values()])
+            return stats
+        finally:
+            self.lock.release()
@@ -7,13 +7,18 @@ A set of classes to handle making http and https requests to a remote server and
 deserialising the response.
 
 The response from the remote server is cached if expires/etags are set.
+
+The httplib2 connections are taken from the ConnectionPool shared by the
+process, so the Requests objects talking to the same host with the same
+credentials reuse each other's kept alive connections, from any thread.
+The pool_size, idle_timeout, retries and retry_backoff parameters control
+it, the pool limits are set by the first Requests object.
 """
 
 import urllib
 import os
 import base64
 import httplib2
-import socket
 import logging
 import urlparse
 from httplib import HTTPException
@@ -28,6 +33,7 @@ except:
     import StringIO
 
 from WMCore.Algorithms import Permissions
+from WMCore.Services.ConnectionPool import getConnectionPool
 
 from WMCore.WMException import WMException
 from WMCore.Wrappers.JsonWrapper import JSONEncoder, JSONDecoder
@@ -94,10 +100,19 @@ class Requests(dict):
             self["req_cache_path"] = os.path.join(cache_dir, '.cache')
         self.setdefault("timeout", 300)
         self.setdefault("logger", logging)
+        self.setdefault("pool_size", 10)
+        self.setdefault("idle_timeout", 60)
+        self.setdefault("retries", 2)
+        self.setdefault("retry_backoff", 0.5)
 
         check_server_url(self['host'])
-        # and then get the URL opener
-        self.setdefault("conn", self._getURLOpener())
+        # and then get the URL openers from the shared pool
+        self.pool = getConnectionPool(self['pool_size'], self['idle_timeout'])
+        self.keyCert = self._getOpenerKeyCert()
+        if self['req_cache_path']:
+            self.cache = httplib2.FileCache(self['req_cache_path'])
+        else:
+            self.cache = None
 
 
     def get(self, uri=None, data={}, incoming_headers={},
@@ -133,20 +148,25 @@ class Requests(dict):
                                 encode, decode, contentType)
 
     def makeRequest(self, uri=None, data={}, verb='GET', incoming_headers={},
-                     encoder=True, decoder=True, contentType=None):
+                     encoder=True, decoder=True, contentType=None,
+                     responseHeaders=None):
         """
         Wrapper around request helper functions.
+
+        If a responseHeaders dict is given it is filled with the headers of
+        the response, with lower case names.
         """
         if  self.pycurl:
             result = self.makeRequest_pycurl(uri, data, verb, incoming_headers,
-                         encoder, decoder, contentType)
+                         encoder, decoder, contentType, responseHeaders)
         else:
             result = self.makeRequest_httplib(uri, data, verb, incoming_headers,
-                         encoder, decoder, contentType)
+                         encoder, decoder, contentType, responseHeaders)
         return result
 
     def makeRequest_pycurl(self, uri=None, params={}, verb='GET',
-            incoming_headers={}, encoder=True, decoder=True, contentType=None):
+            incoming_headers={}, encoder=True, decoder=True, contentType=None,
+            responseHeaders=None):
         """
         Make HTTP(s) request via pycurl library. Stay complaint with
         makeRequest_httplib method.
@@ -165,10 +185,14 @@ class Requests(dict):
         url = self['host'] + uri
         response, data = self.reqmgr.request(url, params, headers, \
                     verb=verb, ckey=ckey, cert=cert, capath=capath, decode=decoder)
+        if  responseHeaders is not None:
+            for key, val in response.header.items():
+                responseHeaders[key.lower()] = val
         return data, response.status, response.reason, response.fromcache
 
     def makeRequest_httplib(self, uri=None, data={}, verb='GET',
-            incoming_headers={}, encoder=True, decoder=True, contentType=None):
+            incoming_headers={}, encoder=True, decoder=True, contentType=None,
+            responseHeaders=None):
         """
         Make a request to the remote database. for a give URI. The type of
         request will determine the action take by the server (be careful with
@@ -239,30 +263,12 @@ class Requests(dict):
             "Data in makeRequest is %s and not encoded to a string" \
                 % type(encoded_data)
 
-        # httplib2 will allow sockets to close on remote end without retrying
-        # try to send request - if this fails try again - should then succeed
-        try:
-            response, result = self['conn'].request(uri, method = verb,
-                                    body = encoded_data, headers = headers)
-            if response.status == 408: # timeout can indicate a socket error
-                response, result = self['conn'].request(uri, method = verb,
-                                    body = encoded_data, headers = headers)
-        except (socket.error, AttributeError):
-            # AttributeError implies initial connection error - need to close
-            # & retry. httplib2 doesn't clear httplib state before next request
-            # if this is threaded this may spoil things
-            # only have one endpoint so don't need to determine which to shut
-            [conn.close() for conn in self['conn'].connections.values()]
-            self['conn'] = self._getURLOpener()
-            # ... try again... if this fails propagate error to client
-            try:
-                response, result = self['conn'].request(uri, method = verb,
-                                    body = encoded_data, headers = headers)
-            except AttributeError:
-                # socket/httplib really screwed up - nuclear option
-                self['conn'].connections = {}
-                raise socket.error('Error contacting: %s' \
-                        % self.getDomainName())
+        # the pool retries on a new connection if this one fails
+        response, result = self.pool.request(self.poolKey(), self._getURLOpener,
+                                             uri, method = verb, body = encoded_data,
+                                             headers = headers, cache = self.cache,
+                                             retries = self['retries'],
+                                             backoff = self['retry_backoff'])
         if response.status >= 400:
             e = HTTPException()
             setattr(e, 'req_data', encoded_data)
@@ -274,6 +280,10 @@ class Requests(dict):
             setattr(e, 'headers', response)
             raise e
 
+        if responseHeaders is not None:
+            # httplib2 already gives the header names in lower case
+            responseHeaders.update(response)
+
         if type(decoder) == type(self.makeRequest) or type(decoder) == type(f):
             result = decoder(result)
         elif decoder != False:
@@ -352,9 +362,15 @@ class Requests(dict):
         """Parse netloc to get user"""
         return self['endpoint_components'].username
 
-    def _getURLOpener(self):
+    def connectionStats(self):
         """
-        method getting a secure (HTTPS) connection
+        Counters of the connections opened and reused by the shared pool
+        """
+        return self.pool.stats()
+
+    def _getOpenerKeyCert(self):
+        """
+        Key and certificate to make HTTPS connections with
         """
         key, cert = None, None
         if self['endpoint_components'].scheme == 'https':
@@ -367,14 +383,27 @@ class Requests(dict):
                 msg = 'No certificate or key found, authentication may fail'
                 self['logger'].info(msg)
                 self['logger'].debug(str(ex))
+        return key, cert
+
+    def poolKey(self):
+        """
+        Key of the pooled connections this object can use
+        """
+        components = self['endpoint_components']
+        return (components.scheme, components.netloc, self.keyCert, self['timeout'])
 
+    def _getURLOpener(self):
+        """
+        method getting a secure (HTTPS) connection
+        """
+        key, cert = self.keyCert
         try:
             # disable validation as we don't have a single PEM with all ca's
-            http = httplib2.Http(self['req_cache_path'], self['timeout'],
+            http = httplib2.Http(None, self['timeout'],
                                  disable_ssl_certificate_validation = True)
         except TypeError:
             # old httplib2 versions disable validation by default
-            http = httplib2.Http(self['req_cache_path'], self['timeout'])
+            http = httplib2.Http(None, self['timeout'])
 
         # Domain must be just a hostname and port. self[host] is a URL currently
         if key or cert:
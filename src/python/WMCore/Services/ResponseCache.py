@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+"""
+_ResponseCache_
+
+Two tier cache of the responses a Service gets: the response bodies are kept
+in the cache files on disk, with a size-bounded in memory LRU of the most
+recently used ones in front of them.
+
+For every cache file the cache keeps the time it expires and the ETag and
+Last-Modified validators of the response in a metadata file next to it, so
+that an expired cache file can be revalidated with a conditional GET instead
+of being downloaded again.  The cache files the cache knows about are evicted,
+least recently used first, when their total size goes over the disk limit.
+
+The caches are shared by all the Service instances of the process that use
+the same cache directory.  A response is only served from memory while its
+cache file hasn't changed, so files rewritten by other processes or by code
+writing the cache files directly are picked up.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from StringIO import StringIO
+
+META_SUFFIX = '.meta'
+
+_caches = {}
+_cachesLock = threading.Lock()
+
+
+def getResponseCache(cacheDir, memorySize, diskSize):
+    """
+    _getResponseCache_
+
+    Return the ResponseCache of a cache directory, shared by the whole
+    process.  When Services ask for different size limits for the same
+    directory the cache gets the largest ones.  The caches of directories
+    that were deleted in the meantime, like the temporary ones of the
+    Services that are gone, are dropped.
+    """
+    _cachesLock.acquire()
+    try:
+        for otherDir in _caches.keys():
+            if otherDir and not os.path.isdir(otherDir):
+                del _caches[otherDir]
+        cache = _caches.get(cacheDir, None)
+        if cache == None:
+            cache = ResponseCache(cacheDir, memorySize, diskSize)
+            _caches[cacheDir] = cache
+        else:
+            cache.setLimits(max(cache.memorySize, memorySize),
+                            max(cache.diskSize, diskSize))
+        return cache
+    finally:
+        _cachesLock.release()
+
+
+def fileStamp(path):
+    """
+    _fileStamp_
+
+    What changes when a file is written: its modification time, size and
+    inode change time.
+    """
+    info = os.stat(path)
+    return (info.st_mtime, info.st_size, info.st_ctime)
+
+
+class CachedFile(StringIO):
+    """
+    _CachedFile_
+
+    Read only file object for a response body held in memory, named after
+    its cache file.
+    """
+    def __init__(self, data, name):
+        StringIO.__init__(self, data)
+        self.name = name
+
+
+class CacheEntry(object):
+    """
+    _CacheEntry_
+
+    What the cache knows about a cache file.
+    """
+    def __init__(self, path, size, expires, etag = None, lastModified = None,
+                 used = None):
+        self.path = path
+        self.size = size
+        self.expires = expires
+        self.etag = etag
+        self.lastModified = lastModified
+        self.used = used or time.time()
+
+    def toDict(self):
+        return {'size': self.size, 'expires': self.expires, 'etag': self.etag,
+                'last_modified': self.lastModified, 'used': self.used}
+
+
+class ResponseCache(object):
+    """
+    _ResponseCache_
+
+    Memory and disk cache of Service responses with conditional revalidation.
+    """
+    def __init__(self, cacheDir, memorySize = 16 * 1024 * 1024,
+                 diskSize = 1024 * 1024 * 1024):
+        self.cacheDir = cacheDir
+        self.memorySize = memorySize
+        self.diskSize = diskSize
+        self.lock = threading.RLock()
+
+        self.memory = OrderedDict()
+        self.memoryUsed = 0
+        self.entries = {}
+        self.diskUsed = 0
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0,
+                         'memory_hits': 0, 'bytes_downloaded': 0,
+                         'bytes_saved': 0, 'evictions': 0}
+        self.loadEntries()
+
+    def setLimits(self, memorySize, diskSize):
+        """
+        _setLimits_
+
+        Change the size limits, dropping what doesn't fit any more.
+        """
+        self.lock.acquire()
+        try:
+            self.memorySize = memorySize
+            self.diskSize = diskSize
+            while self.memoryUsed > self.memorySize:
+                _, (dropped, _) = self.memory.popitem(last = False)
+                self.memoryUsed -= len(dropped)
+            self.evict()
+        finally:
+            self.lock.release()
+
+    def loadEntries(self):
+        """
+        _loadEntries_
+
+        Pick up the cache files left by earlier processes, so that they count
+        towards the disk limit and can be revalidated.
+        """
+        if not self.cacheDir or not os.path.isdir(self.cacheDir):
+            return
+        for fileName in os.listdir(self.cacheDir):
+            if not fileName.endswith(META_SUFFIX):
+                continue
+            path = os.path.join(self.cacheDir, fileName[:-len(META_SUFFIX)])
+            try:
+                with open(path + META_SUFFIX) as metaFile:
+                    meta = json.load(metaFile)
+                entry = CacheEntry(path, os.path.getsize(path), meta['expires'],
+                                   meta.get('etag'), meta.get('last_modified'),
+                                   meta.get('used'))
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+            self.entries[path] = entry
+            self.diskUsed += entry.size
+        return
+
+    def getEntry(self, path):
+        """
+        _getEntry_
+
+        Return the entry of a cache file, None if the cache doesn't know
+        about it or it was removed behind its back.
+        """
+        entry = self.entries.get(path, None)
+        if entry != None and not os.path.exists(path):
+            self.forget(path)
+            return None
+        return entry
+
+    def validators(self, path):
+        """
+        _validators_
+
+        Headers that make a request for an expired cache file conditional.
+        """
+        self.lock.acquire()
+        try:
+            headers = {}
+            entry = self.getEntry(path)
+            if entry != None:
+                if entry.etag:
+                    headers['If-None-Match'] = entry.etag
+                if entry.lastModified:
+                    headers['If-Modified-Since'] = entry.lastModified
+            return headers
+        finally:
+            self.lock.release()
+
+    def open(self, path):
+        """
+        _open_
+
+        Return a file object for a fresh cache file, from memory if the file
+        didn't change since it was read.
+        """
+        stamp = fileStamp(path)
+        self.lock.acquire()
+        try:
+            entry = self.getEntry(path)
+            if entry != None:
+                entry.used = time.time()
+            cached = self.memory.pop(path, None)
+            if cached != None and cached[1] == stamp:
+                self.memory[path] = cached
+                self.counters['memory_hits'] += 1
+                return CachedFile(cached[0], path)
+            elif cached != None:
+                self.memoryUsed -= len(cached[0])
+        finally:
+            self.lock.release()
+
+        with open(path, 'r') as f:
+            data = f.read()
+            stamp = fileStamp(path)
+        self.lock.acquire()
+        try:
+            self.remember(path, data, stamp)
+        finally:
+            self.lock.release()
+        return CachedFile(data, path)
+
+    def hit(self, path):
+        """
+        _hit_
+
+        Record that a cache file was still fresh, so nothing was requested.
+        """
+        self.lock.acquire()
+        try:
+            self.counters['hits'] += 1
+            entry = self.getEntry(path)
+            if entry != None:
+                self.counters['bytes_saved'] += entry.size
+        finally:
+            self.lock.release()
+
+    def store(self, path, data, expires, headers = None):
+        """
+        _store_
+
+        Write a freshly downloaded response to its cache file and remember
+        its validators.
+        """
+        headers = headers or {}
+        with open(path, 'w') as f:
+            f.write(data)
+        self.lock.acquire()
+        try:
+            self.counters['misses'] += 1
+            self.counters['bytes_downloaded'] += len(data)
+            self.forget(path)
+            entry = CacheEntry(path, len(data), expires, headers.get('etag'),
+                               headers.get('last-modified'))
+            self.entries[path] = entry
+            self.diskUsed += entry.size
+            self.writeMeta(entry)
+            self.remember(path, data, fileStamp(path))
+            self.evict(keep = path)
+        finally:
+            self.lock.release()
+
+    def revalidated(self, path, expires, headers = None):
+        """
+        _revalidated_
+
+        The service confirmed that the cache file is still valid, keep it
+        for another cache duration.
+        """
+        headers = headers or {}
+        self.lock.acquire()
+        try:
+            self.counters['revalidated'] += 1
+            entry = self.getEntry(path)
+            if entry == None:
+                entry = CacheEntry(path, os.path.getsize(path), expires)
+                self.entries[path] = entry
+                self.diskUsed += entry.size
+            entry.expires = expires
+            entry.used = time.time()
+            entry.etag = headers.get('etag', entry.etag)
+            entry.lastModified = headers.get('last-modified', entry.lastModified)
+            self.counters['bytes_saved'] += entry.size
+            stamp = fileStamp(path)
+            self.writeMeta(entry)
+            cached = self.memory.get(path, None)
+            if cached != None and cached[1] == stamp:
+                # only the expiry time of the file changed
+                self.memory[path] = (cached[0], fileStamp(path))
+        finally:
+            self.lock.release()
+
+    def remove(self, path):
+        """
+        _remove_
+
+        Forget a cache file and delete its metadata.
+        """
+        self.lock.acquire()
+        try:
+            self.forget(path)
+            if os.path.exists(path + META_SUFFIX):
+                os.remove(path + META_SUFFIX)
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        """
+        _stats_
+
+        Counters of the cache, for monitoring.
+        """
+        self.lock.acquire()
+        try:
+            stats = dict(self.counters)
+            stats['memory_bytes'] = self.memoryUsed
+            stats['memory_entries'] = len(self.memory)
+            stats['disk_bytes'] = self.diskUsed
+            stats['disk_entries'] = len(self.entries)
+            return stats
+        finally:
+            self.lock.release()
+
+    def writeMeta(self, entry):
+        """
+        _writeMeta_
+
+        Save the metadata of an entry and set the modification time of its
+        cache file to the time it expires, as Service.cache_expired expects.
+        """
+        with open(entry.path + META_SUFFIX, 'w') as metaFile:
+            json.dump(entry.toDict(), metaFile)
+        os.utime(entry.path, (time.time(), entry.expires))
+
+    def remember(self, path, data, stamp):
+        """
+        _remember_
+
+        Keep a response body in memory with the stamp of its cache file,
+        dropping the least recently used ones that don't fit any more.
+        Bodies bigger than a quarter of the memory aren't kept.
+        """
+        old = self.memory.pop(path, None)
+        if old != None:
+            self.memoryUsed -= len(old[0])
+        if len(data) > self.memorySize / 4:
+            return
+        self.memory[path] = (data, stamp)
+        self.memoryUsed += len(data)
+        while self.memoryUsed > self.memorySize:
+            _, (dropped, _) = self.memory.popitem(last = False)
+            self.memoryUsed -= len(dropped)
+
+    def forget(self, path):
+        """
+        _forget_
+
+        Drop a cache file from memory and from the disk accounting.
+        """
+        cached = self.memory.pop(path, None)
+        if cached != None:
+            self.memoryUsed -= len(cached[0])
+        entry = self.entries.pop(path, None)
+        if entry != None:
+            self.diskUsed -= entry.size
+
+    def evict(self, keep = None):
+        """
+        _evict_
+
+        Delete the least recently used cache files until they fit in the disk
+        limit again.
+        """
+        if self.diskUsed <= self.diskSize:
+            return
+        for entry in sorted(self.entries.values(), key = lambda x: x.used):
+            if self.diskUsed <= self.diskSize:
+                break
+            if entry.path == keep:
+                continue
+            self.forget(entry.path)
+            for path in [entry.path, entry.path + META_SUFFIX]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.counters['evictions'] += 1
+        return
@@ -39,6 +39,14 @@ The Service class provides two layers of caching:
     service fails to respond the second layer cache will be used until the cache
     dies.
 
+The internal cache is a ResponseCache shared by the Services using the same
+cache path: the most recently used responses are also kept in memory (up to
+memcachesize MB) and the cache files are evicted, least recently used first,
+once they take more than maxcachesize MB.  Expired cache files are
+revalidated with a conditional GET (ETag/Last-Modified), so unchanged
+responses aren't downloaded again.  cacheStats() returns the hit, miss and
+bytes saved counters of the cache.
+
 In tabular form:
 
 httplib2 cache  |   yes    |   yes    |    no    |     no     |
@@ -65,16 +73,13 @@ def cache_expired(cache, delta = 0):
         if not os.path.exists(cache):
             return True
 
-        delta = datetime.timedelta(hours = delta)
-        t = datetime.datetime.now() - delta
         # cache file mtime has been set to cache expiry time
-        if (os.path.getmtime(cache) < time.mktime(t.timetuple())):
+        if os.path.getmtime(cache) < time.time() - delta * 3600:
             return True
 
     return False
 
 
-import datetime
 import os
 import time
 import types
@@ -91,6 +96,7 @@ from httplib2 import HttpLib2Error
 from urlparse import urlparse
 
 from WMCore.Services.Requests import Requests, JSONRequests
+from WMCore.Services.ResponseCache import getResponseCache
 from WMCore.WMException import WMException
 from WMCore.Wrappers import JsonWrapper as json
 
@@ -119,6 +125,8 @@ class Service(dict):
         self.setdefault("inputdata", {})
         self.setdefault("cacheduration", 0.5)
         self.setdefault("maxcachereuse", 24.0)
+        self.setdefault("memcachesize", 16)
+        self.setdefault("maxcachesize", 1024)
         self.supportVerbList = ('GET', 'POST', 'PUT', 'DELETE')
         # this value should be only set when whole service class uses
         # the same verb ('GET', 'POST', 'PUT', 'DELETE')
@@ -150,6 +158,9 @@ class Service(dict):
 
         # cachepath will be modified - i.e. hostname added
         self['cachepath'] = self["requests"]["cachepath"]
+        self.responseCache = getResponseCache(self['cachepath'],
+                                              int(self['memcachesize'] * 1024 * 1024),
+                                              int(self['maxcachesize'] * 1024 * 1024))
 
         if 'logger' not in self:
             if self['cachepath']:
@@ -205,15 +216,16 @@ class Service(dict):
         """
         verb = self._verbCheck(verb)
 
-        t = datetime.datetime.now() - datetime.timedelta(hours = self['cacheduration'])
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
 
         if cache_expired(cachefile):
             self.getData(cachefile, url, inputdata, incoming_headers, encoder, decoder, verb, contentType)
+        else:
+            self.responseCache.hit(cachefile)
 
         # cachefile may be filename or file object
         if openfile and not isfile(cachefile):
-            return open(cachefile, 'r')
+            return self.responseCache.open(cachefile)
         else:
             return cachefile
 
@@ -230,11 +242,12 @@ class Service(dict):
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
 
         self['logger'].debug("Forcing cache refresh of %s" % cachefile)
+        incoming_headers = dict(incoming_headers)
         incoming_headers.update({'cache-control':'no-cache'})
         self.getData(cachefile, url, inputdata, incoming_headers,
                      encoder, decoder, verb, contentType, force_refresh = True, )
         if openfile and not isfile(cachefile):
-            return open(cachefile, 'r')
+            return self.responseCache.open(cachefile)
         else:
             return cachefile
 
@@ -249,6 +262,7 @@ class Service(dict):
         verb = self._verbCheck(verb)
         os.system("/bin/rm -f %s/*" % self['requests']['req_cache_path'])
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
+        self.responseCache.remove(cachefile)
         try:
             if not isfile(cachefile):
                 os.remove(cachefile)
@@ -273,30 +287,38 @@ class Service(dict):
                 inputdata = self["inputdata"]
             self['logger'].debug('getData: \n\turl: %s\n\tdata: %s' % \
                                  (url, inputdata))
+            incoming_headers = dict(incoming_headers)
+            revalidate = not isfile(cachefile) and verb == 'GET' and \
+                         not force_refresh and os.path.exists(cachefile)
+            if revalidate:
+                incoming_headers.update(self.responseCache.validators(cachefile))
+            response_headers = {}
             data, status, reason, from_cache = self["requests"].makeRequest(uri = url,
                                                     verb = verb,
                                                     data = inputdata,
                                                     incoming_headers = incoming_headers,
                                                     encoder = encoder,
                                                     decoder = decoder,
-                                                    contentType = contentType)
-            if from_cache:
-                # If it's coming from the cache we don't need to write it to the
-                # second cache, or do we?
+                                                    contentType = contentType,
+                                                    responseHeaders = response_headers)
+            if revalidate and (status == 304 or from_cache):
+                # The cache file is still valid, or the same data came out of
+                # the httplib2 cache
                 self['logger'].debug('Data is from the cache')
+                self.responseCache.revalidated(cachefile, self.cacheExpiry(),
+                                               response_headers)
+            elif isfile(cachefile):
+                cachefile.write(str(data))
+                cachefile.seek (0, 0) # return to beginning of file
             else:
                 # Don't need to prepend the cachepath, the methods calling
                 # getData have done that for us
-                if isfile(cachefile):
-                    cachefile.write(str(data))
-                    cachefile.seek (0, 0) # return to beginning of file
+                if isinstance(data, dict) or isinstance(data, list):
+                    data = json.dumps(data)
                 else:
-                    f = open(cachefile, 'w')
-                    if isinstance(data, dict) or isinstance(data, list):
-                        f.write(json.dumps(data))
-                    else:
-                        f.write(str(data))
-                    f.close()
+                    data = str(data)
+                self.responseCache.store(cachefile, data, self.cacheExpiry(),
+                                         response_headers)
 
 
         except (IOError, HttpLib2Error, HTTPException) as he:
@@ -354,6 +376,18 @@ class Service(dict):
                         self['logger'].warning(msg)
                     raise he
 
+    def cacheExpiry(self):
+        """
+        Time at which a response fetched now expires
+        """
+        return time.time() + (self['cacheduration'] or 0) * 3600
+
+    def cacheStats(self):
+        """
+        Hit, miss and bytes saved counters of the response cache
+        """
+        return self.responseCache.stats()
+
     def _verbCheck(self, verb='GET'):
         if verb.upper() in self.supportVerbList:
             return verb.upper()
@@ -10,6 +10,8 @@ from WMCore.Services.EmulatorSwitch import emulatorHook
 
 import json
 import re
+import threading
+import time
 
 #TODO remove this when all DBS origin_site_name is converted to PNN
 pnn_regex = re.compile(r'^T[0-3%]((_[A-Z]{2}(_[A-Za-z0-9]+)*)?)')
@@ -26,6 +28,72 @@ def unflattenJSON(data):
     columns = data['desc']['columns']
     return [row2dict(columns, row) for row in data['result']]
 
+# SiteTopology objects shared by all the SiteDBJSON instances of the process,
+# keyed by endpoint and cache path
+_topologies = {}
+_topologiesLock = threading.Lock()
+
+class SiteTopology(object):
+    """
+    _SiteTopology_
+
+    Hash indexes of the SiteDB site names, site resources and PNN/PSN
+    mapping, built once from the SiteDB data so that lookups neither
+    scan the lists nor read the cache files.
+    """
+    def __init__(self, sitenames, siteresources, mapping, expires = None):
+        self.sitenames = sitenames
+        self.siteresources = siteresources
+        self.mapping = mapping
+        self.expires = expires
+
+        # site_name -> site name entries, (type, alias) -> site_name
+        self.namesBySite = {}
+        self.siteByAlias = {}
+        for entry in sitenames:
+            self.namesBySite.setdefault(entry['site_name'], []).append(entry)
+            self.siteByAlias.setdefault((entry['type'], entry['alias']), entry['site_name'])
+
+        # fqdn -> site resources, site_name -> site resources
+        self.resourcesByFqdn = {}
+        self.resourcesBySite = {}
+        for resource in siteresources:
+            self.resourcesByFqdn.setdefault(resource['fqdn'], []).append(resource)
+            self.resourcesBySite.setdefault(resource['site_name'], []).append(resource)
+
+        self.psnsByPNN = {}
+        self.pnnsByPSN = {}
+        for item in mapping:
+            self.psnsByPNN.setdefault(item['phedex_name'], []).append(item['psn_name'])
+            self.pnnsByPSN.setdefault(item['psn_name'], []).append(item['phedex_name'])
+
+    def expired(self):
+        """
+        _expired_
+
+        Check if the topology should be rebuilt from fresh SiteDB data.
+        """
+        return self.expires != None and time.time() > self.expires
+
+    def aliases(self, siteName, kind):
+        """
+        _aliases_
+
+        Names of the given kind (cms, psn, phedex) of a site.
+        """
+        return [x['alias'] for x in self.namesBySite.get(siteName, []) if x['type'] == kind]
+
+    def fqdnToAliases(self, fqdn, kind):
+        """
+        _fqdnToAliases_
+
+        Names of the given kind of the sites a CE or SE belongs to.
+        """
+        aliases = []
+        for resource in self.resourcesByFqdn.get(fqdn, []):
+            aliases.extend(self.aliases(resource['site_name'], kind))
+        return aliases
+
 # emulator hook is used to swap the class instance
 # when emulator values are set.
 # Look WMCore.Services.EmulatorSwitch module for the values
@@ -91,7 +159,7 @@ class SiteDBJSON(Service):
 
     def _siteresources(self, clearCache=False):
         filename = 'site-resources.json'
-        return self.getJSON('site-resources', filename=filename)
+        return self.getJSON('site-resources', filename=filename, clearCache=clearCache)
 
     def _dataProcessing(self, pnn=None, psn=None, clearCache=False):
         """
@@ -107,6 +175,33 @@ class SiteDBJSON(Service):
             mapping = [item['phedex_name'] for item in mapping if item['psn_name']==psn]
         return mapping
 
+    def topology(self, clearCache=False):
+        """
+        _topology_
+
+        Return the SiteTopology of this SiteDB instance, shared by the whole
+        process.  It is built again from the SiteDB data once it is older
+        than the cache duration or if clearCache is set.
+        """
+        key = (self['endpoint'], self['cachepath'])
+        topology = _topologies.get(key, None)
+        if topology != None and not clearCache and not topology.expired():
+            return topology
+
+        _topologiesLock.acquire()
+        try:
+            topology = _topologies.get(key, None)
+            if topology == None or clearCache or topology.expired():
+                expires = time.time() + self['cacheduration'] * 3600
+                topology = SiteTopology(self._sitenames(clearCache=clearCache),
+                                        self._siteresources(clearCache=clearCache),
+                                        self._dataProcessing(clearCache=clearCache),
+                                        expires)
+                _topologies[key] = topology
+            return topology
+        finally:
+            _topologiesLock.release()
+
     def dnUserName(self, dn):
         """
         Convert DN to Hypernews name. Clear cache between trys
@@ -153,7 +248,7 @@ class SiteDBJSON(Service):
         Get all CE names from SiteDB
         This is so that we can easily add them to ResourceControl
         """
-        siteresources = self._siteresources()
+        siteresources = self.topology().siteresources
         ceList = filter(lambda x: x['type']=='CE', siteresources)
         ceList = map(lambda x: x['fqdn'], ceList)
         return ceList
@@ -165,7 +260,7 @@ class SiteDBJSON(Service):
         Get all SE names from SiteDB
         This is so that we can easily add them to ResourceControl
         """
-        siteresources = self._siteresources()
+        siteresources = self.topology().siteresources
         seList = filter(lambda x: x['type']=='SE', siteresources)
         seList = map(lambda x: x['fqdn'], seList)
         return seList
@@ -177,7 +272,7 @@ class SiteDBJSON(Service):
         Get all the CMSNames from siteDB
         This will allow us to add them in resourceControl at once
         """
-        sitenames = self._sitenames()
+        sitenames = self.topology().sitenames
         cmsnames = filter(lambda x: x['type']=='psn', sitenames)
         cmsnames = map(lambda x: x['alias'], cmsnames)
         return cmsnames
@@ -189,7 +284,7 @@ class SiteDBJSON(Service):
         Get all the CMSNames from siteDB
         This will allow us to add them in resourceControl at once
         """
-        sitenames = self._sitenames()
+        sitenames = self.topology().sitenames
         node_names = filter(lambda x: x['type']=='phedex', sitenames)
         node_names = map(lambda x: x['alias'], node_names)
         if excludeBuffer:
@@ -204,10 +299,11 @@ class SiteDBJSON(Service):
         cmsname_pattern = cmsname_pattern.replace('%','.*')
         cmsname_pattern = re.compile(cmsname_pattern)
 
+        topology = self.topology()
         sitenames = filter(lambda x: x[u'type']=='psn' and cmsname_pattern.match(x[u'alias']),
-                           self._sitenames())
+                           topology.sitenames)
         sitenames = set(map(lambda x: x['site_name'], sitenames))
-        siteresources = filter(lambda x: x['site_name'] in sitenames, self._siteresources())
+        siteresources = filter(lambda x: x['site_name'] in sitenames, topology.siteresources)
         hostlist = filter(lambda x: x['type']==kind, siteresources)
         hostlist = map(lambda x: x['fqdn'], hostlist)
 
@@ -218,72 +314,45 @@ class SiteDBJSON(Service):
         Convert SE name to the CMS Site they belong to,
         this is not a 1-to-1 relation but 1-to-many, return a list of cms site alias
         """
-        try:
-            siteresources = filter(lambda x: x['fqdn']==ce, self._siteresources())
-        except IndexError:
-            return None
-        siteNames = []
-        for resource in siteresources:
-            siteNames.extend(self._sitenames(sitename=resource['site_name']))
-        cmsname = filter(lambda x: x['type']=='cms', siteNames)
-        return [x['alias'] for x in cmsname]
+        return self.topology().fqdnToAliases(ce, 'cms')
 
     def seToCMSName(self, se):
         """
         Convert SE name to the CMS Site they belong to,
         this is not a 1-to-1 relation but 1-to-many, return a list of cms site alias
         """
-        try:
-            siteresources = filter(lambda x: x['fqdn']==se, self._siteresources())
-        except IndexError:
-            return None
-        siteNames = []
-        for resource in siteresources:
-            siteNames.extend(self._sitenames(sitename=resource['site_name']))
-        cmsname = filter(lambda x: x['type']=='cms', siteNames)
-        return [x['alias'] for x in cmsname]
+        return self.topology().fqdnToAliases(se, 'cms')
 
     def seToPNNs(self, se):
         """
         Convert SE name to the PNN they belong to,
         this is not a 1-to-1 relation but 1-to-many, return a list of pnns
         """
-        try:
-            siteresources = filter(lambda x: x['fqdn']==se, self._siteresources())
-        except IndexError:
-            return None
-        siteNames = []
-        for resource in siteresources:
-            siteNames.extend(self._sitenames(sitename=resource['site_name']))
-        pnns = filter(lambda x: x['type']=='phedex', siteNames)
-        return [x['alias'] for x in pnns]
+        return self.topology().fqdnToAliases(se, 'phedex')
 
 
     def cmsNametoPhEDExNode(self, cmsName):
         """
         Convert CMS name to list of Phedex Nodes
         """
-        sitenames = self._sitenames()
-        try:
-            sitename = filter(lambda x: x['type']=='cms' and x['alias']==cmsName, sitenames)[0]['site_name']
-        except IndexError:
+        topology = self.topology()
+        sitename = topology.siteByAlias.get(('cms', cmsName), None)
+        if sitename == None:
             return None
-        phedexnames = filter(lambda x: x['type']=='phedex' and x['site_name']==sitename, sitenames)
-        phedexnames = map(lambda x: x['alias'], phedexnames)
-        return phedexnames
+        return topology.aliases(sitename, 'phedex')
 
 
     def PNNtoPSN(self, pnn):
         """
         Convert PhEDEx node name to Processing Site Name(s)
         """
-        return self._dataProcessing(pnn=pnn)
+        return list(self.topology().psnsByPNN.get(pnn, []))
 
     def PSNtoPNN(self, psn):
         """
         Convert Processing Site Name to PhEDEx Node Name(s)
         """
-        return self._dataProcessing(psn=psn)
+        return list(self.topology().pnnsByPSN.get(psn, []))
 
     def PNNstoPSNs(self, pnns):
         """
@@ -317,7 +386,7 @@ class SiteDBJSON(Service):
 
         mapping = {}
         psn_pattern = re.compile(psn_pattern)  # .replace('*', '.*').replace('%', '.*'))
-        for entry in self._dataProcessing():
+        for entry in self.topology().mapping:
             if not psn_pattern.match(entry['psn_name']):
                 continue
             mapping.setdefault(entry['psn_name'], set()).add(entry['phedex_name'])
@@ -8,6 +8,12 @@ Description: a basic wrapper around pycurl library.
 The RequestHandler class provides basic APIs to get data
 from a single resource or submit mutliple requests to
 underlying data-services.
+
+Multiple requests are run concurrently on a CurlMulti, up to
+max_connections at a time, with curl handles reused from one
+request to the next.  The handles of a RequestHandler share their
+DNS cache, SSL sessions and (where libcurl supports it) open
+connections, so keep-alive connections survive across calls.
 """
 from __future__ import print_function
 import time
@@ -65,7 +71,9 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', 30)
         self.followlocation = config.get('followlocation', 1)
         self.maxredirs = config.get('maxredirs', 5)
+        self.max_connections = config.get('max_connections', 10)
         self.logger = logger if logger else logging.getLogger()
+        self._share = None
 
     def set_opts(self, curl, url, params, headers,
                  ckey=None, cert=None, capath=None, verbose=None, verb='GET', doseq=True, cainfo=None):
@@ -157,6 +165,20 @@ class RequestHandler(object):
         """
         return ResponseHeader(header)
 
+    def http_error(self, url, params, headers, header, data):
+        """Build the exception for a response with an HTTP error status"""
+        msg = 'url=%s, code=%s, reason=%s, headers=%s' \
+                % (url, header.status, header.reason, header.header)
+        exc = httplib.HTTPException(msg)
+        setattr(exc, 'req_data', params)
+        setattr(exc, 'req_headers', headers)
+        setattr(exc, 'url', url)
+        setattr(exc, 'result', data)
+        setattr(exc, 'status', header.status)
+        setattr(exc, 'reason', header.reason)
+        setattr(exc, 'headers', header.header)
+        return exc
+
     def request(self, url, params, headers=None, verb='GET',
                 verbose=0, ckey=None, cert=None, capath=None, doseq=True, decode=False, cainfo=None):
         """Fetch data for given set of parameters"""
@@ -167,23 +189,14 @@ class RequestHandler(object):
         if  verbose:
             print(verb, url, params, headers)
         header = self.parse_header(hbuf.getvalue())
-        if  header.status < 300:
-            if  verb == 'HEAD':
+        if  header.status < 300 or header.status == 304:
+            if  verb == 'HEAD' or header.status == 304:
                 data = ''
             else:
                 data = self.parse_body(bbuf.getvalue(), decode)
         else:
             data = bbuf.getvalue()
-            msg = 'url=%s, code=%s, reason=%s, headers=%s' \
-                    % (url, header.status, header.reason, header.header)
-            exc = httplib.HTTPException(msg)
-            setattr(exc, 'req_data', params)
-            setattr(exc, 'req_headers', headers)
-            setattr(exc, 'url', url)
-            setattr(exc, 'result', data)
-            setattr(exc, 'status', header.status)
-            setattr(exc, 'reason', header.reason)
-            setattr(exc, 'headers', header.header)
+            exc = self.http_error(url, params, headers, header, data)
             bbuf.flush()
             hbuf.flush()
             raise exc
@@ -206,41 +219,153 @@ class RequestHandler(object):
                     verbose, ckey, cert, doseq)
         return header
 
-    def multirequest(self, url, parray, headers=None,
-                ckey=None, cert=None, verbose=None):
-        """Fetch data for given set of parameters"""
+    def share(self):
+        """
+        Return the CurlShare all the curl handles of this object use,
+        so they share DNS lookups, SSL sessions and connections.
+        """
+        if  self._share is None:
+            self._share = pycurl.CurlShare()
+            self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+            self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+            if  hasattr(pycurl, 'LOCK_DATA_CONNECT'):
+                self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+        return self._share
+
+    def multi_fetch(self, url, parray, headers=None, verb='GET',
+                    ckey=None, cert=None, capath=None, doseq=True, decode=False,
+                    cainfo=None, max_connections=None):
+        """
+        Fetch url for each set of parameters in parray concurrently, with up
+        to max_connections requests in flight.  Yields a MultiResult per
+        request as soon as it completes, i.e. not in parray order.
+        """
+        if  not max_connections:
+            max_connections = self.max_connections
+        requests = iter(enumerate(parray))
         multi = pycurl.CurlMulti()
-        for params in parray:
-            curl = pycurl.Curl()
-            bbuf, hbuf = \
-                self.set_opts(curl, url, params, headers, ckey, cert, verbose)
-            multi.add_handle(curl)
-            while True:
-                ret, num_handles = multi.perform()
-                if  ret != pycurl.E_CALL_MULTI_PERFORM:
-                    break
-            while num_handles:
-                ret = multi.select(1.0)
-                if  ret == -1:
-                    continue
+        multi.setopt(pycurl.M_MAXCONNECTS, max_connections)
+        handles = []
+        free = []
+        active = {}
+        try:
+            more = True
+            while more or active:
+                while more and len(active) < max_connections:
+                    try:
+                        index, params = next(requests)
+                    except StopIteration:
+                        more = False
+                        break
+                    if  free:
+                        # keeps its connections and share
+                        curl = free.pop()
+                        curl.reset()
+                    else:
+                        curl = pycurl.Curl()
+                        curl.setopt(pycurl.SHARE, self.share())
+                        handles.append(curl)
+                    bbuf, hbuf = self.set_opts(curl, url, params, headers, ckey,
+                                               cert, capath, None, verb, doseq, cainfo)
+                    active[id(curl)] = (curl, index, params, bbuf, hbuf)
+                    multi.add_handle(curl)
+
                 while True:
-                    ret, num_handles = multi.perform()
+                    ret, _num_handles = multi.perform()
                     if  ret != pycurl.E_CALL_MULTI_PERFORM:
                         break
-            _numq, response, _err = multi.info_read()
-            for _cobj in response:
-                data = json.loads(bbuf.getvalue())
-                if  isinstance(data, dict):
-                    data.update(params)
-                    yield data
-                if  isinstance(data, list):
-                    for item in data:
-                        if  isinstance(item, dict):
-                            item.update(params)
-                            yield item
+
+                while True:
+                    _numq, done, failed = multi.info_read()
+                    finished = [(curl, None) for curl in done]
+                    finished.extend([(curl, pycurl.error(errno, errmsg)) \
+                                     for curl, errno, errmsg in failed])
+                    for curl, error in finished:
+                        _, index, params, bbuf, hbuf = active.pop(id(curl))
+                        result = MultiResult(index, url, params, curl)
+                        if  error is None:
+                            result.header = self.parse_header(hbuf.getvalue())
+                            if  result.header.status < 300:
+                                result.data = self.parse_body(bbuf.getvalue(), decode)
+                            else:
+                                result.data = bbuf.getvalue()
+                                result.error = self.http_error(url, params, headers,
+                                                               result.header, result.data)
                         else:
-                            err = 'Unsupported data format: data=%s, type=%s'\
-                                % (item, type(item))
-                            raise Exception(err)
-                bbuf.flush()
-                hbuf.flush()
+                            result.error = error
+                        multi.remove_handle(curl)
+                        free.append(curl)
+                        yield result
+                    if  not _numq:
+                        break
+
+                if  active:
+                    # wake up for the timeouts libcurl keeps too
+                    timeout = multi.timeout()
+                    if  timeout < 0 or timeout > 1000:
+                        timeout = 1000
+                    multi.select(timeout / 1000.0)
+        finally:
+            for curl in active.values():
+                multi.remove_handle(curl[0])
+            for curl in handles:
+                curl.close()
+            multi.close()
+
+    def multirequest(self, url, parray, headers=None,
+                ckey=None, cert=None, verbose=None, max_connections=None):
+        """
+        Fetch JSON data for given set of parameters concurrently. Yields the
+        data records updated with the parameters of their request, as the
+        requests complete.
+        """
+        for result in self.multi_fetch(url, parray, headers, ckey=ckey, cert=cert,
+                                       max_connections=max_connections):
+            if  verbose:
+                print(result)
+            if  result.error is not None:
+                raise result.error
+            data = json.loads(result.data)
+            params = result.params
+            if  isinstance(data, dict):
+                data.update(params)
+                yield data
+            if  isinstance(data, list):
+                for item in data:
+                    if  isinstance(item, dict):
+                        item.update(params)
+                        yield item
+                    else:
+                        err = 'Unsupported data format: data=%s, type=%s'\
+                            % (item, type(item))
+                        raise Exception(err)
+
+class MultiResult(object):
+    """
+    MultiResult holds the outcome of one of the requests of
+    RequestHandler.multi_fetch: the response header and body, or the
+    error it failed with, and how long its steps took.
+    """
+    def __init__(self, index, url, params, curl):
+        super(MultiResult, self).__init__()
+        self.index = index
+        self.url = url
+        self.params = params
+        self.header = None
+        self.data = None
+        self.error = None
+        # seconds from the start of the request, as measured by libcurl
+        self.timing = {'namelookup': curl.getinfo(pycurl.NAMELOOKUP_TIME),
+                       'connect': curl.getinfo(pycurl.CONNECT_TIME),
+                       'starttransfer': curl.getinfo(pycurl.STARTTRANSFER_TIME),
+                       'total': curl.getinfo(pycurl.TOTAL_TIME)}
+        # 0 if the request went over a connection that was already open
+        self.new_connections = curl.getinfo(pycurl.NUM_CONNECTS)
+
+    def __repr__(self):
+        if  self.error is not None:
+            outcome = 'error=%s' % str(self.error)
+        else:
+            outcome = 'status=%s' % self.header.status
+        return 'MultiResult(index=%s, params=%s, %s, total=%.3f)' \
+                % (self.index, self.params, outcome, self.timing['total'])
@@ -105,39 +105,16 @@ class File(WMBSBase, WMFile):
         """
         existingTransaction = self.beginTransaction()
 
-        def _getAncestorIDs(ids, level):
-            action = self.daofactory(classname = "Files.GetParentIDsByID")
-            parentIDs = action.execute(ids, conn = self.getDBConn(),
-                                       transaction = self.existingTransaction())
-
-            parentIDs.sort()
-            if level == 1 or len(parentIDs) == 0:
-                return parentIDs
-            else:
-                return _getAncestorIDs(parentIDs, level - 1)
-
         if self["id"] < 0:
             self.load()
 
-        idList = _getAncestorIDs(self["id"], level)
-
-        if type == "id":
-            results = idList
-        elif type == "lfn":
-            results = []
-            for fileID in idList:
-                anceFile = File(id=fileID)
-                anceFile.load()
-                results.append(anceFile["lfn"])
-        elif type == "file":
-            results = []
-            for fileID in idList:
-                anceFile = File(id=fileID)
-                anceFile.load()
-                results.append(anceFile)
+        results = getAncestorsInBulk([self["id"]], level = level, type = type,
+                                     conn = self.getDBConn(),
+                                     transaction = self.existingTransaction(),
+                                     daofactory = self.daofactory)
 
         self.commitTransaction(existingTransaction)
-        return results
+        return results[self["id"]]
 
     def getDescendants(self, level=2, type="id"):
         """
@@ -147,39 +124,16 @@ class File(WMBSBase, WMFile):
         """
         existingTransaction = self.beginTransaction()
 
-        def _getDescendantIDs(ids, level):
-            action = self.daofactory(classname = "Files.GetChildIDsByID")
-            childIDs = action.execute(ids, conn = self.getDBConn(),
-                                       transaction = self.existingTransaction())
-
-            childIDs.sort()
-            if level == 1 or len(childIDs) == 0:
-                return childIDs
-            else:
-                return _getDescendantIDs(childIDs, level - 1)
-
         if self["id"] < 0:
             self.load()
 
-        idList = _getDescendantIDs(self["id"], level)
-
-        if type == "id":
-            results = idList
-        elif type == "lfn":
-            results = []
-            for fileID in idList:
-                descFile = File(id=fileID)
-                descFile.load()
-                results.append(descFile['lfn'])
-        elif type == "file":
-            results = []
-            for fileID in idList:
-                descFile = File(id=fileID)
-                descFile.load()
-                results.append(descFile)
+        results = getDescendantsInBulk([self["id"]], level = level, type = type,
+                                       conn = self.getDBConn(),
+                                       transaction = self.existingTransaction(),
+                                       daofactory = self.daofactory)
 
         self.commitTransaction(existingTransaction)
-        return results
+        return results[self["id"]]
 
     def load(self):
         """
@@ -635,3 +589,71 @@ def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS = True,
                              transaction = transaction)
 
     return len(lfnsToCreate)
+
+
+def _getHeritageInBulk(fileIDs, level, type, descendants, conn, transaction,
+                       daofactory):
+    """
+    _getHeritageInBulk_
+
+    Find the files level generations away from each of the given files and
+    return them as ids, lfns or File objects, keyed by file id.
+    """
+    if daofactory == None:
+        daofactory = WMBSBase().daofactory
+
+    action = daofactory(classname = "Files.GetAncestry")
+    heritage = action.execute(fileIDs, level = level, descendants = descendants,
+                              conn = conn, transaction = transaction)
+    if type == "id":
+        return heritage
+
+    idList = set()
+    for relatives in heritage.values():
+        idList.update(relatives)
+    idList = list(idList)
+    if len(idList) == 0:
+        return dict([(fileID, []) for fileID in heritage.keys()])
+
+    # Load all the relatives at once
+    action = daofactory(classname = "Files.GetByID")
+    fileInfoDict = action.execute(idList, conn = conn, transaction = transaction)
+
+    if type == "lfn":
+        relatives = dict([(fileID, fileInfoDict[fileID]["lfn"]) for fileID in idList])
+    elif type == "file":
+        action = daofactory(classname = "Files.GetBulkChecksum")
+        checksums = action.execute(idList, conn = conn, transaction = transaction)
+        relatives = {}
+        for fileID in idList:
+            relativeFile = File(id = fileID)
+            relativeFile.update(fileInfoDict[fileID])
+            relativeFile.update(checksums.get(fileID, {}))
+            relatives[fileID] = relativeFile
+
+    return dict([(fileID, [relatives[x] for x in heritage[fileID]]) \
+                 for fileID in heritage.keys()])
+
+def getAncestorsInBulk(fileIDs, level = 2, type = "id", conn = None,
+                       transaction = False, daofactory = None):
+    """
+    _getAncestorsInBulk_
+
+    Get the ancestors level generations up (2 is the grand parents) of many
+    files at once, with one query per generation.  Returns a dictionary of
+    lists of ancestor ids, lfns or File objects (depending on type) sorted by
+    ancestor id, keyed by file id.
+    """
+    return _getHeritageInBulk(fileIDs, level, type, False, conn, transaction,
+                              daofactory)
+
+def getDescendantsInBulk(fileIDs, level = 2, type = "id", conn = None,
+                         transaction = False, daofactory = None):
+    """
+    _getDescendantsInBulk_
+
+    Get the descendants level generations down of many files at once, see
+    getAncestorsInBulk.
+    """
+    return _getHeritageInBulk(fileIDs, level, type, True, conn, transaction,
+                              daofactory)
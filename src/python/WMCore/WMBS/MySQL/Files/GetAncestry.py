@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+_GetAncestry_
+
+MySQL implementation of Files.GetAncestry
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class GetAncestry(DBFormatter):
+    """
+    _GetAncestry_
+
+    Find the ancestors (or descendants) a given number of generations away
+    from many files at once.  The parentage is walked one generation at a
+    time, with one query for all the files of a generation.
+    """
+    parentSQL = """SELECT child AS fileid, parent AS relative
+                     FROM wmbs_file_parent WHERE child = :fileid"""
+
+    childSQL = """SELECT parent AS fileid, child AS relative
+                    FROM wmbs_file_parent WHERE parent = :fileid"""
+
+    def getRelatives(self, fileIDs, descendants = False, conn = None,
+                     transaction = False):
+        """
+        _getRelatives_
+
+        Return a dictionary of the parents (or children) of each file.
+        """
+        relatives = dict([(fileID, set()) for fileID in fileIDs])
+        if len(fileIDs) == 0:
+            return relatives
+
+        if descendants:
+            sql = self.childSQL
+        else:
+            sql = self.parentSQL
+        binds = [{'fileid': fileID} for fileID in fileIDs]
+        result = self.dbi.processData(sql, binds, conn = conn,
+                                      transaction = transaction)
+        for fileID, relative in self.format(result):
+            relatives[int(fileID)].add(int(relative))
+        return relatives
+
+    def execute(self, fileIDs, level = 2, descendants = False,
+                conn = None, transaction = False):
+        """
+        _execute_
+
+        Return a dictionary of the sorted ids of the files level generations
+        away from each file, keyed by file id.
+        """
+        generation = {}
+        for fileID in self.dbi.makelist(fileIDs):
+            generation[int(fileID)] = set([int(fileID)])
+
+        relatives = {}
+        for i in range(level):
+            toLoad = set()
+            for members in generation.values():
+                toLoad.update(members)
+            if len(toLoad) == 0:
+                break
+            toLoad.difference_update(relatives.keys())
+            relatives.update(self.getRelatives(list(toLoad), descendants,
+                                               conn = conn,
+                                               transaction = transaction))
+            for fileID in generation.keys():
+                nextGeneration = set()
+                for relative in generation[fileID]:
+                    nextGeneration.update(relatives[relative])
+                generation[fileID] = nextGeneration
+
+        return dict([(fileID, sorted(generation[fileID])) for fileID in generation.keys()])
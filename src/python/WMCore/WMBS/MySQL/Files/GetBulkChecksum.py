@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+_GetBulkChecksum_
+
+MySQL implementation of Files.GetBulkChecksum
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class GetBulkChecksum(DBFormatter):
+    """
+    _GetBulkChecksum_
+
+    Retrieve the checksums of a list of files given their IDs.
+    """
+    sql = """SELECT fcs.fileid AS id, cst.type AS cktype, fcs.cksum AS cksum
+               FROM wmbs_file_checksums fcs
+               INNER JOIN wmbs_checksum_type cst ON fcs.typeid = cst.id
+               WHERE fcs.fileid = :fileid"""
+
+    def format(self, result):
+        """
+        _format_
+
+        Return a dictionary of checksums keyed by file ID, in the same format
+        as the one GetChecksum returns.  Files without checksums are left out.
+        """
+        checksums = {}
+        for entry in self.iterDict(result):
+            fileChecksums = checksums.setdefault(int(entry["id"]), {'checksums': {}})
+            fileChecksums['checksums'][entry.get('cktype', 'Default')] = entry.get('cksum', None)
+
+        return checksums
+
+    def execute(self, files = None, conn = None, transaction = False):
+        files = self.dbi.makelist(files)
+        if len(files) == 0:
+            return {}
+
+        binds = [{'fileid': fileid} for fileid in files]
+        result = self.dbi.processData(self.sql, binds,
+                                      conn = conn, transaction = transaction)
+        return self.format(result)
@@ -10,9 +10,9 @@ from WMCore.Database.DBFormatter     import DBFormatter
 from WMCore.WMBS.MySQL.Files.GetByID import GetByID
 
 class GetForJobSplittingByID(GetByID):
-    sql = """SELECT id, lfn, filesize, events, first_event, merged, MIN(run) AS minrun
+    sql = """SELECT id, lfn, filesize, events, first_event, merged,
+               (SELECT MIN(run) FROM wmbs_file_runlumi_map wfr WHERE wfr.fileid = wfd.id) AS minrun
              FROM wmbs_file_details wfd
-             LEFT OUTER JOIN wmbs_file_runlumi_map wfr ON wfr.fileid = wfd.id
              WHERE id = :fileid"""
 
 
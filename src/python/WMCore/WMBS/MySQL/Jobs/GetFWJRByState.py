@@ -25,15 +25,35 @@ class GetFWJRByState(DBFormatter):
         _format_
 
         """
-        results = DBFormatter.format(self, results)
-
         jobs = []
-        for result in results:
+        for result in self.iterFormat(results):
             jobs.append({"id": result[0], "fwjr_path": result[1]})
 
         return jobs
 
-    def execute(self, state, conn = None, transaction = False):
+    def stream(self, state, conn = None):
+        """
+        _stream_
+
+        Generator version of execute: the jobs are read from the database a
+        batch at a time while they are iterated over.  The cursor and, if
+        conn isn't given, the connection it uses stay open until all the
+        jobs are read or the generator is closed.
+        """
+        results = self.dbi.streamData(self.sql, {"state": state}, conn = conn)
+        for result in self.iterFormat(results):
+            yield {"id": result[0], "fwjr_path": result[1]}
+
+    def execute(self, state, conn = None, transaction = False, stream = False):
+        """
+        _execute_
+
+        Return the list of jobs in state, or with stream set a generator
+        yielding them without holding them all in memory.
+        """
+        if stream:
+            return self.stream(state, conn = conn)
+
         result = self.dbi.processData(self.sql, {"state": state}, conn = conn,
                                       transaction = transaction)
 
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+"""
+_GetAncestry_
+
+Oracle implementation of Files.GetAncestry
+"""
+
+from WMCore.WMBS.MySQL.Files.GetAncestry import GetAncestry as GetAncestryMySQL
+
+class GetAncestry(GetAncestryMySQL):
+    pass
@@ -18,6 +18,7 @@ from WMCore.WMBS.WMBSBase import WMBSBase
 
 from WMCore.DataStructs.Subscription import Subscription as WMSubscription
 from WMCore.DataStructs.Fileset      import Fileset      as WMFileset
+from WMCore.DataStructs.Run          import Run
 
 from WMCore.Services.UUID import makeUUID
 
@@ -172,12 +173,18 @@ class Subscription(WMBSBase, WMSubscription):
         self.commitTransaction(existingTransaction)
         return result
 
-    def filesOfStatus(self, status, limit = 0, loadChecksums = True, doingJobSplitting = False):
+    def filesOfStatus(self, status, limit = 0, loadChecksums = True, doingJobSplitting = False,
+                      loadLocations = False, loadRunLumis = False):
         """
         _filesOfStatus_
 
         Return a Set of File objects that have the given status with respect
         to this subscription.
+
+        The files are built from a fixed number of bulk queries, whatever
+        the number of files: the file details, the checksums and, if asked
+        for, the locations of the files the status query didn't return them
+        for and the run/lumi information.
         """
         existingTransaction = self.beginTransaction()
 
@@ -192,23 +199,52 @@ class Subscription(WMBSBase, WMSubscription):
             fileList = action.execute(self["id"], conn = self.getDBConn(),
                                       transaction = self.existingTransaction())
 
+        if len(fileList) == 0:
+            self.commitTransaction(existingTransaction)
+            return files
+
         if doingJobSplitting:
             fileInfoAct  = self.daofactory(classname = "Files.GetForJobSplittingByID")
         else:
             fileInfoAct  = self.daofactory(classname = "Files.GetByID")
 
-        fileInfoDict = fileInfoAct.execute(file = [x["file"] for x in fileList],
+        fileIDs = [x["file"] for x in fileList]
+        fileInfoDict = fileInfoAct.execute(file = fileIDs,
                                            conn = self.getDBConn(),
                                            transaction = self.existingTransaction())
 
+        checksums = {}
+        if loadChecksums:
+            checksumAct = self.daofactory(classname = "Files.GetBulkChecksum")
+            checksums = checksumAct.execute(files = fileIDs, conn = self.getDBConn(),
+                                            transaction = self.existingTransaction())
+
+        locations = {}
+        noLocations = [x["file"] for x in fileList if 'locations' not in x]
+        if loadLocations and len(noLocations) > 0:
+            locationAct = self.daofactory(classname = "Files.GetLocationBulk")
+            locations = locationAct.execute(files = noLocations, conn = self.getDBConn(),
+                                            transaction = self.existingTransaction())
+
+        runLumis = {}
+        if loadRunLumis:
+            runLumiAct = self.daofactory(classname = "Files.GetBulkRunLumi")
+            runLumis = runLumiAct.execute(files = [{"id": x} for x in fileIDs],
+                                          conn = self.getDBConn(),
+                                          transaction = self.existingTransaction())
+
         #Run through all files
         for f in fileList:
             fl = File(id = f['file'])
-            if loadChecksums:
-                fl.loadChecksum()
             fl.update(fileInfoDict[f['file']])
-            if 'locations' in f.keys():
+            if f['file'] in checksums:
+                fl.update(checksums[f['file']])
+            if 'locations' in f:
                 fl.setLocation(f['locations'], immediateSave = False)
+            elif f['file'] in locations:
+                fl.setLocation(locations[f['file']], immediateSave = False)
+            for run, lumis in runLumis.get(f['file'], {}).items():
+                fl.addRun(Run(run, *lumis))
             files.add(fl)
 
         self.commitTransaction(existingTransaction)
@@ -335,11 +371,20 @@ class Subscription(WMBSBase, WMSubscription):
 
         files = []
         action = self.daofactory(classname = "Subscriptions.Get%sFilesByRun" % status)
-        for f in action.execute(self["id"], runID, conn = self.getDBConn(),
-                                transaction = self.existingTransaction()):
-            fl = File(id = f["file"])
-            fl.load()
-            files.append(fl)
+        fileIDs = [f["file"] for f in action.execute(self["id"], runID, conn = self.getDBConn(),
+                                                     transaction = self.existingTransaction())]
+        if len(fileIDs) > 0:
+            fileInfoAct = self.daofactory(classname = "Files.GetByID")
+            fileInfoDict = fileInfoAct.execute(file = fileIDs, conn = self.getDBConn(),
+                                               transaction = self.existingTransaction())
+            checksumAct = self.daofactory(classname = "Files.GetBulkChecksum")
+            checksums = checksumAct.execute(files = fileIDs, conn = self.getDBConn(),
+                                            transaction = self.existingTransaction())
+            for fileID in fileIDs:
+                fl = File(id = fileID)
+                fl.update(fileInfoDict[fileID])
+                fl.update(checksums.get(fileID, {}))
+                files.append(fl)
 
         self.commitTransaction(existingTransaction)
         return files
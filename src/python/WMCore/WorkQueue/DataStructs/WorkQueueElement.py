@@ -238,3 +238,21 @@ class WorkQueueElement(dict):
             return False
         return True
 
+    def possibleSites(self, sites):
+        """Return the sites, out of the given ones, that pass the site
+        restrictions. Same as passesSiteRestriction for each of them"""
+        sites = set(sites)
+        if self['NoLocationUpdate']:
+            return sites
+        for locations in self['Inputs'].values():
+            sites.intersection_update(locations)
+        if self['ParentFlag']:
+            for locations in self['ParentData'].values():
+                sites.intersection_update(locations)
+        for locations in self['PileupData'].values():
+            sites.intersection_update(locations)
+        if self['SiteWhitelist']:
+            sites.intersection_update(self['SiteWhitelist'])
+        sites.difference_update(self['SiteBlacklist'])
+        return sites
+
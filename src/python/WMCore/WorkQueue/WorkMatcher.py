@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+WorkMatcher
+
+Match available workqueue elements to sites with free job slots.
+"""
+
+import random
+
+
+class WorkMatcher(object):
+    """
+    Keep track of the jobs running at each site, by priority, while work is
+    being matched to the sites.
+
+    The job counts of a site are kept in a Fenwick tree over the known
+    priorities, so the number of jobs of greater or equal priority than an
+    element is a prefix sum computed in O(log n) instead of a sum over all
+    the priorities, and adding the jobs of a matched element is O(log n).
+
+    Sites that are found full for a priority are also full for any lower
+    priority, as the job counts only grow.  They are remembered and skipped
+    while elements come in non increasing priority order.
+    """
+    def __init__(self, thresholds, siteJobCounts, priorities = None):
+        """
+        thresholds and siteJobCounts are the same dictionaries
+        WorkQueueBackend.availableWork gets, siteJobCounts is updated with the
+        jobs of the matched elements.  priorities are the priorities of the
+        elements that will be matched.
+        """
+        self.thresholds = thresholds
+        self.siteJobCounts = siteJobCounts
+        self.sites = set(thresholds.keys())
+
+        knownPriorities = set(priorities or [])
+        for jobCounts in siteJobCounts.values():
+            knownPriorities.update(jobCounts.keys())
+        self.rank = {}
+        for index, prio in enumerate(sorted(knownPriorities)):
+            self.rank[prio] = index + 1
+
+        self.trees = {}
+        self.totals = {}
+        for site in self.sites:
+            self.trees[site] = [0] * (len(self.rank) + 1)
+            self.totals[site] = 0
+            for prio, jobs in siteJobCounts.get(site, {}).items():
+                self._addToTree(site, prio, jobs)
+
+        self.fullSites = set()
+        self.lastPriority = None
+
+    def _addToTree(self, site, prio, jobs):
+        """Add jobs running at a priority to the tree of a site"""
+        if prio not in self.rank:
+            # Unknown priority, put it in a tree of its own
+            self._rebuild(prio)
+        tree = self.trees[site]
+        index = self.rank[prio]
+        while index < len(tree):
+            tree[index] += jobs
+            index += index & -index
+        self.totals[site] += jobs
+
+    def _rebuild(self, newPriority):
+        """Rebuild the trees with an extra priority"""
+        priorities = sorted(self.rank.keys() + [newPriority])
+        self.rank = {}
+        for index, prio in enumerate(priorities):
+            self.rank[prio] = index + 1
+        for site in self.sites:
+            self.trees[site] = [0] * (len(self.rank) + 1)
+            self.totals[site] = 0
+        for site in self.sites:
+            for prio, jobs in self.siteJobCounts.get(site, {}).items():
+                self._addToTree(site, prio, jobs)
+
+    def jobCount(self, site, prio):
+        """Number of jobs running at site with priority greater or equal than prio"""
+        if prio not in self.rank:
+            self._rebuild(prio)
+        tree = self.trees[site]
+        index = self.rank[prio] - 1
+        lower = 0
+        while index > 0:
+            lower += tree[index]
+            index -= index & -index
+        return self.totals[site] - lower
+
+    def allFull(self, prio):
+        """Is there no site left that could run work of this priority"""
+        return self.lastPriority != None and prio <= self.lastPriority and \
+               len(self.fullSites) == len(self.sites)
+
+    def match(self, prio, possibleSites, jobs):
+        """
+        Pick a random site, out of possibleSites, with fewer jobs of greater or
+        equal priority running than its threshold and account for the jobs
+        there.  Returns None if there is no such site.
+        """
+        if self.lastPriority == None or prio > self.lastPriority:
+            self.fullSites = set()
+        self.lastPriority = prio
+
+        candidates = list(self.sites.intersection(possibleSites) - self.fullSites)
+        random.shuffle(candidates)
+        for site in candidates:
+            if self.jobCount(site, prio) < self.thresholds[site]:
+                self.addJobs(site, prio, jobs)
+                return site
+            self.fullSites.add(site)
+        return None
+
+    def addJobs(self, site, prio, jobs):
+        """Account for jobs of a priority running at site"""
+        self._addToTree(site, prio, jobs)
+        siteCounts = self.siteJobCounts.setdefault(site, {})
+        siteCounts[prio] = siteCounts.get(prio, 0) + jobs
@@ -5,12 +5,12 @@ WorkQueueBackend
 Interface to WorkQueue persistent storage
 """
 
-import random
 import time
 import urllib
 
 from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError, Document, CouchMonitor
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements
+from WMCore.WorkQueue.WorkMatcher import WorkMatcher
 from WMCore.WorkQueue.DataStructs.CouchWorkQueueElement import CouchWorkQueueElement, fixElementConflicts
 from WMCore.Wrappers import JsonWrapper as json
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
@@ -363,31 +363,28 @@ class WorkQueueBackend(object):
         # Iterate through the results; apply whitelist / blacklist / data
         # locality restrictions.  Only assign jobs if they are high enough
         # priority.
+        elementKey = 'WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement'
+        matcher = WorkMatcher(thresholds, siteJobCounts,
+                              [x[elementKey]['Priority'] for x in result])
+        skipped = 0
         for i in result:
+            # Once every site is full nothing of lower priority will fit
+            if matcher.allFull(i[elementKey]['Priority']):
+                skipped += 1
+                continue
+
             element = CouchWorkQueueElement.fromDocument(self.db, i)
-            prio = element['Priority']
-
-            possibleSite = None
-            sites = thresholds.keys()
-            random.shuffle(sites)
-            for site in sites:
-                if element.passesSiteRestriction(site):
-                    # Count the number of jobs currently running of greater priority
-                    prio = element['Priority']
-                    curJobCount = sum(map(lambda x : x[1] if x[0] >= prio else 0, siteJobCounts.get(site, {}).items()))
-                    self.logger.debug("Job Count: %s, site: %s threshods: %s" % (curJobCount, site, thresholds[site]))
-                    if curJobCount < thresholds[site]:
-                        possibleSite = site
-                        break
+            possibleSite = matcher.match(element['Priority'],
+                                         element.possibleSites(matcher.sites),
+                                         element['Jobs'])
 
             if possibleSite:
                 self.logger.debug("Possible site exists %s" % str(possibleSite))
                 elements.append(element)
-                if site not in siteJobCounts:
-                    siteJobCounts[site] = {}
-                siteJobCounts[site][prio] = siteJobCounts[site].setdefault(prio, 0) + element['Jobs']
             else:
                 self.logger.info("No possible site for %s" % element)
+        if skipped:
+            self.logger.info("No possible site for %s elements, all sites are full" % skipped)
         # sort elements to get them in priority first and timestamp order
         elements.sort(key=lambda element: element['CreationTime'])
         elements.sort(key = lambda x: x['Priority'], reverse = True)
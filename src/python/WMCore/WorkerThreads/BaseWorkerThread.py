@@ -20,6 +20,7 @@ from WMCore.Database.Transaction import Transaction
 from WMCore.Database.CMSCouch import CouchError
 from WMCore.Database.CouchUtils import CouchConnectionError
 from WMCore.WMFactory import WMFactory
+from WMCore.WorkerThreads.Wakeup import wakeupSocketPath, signalWakeup, getWakeupChannel
 
 from WMCore.Alerts import API as alertAPI
 
@@ -50,11 +51,15 @@ class BaseWorkerThread:
         
         # Init the timing
         self.lastTime = time.time()
+        self.cycleDuration = None
 
         # Init alert system
         self.sender = None
         self.sendAlert = None
 
+        # Channel to be woken up by other components, see initWakeup
+        self.wakeupChannel = None
+
         # Get the current DBFactory
         myThread = threading.currentThread()
         self.dbFactory = myThread.dbFactory
@@ -123,6 +128,50 @@ class BaseWorkerThread:
         self.setup(parameters)
         myThread.transaction.commit()
 
+        self.initWakeup()
+
+    def initWakeup(self):
+        """
+        _initWakeup_
+
+        Listen for wakeups from other components if the component has
+        useWakeup set in its config section.
+        """
+        config = self.component.config
+        compName = getattr(getattr(config, "Agent", None), "componentName", None)
+        if compName == None or \
+               not getattr(getattr(config, compName, None), "useWakeup", False):
+            return
+        path = wakeupSocketPath(config, compName)
+        try:
+            self.wakeupChannel = getWakeupChannel(path)
+        except Exception as ex:
+            logging.error("Cannot listen for wakeups on %s, polling only: %s" % (path, str(ex)))
+            self.wakeupChannel = None
+        return
+
+    def wakeupComponent(self, componentName):
+        """
+        _wakeupComponent_
+
+        Tell another component that there is new work for it, so its workers
+        don't wait for the end of their polling interval.  Returns False if
+        it couldn't, a failed wakeup never raises: the other component still
+        polls.
+        """
+        if self.component != None:
+            config = self.component.config
+        else:
+            # Workers built without a component, e.g. in unit tests
+            config = getattr(self, "config", None)
+        if config == None:
+            return False
+        try:
+            return signalWakeup(wakeupSocketPath(config, componentName))
+        except Exception as ex:
+            logging.error("Failed to wake up %s: %s" % (componentName, str(ex)))
+            return False
+
     def __call__(self, parameters):
         """
         Thread entry point; handles synchronisation with run and terminate
@@ -161,15 +210,18 @@ class BaseWorkerThread:
                                 # to get the right name
                                 if hasattr(self.component.config, "Agent"):
                                     if getattr(self.component.config.Agent, "useHeartbeat", True):
-                                        self.heartbeatAPI.updateWorkerHeartbeat(
-                                            myThread.getName(), "Running")
+                                        self.heartbeatAPI.recordWorkerHeartbeat(
+                                            myThread.getName(), "Running",
+                                            self.cycleDuration)
                             except (CouchError, CouchConnectionError) as ex:
                                 msg  = " Failed to update heartbeat for worker %s" % str(self)
                                 msg += ":\n %s" % str(ex)
                                 msg += "\n Skipping worker algorithm!"
                                 logging.error(msg)
                             else:
+                                startTime = time.time()
                                 self.algorithm(parameters)
+                                self.cycleDuration = time.time() - startTime
                                 # Catch if someone forgets to commit/rollback
                                 if myThread.transaction.transaction is not None:
                                     msg = """ Thread %s:  Transaction reached
@@ -201,6 +253,11 @@ class BaseWorkerThread:
 
             # Call specific thread termination method
             self.terminate(parameters)
+
+            # Write the heartbeats still buffered
+            if hasattr(self.component.config, "Agent"):
+                if getattr(self.component.config.Agent, "useHeartbeat", True):
+                    self.heartbeatAPI.flushWorkerHeartbeats()
         except Exception as ex:
             # Notify error
             msg = "Error in event loop (2): %s %s\nBacktrace:\n"
@@ -226,10 +283,14 @@ class BaseWorkerThread:
         The default (naiive) time.sleep(self.idleTime) isn't always
         the best idea, let different workers do it differently.
 
-        returns control when it's time to wake back up
+        returns control when it's time to wake back up, or earlier if the
+        component listens for wakeups and another component sent one
         doesn't return any values
         """
-        time.sleep( self.idleTime )
+        if self.wakeupChannel != None:
+            self.wakeupChannel.wait(self.idleTime)
+        else:
+            time.sleep( self.idleTime )
         
     def initAlerts(self, compName = None):
         """
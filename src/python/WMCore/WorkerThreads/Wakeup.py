@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+_Wakeup_
+
+Wake up the worker threads of a component before their polling interval is
+over, when another component produced work for them.
+
+A component with useWakeup set in its config section listens on a unix
+datagram socket, by default wakeup.sock in its componentDir (or the path in
+wakeupSocket).  Its worker threads sleep on the socket instead of sleeping
+for the full idleTime and return as soon as anybody sends a datagram to it.
+Signalling a component that doesn't listen does nothing, so producers don't
+need to know whether the downstream component uses wakeups.
+"""
+
+import errno
+import logging
+import os
+import select
+import socket
+import threading
+
+_channels = {}
+_channelsLock = threading.Lock()
+
+
+def wakeupSocketPath(config, componentName):
+    """
+    _wakeupSocketPath_
+
+    Path of the socket a component listens on for wakeups, None if the
+    component has no section or componentDir in the config.
+    """
+    compSect = getattr(config, componentName, None)
+    if compSect == None:
+        return None
+    path = getattr(compSect, 'wakeupSocket', None)
+    if path == None:
+        componentDir = getattr(compSect, 'componentDir', None)
+        if componentDir == None:
+            return None
+        path = os.path.join(componentDir, 'wakeup.sock')
+    return path
+
+
+def signalWakeup(path):
+    """
+    _signalWakeup_
+
+    Wake up the component listening on path.  Returns False if nobody is
+    listening.
+    """
+    if path == None:
+        return False
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sender.setblocking(0)
+        sender.sendto('1', path)
+    except socket.error as ex:
+        # ENOENT/ECONNREFUSED: nobody listens
+        # EAGAIN/ENOBUFS: wakeups are already queued
+        if ex.errno not in (errno.ENOENT, errno.ECONNREFUSED,
+                            errno.EAGAIN, errno.ENOBUFS):
+            logging.error("Failed to send wakeup to %s: %s" % (path, str(ex)))
+        return ex.errno in (errno.EAGAIN, errno.ENOBUFS)
+    finally:
+        sender.close()
+    return True
+
+
+def getWakeupChannel(path):
+    """
+    _getWakeupChannel_
+
+    Return the WakeupChannel listening on path, shared by all the worker
+    threads of the process.
+    """
+    _channelsLock.acquire()
+    try:
+        channel = _channels.get(path, None)
+        if channel == None:
+            channel = WakeupChannel(path)
+            _channels[path] = channel
+        return channel
+    finally:
+        _channelsLock.release()
+
+
+class WakeupChannel(object):
+    """
+    _WakeupChannel_
+
+    Unix datagram socket worker threads can sleep on.
+    """
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            # Left over by a previous instance of the component
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.setblocking(0)
+        self.socket.bind(path)
+        return
+
+    def wait(self, timeout):
+        """
+        _wait_
+
+        Sleep until a wakeup arrives or timeout seconds passed.  Returns True
+        if woken up.
+        """
+        try:
+            readable, _, _ = select.select([self.socket], [], [], timeout)
+        except select.error as ex:
+            if ex.args[0] != errno.EINTR:
+                raise
+            return False
+        if not readable:
+            return False
+        # Consume all the wakeups sent while we were busy
+        while True:
+            try:
+                self.socket.recv(64)
+            except socket.error:
+                break
+        return True
+
+    def close(self):
+        """
+        _close_
+
+        Stop listening for wakeups.
+        """
+        self.socket.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        return
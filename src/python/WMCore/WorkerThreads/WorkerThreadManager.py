@@ -72,7 +72,9 @@ class WorkerThreadManager:
         worker.notifyResume = self.resumeSlaves
         if hasattr(self.component.config, "Agent"):
             if getattr(self.component.config.Agent, "useHeartbeat", True):
-                worker.heartbeatAPI = HeartbeatAPI(self.component.config.Agent.componentName)
+                flushInterval = getattr(self.component.config.Agent, "heartbeatFlushInterval", 60)
+                worker.heartbeatAPI = HeartbeatAPI(self.component.config.Agent.componentName,
+                                                   flushInterval = flushInterval)
 
 
     def addWorker(self, worker, idleTime = 60, parameters = None):
@@ -1008,6 +1008,38 @@ class JobAccountantTest(unittest.TestCase):
 
         return
 
+    def testMergeSuccessLoaderProcesses(self):
+        """
+        _testMergeSuccessLoaderProcesses_
+
+        Run the merge test with the job reports loaded by the loader
+        processes instead of the accountant worker.
+        """
+        self.setupDBForMergeSuccess()
+
+        config = self.createConfig()
+        config.JobAccountant.nLoaderProcesses = 2
+        accountant = JobAccountantPoller(config)
+        accountant.setup()
+        self.assertEqual(len(accountant.pool), 2)
+        accountant.algorithm()
+        self.assertEqual(accountant.loadedReports, {})
+        self.assertEqual(accountant.pendingJobs, set())
+        accountant.terminate()
+        self.assertEqual(accountant.pool, [])
+
+        jobReport = Report()
+        jobReport.unpersist(os.path.join(WMCore.WMBase.getTestBase(),
+                                         "WMComponent_t/JobAccountant_t/fwjrs",
+                                         "MergeSuccess.pkl"))
+        self.verifyFileMetaData(self.testJob["id"], jobReport.getAllFilesFromStep("cmsRun1"))
+        self.verifyJobSuccess(self.testJob["id"])
+
+        dbsParents = ["/path/to/some/lfnA", "/path/to/some/lfnB",
+                      "/path/to/some/lfnC"]
+        self.verifyDBSBufferContents("Merge", dbsParents, jobReport.getAllFilesFromStep("cmsRun1"))
+        return
+
     def testMergeSuccessSkippedFiles(self):
         """
         _testMergeSuccessSkippedFiles_
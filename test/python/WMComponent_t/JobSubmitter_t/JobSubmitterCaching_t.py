@@ -194,5 +194,84 @@ class JobSubmitterCachingTest(unittest.TestCase):
                          "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
         return
 
+    def testJobInfoIndex(self):
+        """
+        _testJobInfoIndex_
+
+        Verify that a restarted JobSubmitter gets the submit information of
+        the jobs from the job info index instead of the pickled jobs and that
+        a change of the site states doesn't require reading them again.
+        """
+        config            = self.createConfig()
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 20)
+        self.assertEqual(len(mySubmitterPoller.jobInfoIndex), 20)
+        self.assertTrue(os.path.isfile(os.path.join(self.testDir, "JobInfoIndex.pkl.journal")))
+
+        # The pickled jobs are no longer needed
+        for i in range(10):
+            os.remove(os.path.join(self.testDir, "jobA-%s" % i, "job.pkl"))
+            os.remove(os.path.join(self.testDir, "jobB-%s" % i, "job.pkl"))
+
+        mySubmitterPoller = JobSubmitterPoller(config)
+        self.assertEqual(len(mySubmitterPoller.jobInfoIndex), 20)
+        self.assertTrue(os.path.isfile(os.path.join(self.testDir, "JobInfoIndex.pkl")))
+        self.assertFalse(os.path.isfile(os.path.join(self.testDir, "JobInfoIndex.pkl.journal")))
+        mySubmitterPoller.getThresholds()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 20,
+                         "Error: The job cache should contain 20 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
+        self.assertEqual(len(mySubmitterPoller.cachedJobs["T1_US_FNAL"]["Processing"]["wf001"]), 10)
+        self.assertEqual(len(mySubmitterPoller.cachedJobs["T1_UK_RAL"]["Processing"]["wf002"]), 10)
+
+        # The jobs that can only run at RAL must fail once it's aborted
+        ResourceControl().changeSiteState("T1_UK_RAL", "Aborted")
+        mySubmitterPoller.getThresholds()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10)
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10,
+                         "Error: The job cache should contain 10 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
+        self.assertEqual(len(mySubmitterPoller.jobInfoIndex), 10)
+        self.assertEqual(len(mySubmitterPoller.cachedJobs["T1_UK_RAL"]["Processing"]["wf002"]), 0)
+
+        # The dropped jobs are only journalled, a restart replays them
+        mySubmitterPoller = JobSubmitterPoller(config)
+        self.assertEqual(len(mySubmitterPoller.jobInfoIndex), 10)
+        return
+
+    def testPackageCollections(self):
+        """
+        _testPackageCollections_
+
+        Verify that packages are spread over the PackageCollections without
+        scanning the sandbox directory and that the fill levels are kept in
+        the index file.
+        """
+        config = self.createConfig()
+        config.JobSubmitter.collectionSize = 2
+        sandboxDir = os.path.join(self.testDir, "sandbox")
+        os.mkdir(sandboxDir)
+
+        mySubmitterPoller = JobSubmitterPoller(config)
+        collections = [mySubmitterPoller.getPackageCollection(sandboxDir) for _ in range(5)]
+        self.assertEqual(collections, [0, 0, 1, 1, 2])
+        mySubmitterPoller.flushJobPackages()
+        self.assertTrue(os.path.isfile(os.path.join(sandboxDir, "PackageCollections.json")))
+
+        mySubmitterPoller = JobSubmitterPoller(config)
+        collections = [mySubmitterPoller.getPackageCollection(sandboxDir) for _ in range(2)]
+        self.assertEqual(collections, [2, 3])
+
+        # Without an index the last collection is found on disk
+        os.remove(os.path.join(sandboxDir, "PackageCollections.json"))
+        for i in range(2):
+            os.makedirs(os.path.join(sandboxDir, "PackageCollection_4", "batch_%i" % i))
+        mySubmitterPoller = JobSubmitterPoller(config)
+        self.assertEqual(mySubmitterPoller.getPackageCollection(sandboxDir), 5)
+        return
+
 if __name__ == "__main__":
     unittest.main()
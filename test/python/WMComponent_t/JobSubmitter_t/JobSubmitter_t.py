@@ -800,5 +800,81 @@ class JobSubmitterTest(unittest.TestCase):
 
         return
 
+    def fillSyntheticCache(self, poller, nSites, nTaskTypes, nWorkflows,
+                           sitesPerWorkflow, jobsPerWorkflow, pendingSlots):
+        """
+        _fillSyntheticCache_
+
+        Fill the job cache and the thresholds of a JobSubmitterPoller with
+        synthetic jobs, without going through the database.  Each workflow
+        has jobs of a single task type that can run at sitesPerWorkflow sites.
+        """
+        sites = ["T2_XX_Site%i" % i for i in range(nSites)]
+        taskTypes = ["TaskType%i" % i for i in range(nTaskTypes)]
+
+        poller.currentRcThresholds = {}
+        for site in sites:
+            thresholds = []
+            for taskType in taskTypes:
+                thresholds.append({"task_type": taskType, "max_slots": -1,
+                                   "pending_slots": pendingSlots, "task_running_jobs": 0,
+                                   "task_pending_jobs": 0, "priority": 1})
+            poller.currentRcThresholds[site] = {"total_pending_slots": pendingSlots * nTaskTypes,
+                                                "total_running_slots": -1,
+                                                "total_running_jobs": 0,
+                                                "total_pending_jobs": 0,
+                                                "state": "Normal", "cms_name": site,
+                                                "thresholds": thresholds}
+        poller.sortedSites = sites
+        poller.cachedJobIDs = set()
+        poller.cachedJobs = {}
+        poller.jobDataCache = {}
+        poller.maxJobsPerPoll = nWorkflows * jobsPerWorkflow
+
+        jobID = 0
+        for i in range(nWorkflows):
+            workflow = "Workflow%i" % i
+            taskType = taskTypes[i % nTaskTypes]
+            workflowSites = frozenset([sites[(i + j) % nSites] for j in range(sitesPerWorkflow)])
+            poller.workflowPrios[workflow] = i % 10
+            poller.workflowTimestamps[workflow] = i
+            poller.jobDataCache[workflow] = {}
+            for _ in range(jobsPerWorkflow):
+                jobID += 1
+                poller.cachedJobIDs.add(jobID)
+                poller.jobDataCache[workflow][jobID] = (jobID, 0, "/package/%s" % workflow, "/sandbox", "/cache/%i" % jobID,
+                                                        None, '', '', workflowSites, None, None, "job%i" % jobID,
+                                                        None, workflow, None, None, None, "/%s/Task" % workflow,
+                                                        workflowSites, 1, i, None, None, False)
+            for site in workflowSites:
+                taskCache = poller.cachedJobs.setdefault(site, {}).setdefault(taskType, {})
+                taskCache[workflow] = set(poller.jobDataCache[workflow].keys())
+        return
+
+    @attr('performance')
+    def testG_AssignJobLocationsBenchmark(self):
+        """
+        _testG_AssignJobLocationsBenchmark_
+
+        Time the site/threshold scheduling of a submit cycle for 500 sites,
+        10 task types and 1000 workflows.
+        """
+        config = self.getConfig()
+        poller = JobSubmitterPoller(config = config)
+
+        for pendingSlots in [10, 100]:
+            self.fillSyntheticCache(poller, nSites = 500, nTaskTypes = 10, nWorkflows = 1000,
+                                    sitesPerWorkflow = 100, jobsPerWorkflow = 20,
+                                    pendingSlots = pendingSlots)
+            startTime = time.time()
+            jobsToSubmit = poller.assignJobLocations()
+            cycleTime = time.time() - startTime
+            nJobs = sum([len(x) for x in jobsToSubmit.values()])
+            print "%i pending slots per threshold: assigned %i jobs in %f seconds" % (pendingSlots, nJobs,
+                                                                                       cycleTime)
+            self.assertTrue(nJobs > 0)
+
+        return
+
 if __name__ == "__main__":
     unittest.main()
@@ -10,7 +10,7 @@ Unit tests for the WMBS File class.
 import unittest
 import time
 from WMQuality.TestInit import TestInit
-from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
+from WMCore.Agent.HeartbeatAPI import HeartbeatAPI, HeartbeatAggregator
 # pylint: disable = W0611
 
 class HeartbeatTest(unittest.TestCase):
@@ -90,6 +90,128 @@ class HeartbeatTest(unittest.TestCase):
         result = testComponent.getHeartbeatInfo()
         self.assertEqual(result[1]['error_message'], "Error1")
 
+    def testRecordHeartbeat(self):
+        """
+        _testRecordHeartbeat_
+
+        Verify that recorded heartbeats are only written once the flush
+        interval passed, all of them at once.
+        """
+        testComponent = HeartbeatAPI("testBufferedComponent", flushInterval = 2)
+        testComponent.registerComponent()
+        testComponent.updateWorkerHeartbeat("testWorker1")
+        testComponent.updateWorkerHeartbeat("testWorker2")
+        worker2API = HeartbeatAPI("testBufferedComponent", flushInterval = 2)
+
+        result = testComponent.getAllHeartbeatInfo()
+        self.assertEqual(len(result), 2)
+        self.assertEqual(set([x['state'] for x in result]), set(["Start"]))
+
+        testComponent.recordWorkerHeartbeat("testWorker1", "Running", 0.5)
+        worker2API.recordWorkerHeartbeat("testWorker2", "Running", 5)
+        result = testComponent.getAllHeartbeatInfo()
+        self.assertEqual(set([x['state'] for x in result]), set(["Start"]))
+
+        time.sleep(2)
+        testComponent.recordWorkerHeartbeat("testWorker1", "Running", 20)
+        result = testComponent.getAllHeartbeatInfo()
+        self.assertEqual(set([x['state'] for x in result]), set(["Running"]))
+        self.assertEqual(dict(worker2API.getDurationHistogram("testWorker1"))[1], 1)
+        self.assertEqual(dict(worker2API.getDurationHistogram("testWorker1"))[60], 1)
+
+        worker2API.recordWorkerHeartbeat("testWorker2", "Idle")
+        worker2API.flushWorkerHeartbeats()
+        result = testComponent.getAllHeartbeatInfo()
+        self.assertEqual(set([x['state'] for x in result]), set(["Running", "Idle"]))
+        return
+
+    def testErrorNotOverwritten(self):
+        """
+        _testErrorNotOverwritten_
+
+        Verify that the buffered heartbeat of a worker that crashed doesn't
+        overwrite its error state when the other workers flush.
+        """
+        testComponent = HeartbeatAPI("testErrorComponent", flushInterval = 3600)
+        testComponent.registerComponent()
+        testComponent.updateWorkerHeartbeat("testWorker1")
+        testComponent.updateWorkerHeartbeat("testWorker2")
+        worker2API = HeartbeatAPI("testErrorComponent", flushInterval = 3600)
+
+        testComponent.recordWorkerHeartbeat("testWorker1", "Running", 0.5)
+        worker2API.recordWorkerHeartbeat("testWorker2", "Running", 0.5)
+        testComponent.updateWorkerError("testWorker1", "Crashed")
+        worker2API.flushWorkerHeartbeats()
+
+        states = dict([(x['worker_name'], x['state']) for x in testComponent.getAllHeartbeatInfo()])
+        self.assertEqual(states, {"testWorker1": "Error", "testWorker2": "Running"})
+
+        # Even if the heartbeat was taken before the error was written
+        worker2API.recordWorkerHeartbeat("testWorker2", "Running", 0.5)
+        pending = worker2API.aggregator.takePending()
+        worker2API.updateWorkerError("testWorker2", "Crashed")
+        worker2API.aggregator.putBack(pending)
+        self.assertEqual(worker2API.aggregator.takePending(), {})
+        worker2API.aggregator.putBack(dict([("testWorker2", ("Running", int(time.time())))]))
+        worker2API.flushWorkerHeartbeats()
+        states = dict([(x['worker_name'], x['state']) for x in testComponent.getAllHeartbeatInfo()])
+        self.assertEqual(states, {"testWorker1": "Error", "testWorker2": "Error"})
+        return
+
+class HeartbeatAggregatorTest(unittest.TestCase):
+    """
+    _HeartbeatAggregatorTest_
+
+    Test the heartbeat buffering without a database.
+    """
+    def testAggregator(self):
+        """
+        _testAggregator_
+
+        Verify that only the latest heartbeat of every worker is kept and the
+        cycle durations are counted in the right buckets.
+        """
+        aggregator = HeartbeatAggregator(buckets = [1, 10])
+        self.assertFalse(aggregator.isFlushDue(0))
+
+        aggregator.record("worker1", "Running", 0.5)
+        aggregator.record("worker1", "Running", 10)
+        aggregator.record("worker1", "Idle", 11)
+        aggregator.record("worker2", "Running")
+        self.assertTrue(aggregator.isFlushDue(0))
+        self.assertFalse(aggregator.isFlushDue(3600))
+        self.assertEqual(aggregator.getDurationHistogram("worker1"),
+                         [(1, 1), (10, 1), (None, 1)])
+        self.assertEqual(aggregator.getDurationHistogram("worker2"),
+                         [(1, 0), (10, 0), (None, 0)])
+
+        pending = aggregator.takePending()
+        self.assertEqual(sorted(pending.keys()), ["worker1", "worker2"])
+        self.assertEqual(pending["worker1"][0], "Idle")
+        self.assertFalse(aggregator.isFlushDue(0))
+
+        # A failed write is retried, without hiding newer heartbeats
+        aggregator.record("worker2", "Error")
+        aggregator.putBack(pending)
+        pending = aggregator.takePending()
+        self.assertEqual(pending["worker1"][0], "Idle")
+        self.assertEqual(pending["worker2"][0], "Error")
+
+        # A failed worker's heartbeat is dropped, and not put back
+        aggregator.record("worker1", "Running")
+        aggregator.record("worker2", "Running")
+        pending = aggregator.takePending()
+        aggregator.record("worker1", "Running")
+        aggregator.discard("worker1")
+        aggregator.putBack(pending)
+        self.assertEqual(aggregator.takePending().keys(), ["worker2"])
+
+        # Until it runs again
+        aggregator.record("worker1", "Running")
+        aggregator.putBack(pending)
+        self.assertEqual(sorted(aggregator.takePending().keys()), ["worker1", "worker2"])
+        return
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+_BulkCommands_t_
+
+Unit tests for the bulk job edit and removal of the CondorPlugin, run against
+a fake schedd.
+"""
+
+import re
+import StringIO
+import unittest
+
+from WMCore.BossAir.Plugins.BasePlugin import BasePlugin
+from WMCore.BossAir.Plugins.CondorPlugin import CondorPlugin, parseClassAds, jobIDConstraint
+
+class FakeSchedd(object):
+    """
+    _FakeSchedd_
+
+    Keep a table of jobs and apply the condor_qedit and condor_rm commands
+    it is given to it.
+    """
+    def __init__(self):
+        self.jobs = {}
+        self.commands = []
+
+    def addJob(self, jobID, sites, extSites = None, request = "TestRequest"):
+        self.jobs[jobID] = {'JobStatus': '1', 'DESIRED_Sites': sites,
+                            'ExtDESIRED_Sites': extSites or sites,
+                            'WMAgent_RequestName': request}
+
+    def matchJobs(self, constraint):
+        match = re.match(r"member\(WMAgent_JobID, \{([0-9, ]*)\}\)$", constraint)
+        if match:
+            return [int(x) for x in match.group(1).split(', ') if int(x) in self.jobs]
+        match = re.match(r'WMAgent_RequestName == "(.*)"$', constraint)
+        if match:
+            return [x for x in self.jobs.keys() if self.jobs[x]['WMAgent_RequestName'] == match.group(1)]
+        raise RuntimeError("Unsupported constraint %s" % constraint)
+
+    def runCommand(self, cmd, shell = True, timeout = None):
+        """
+        Same interface as SubprocessAlgos.runCommand
+        """
+        self.commands.append(cmd)
+        if cmd[1] != '-constraint':
+            return '', 'Unsupported command', 1
+        jobIDs = self.matchJobs(cmd[2])
+        if cmd[0] == 'condor_qedit':
+            for jobID in jobIDs:
+                self.jobs[jobID][cmd[3]] = cmd[4].strip('"')
+        elif cmd[0] == 'condor_rm':
+            for jobID in jobIDs:
+                del self.jobs[jobID]
+        else:
+            return '', 'Unsupported command', 1
+        return '', '', 0
+
+    def condorQOutput(self):
+        """
+        The output of the condor_q command run by CondorPlugin.getClassAds
+        """
+        output = []
+        for jobID in sorted(self.jobs.keys()):
+            job = self.jobs[jobID]
+            output.append("(JobStatus:%s)  (DESIRED_Sites:%s)  (ExtDESIRED_Sites:%s)  (WMAgentID:%i):::" % \
+                          (job['JobStatus'], job['DESIRED_Sites'], job['ExtDESIRED_Sites'], jobID))
+        return ''.join(output)
+
+class FakeCondorPlugin(CondorPlugin):
+    """
+    _FakeCondorPlugin_
+
+    CondorPlugin that runs its commands against a FakeSchedd.
+    """
+    def __init__(self, schedd, bulkCommandSize):
+        BasePlugin.__init__(self, config = None)
+        self.schedd = schedd
+        self.commandRunner = schedd.runCommand
+        self.bulkCommandSize = bulkCommandSize
+
+    def getClassAds(self):
+        return parseClassAds(StringIO.StringIO(self.schedd.condorQOutput()))
+
+    def close(self):
+        return
+
+class BulkCommandsTest(unittest.TestCase):
+    """
+    _BulkCommandsTest_
+
+    Test the bulk job edit and removal against a fake schedd.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a fake schedd with jobs running at combinations of three sites.
+        """
+        self.schedd = FakeSchedd()
+        for jobID in range(1, 11):
+            self.schedd.addJob(jobID, "T2_CH_CERN, T1_US_FNAL")
+        for jobID in range(11, 16):
+            self.schedd.addJob(jobID, "T2_CH_CERN, T1_US_FNAL, T2_DE_DESY")
+        for jobID in range(16, 19):
+            self.schedd.addJob(jobID, "T2_CH_CERN", request = "OtherRequest")
+        self.schedd.addJob(19, "T1_US_FNAL", extSites = "T1_US_FNAL, T2_CH_CERN")
+        self.plugin = FakeCondorPlugin(self.schedd, bulkCommandSize = 4)
+        return
+
+    def testGroupJobEdits(self):
+        """
+        _testGroupJobEdits_
+
+        Verify the jobs are grouped by value and split into groups of at most
+        bulkCommandSize jobs.
+        """
+        edits = dict([(jobID, 'A') for jobID in range(10)])
+        edits.update(dict([(jobID, 'B') for jobID in range(10, 12)]))
+        self.assertEqual(self.plugin.groupJobEdits(edits),
+                         [('A', [0, 1, 2, 3]), ('A', [4, 5, 6, 7]), ('A', [8, 9]),
+                          ('B', [10, 11])])
+        self.assertEqual(self.plugin.groupJobEdits({}), [])
+        self.assertEqual(jobIDConstraint([3, 4, 5]), "member(WMAgent_JobID, {3, 4, 5})")
+        return
+
+    def testUpdateSiteInformation(self):
+        """
+        _testUpdateSiteInformation_
+
+        Drain a site and bring it back, one condor_qedit per group of jobs
+        with the same new site list.
+        """
+        jobs = [{'id': jobID, 'jobid': jobID} for jobID in range(1, 20)]
+        jobsToKill = self.plugin.updateSiteInformation(jobs, "T2_CH_CERN", True)
+        self.assertEqual([job['id'] for job in jobsToKill], [16, 17, 18])
+
+        # 10 jobs in 3 groups for FNAL, 5 jobs in 2 groups for FNAL and DESY
+        self.assertEqual(len(self.schedd.commands), 5)
+        for jobID in range(1, 11):
+            self.assertEqual(self.schedd.jobs[jobID]['DESIRED_Sites'], "T1_US_FNAL")
+        for jobID in range(11, 16):
+            self.assertEqual(self.schedd.jobs[jobID]['DESIRED_Sites'], "T1_US_FNAL,T2_DE_DESY")
+        self.assertEqual(self.schedd.jobs[19]['DESIRED_Sites'], "T1_US_FNAL")
+
+        self.schedd.commands = []
+        jobsToKill = self.plugin.updateSiteInformation(jobs, "T2_CH_CERN", False)
+        self.assertEqual(jobsToKill, [])
+        self.assertEqual(len(self.schedd.commands), 5)
+        for jobID in range(1, 11) + [19]:
+            self.assertEqual(self.schedd.jobs[jobID]['DESIRED_Sites'], "T1_US_FNAL,T2_CH_CERN")
+        for jobID in range(11, 16):
+            self.assertEqual(self.schedd.jobs[jobID]['DESIRED_Sites'], "T1_US_FNAL,T2_DE_DESY,T2_CH_CERN")
+        for jobID in range(16, 19):
+            self.assertEqual(self.schedd.jobs[jobID]['DESIRED_Sites'], "T2_CH_CERN")
+        return
+
+    def testKill(self):
+        """
+        _testKill_
+
+        Remove jobs bulkCommandSize at a time and all the jobs of a workflow.
+        """
+        self.plugin.kill([{'id': jobID, 'jobid': jobID} for jobID in range(1, 10)])
+        self.assertEqual(len(self.schedd.commands), 3)
+        self.assertEqual(sorted(self.schedd.jobs.keys()), range(10, 20))
+
+        self.plugin.killWorkflowJobs("OtherRequest")
+        self.assertEqual(len(self.schedd.commands), 4)
+        self.assertEqual(sorted(self.schedd.jobs.keys()), range(10, 16) + [19])
+
+        # Failures are logged, not raised
+        self.assertEqual(self.plugin.runCondorCommand(['condor_hold', '-all']), 1)
+        return
+
+if __name__ == '__main__':
+    unittest.main()
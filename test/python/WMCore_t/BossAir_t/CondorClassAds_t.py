@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+_CondorClassAds_t_
+
+Unit tests for the condor_q output parser and the job reconciliation of the
+CondorPlugin.
+"""
+
+import os
+import StringIO
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.BossAir.Plugins.CondorPlugin import parseClassAds, reconcileJobs
+from WMCore.WMBase import getTestBase
+
+class CondorClassAdsTest(unittest.TestCase):
+    """
+    _CondorClassAdsTest_
+
+    Test the condor_q output parser and the job reconciliation against the
+    output recorded from a condor_q run.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Read the recorded condor_q output.
+        """
+        outputPath = os.path.join(getTestBase(), "WMCore_t/BossAir_t/CondorQOutput.txt")
+        handle = open(outputPath, 'r')
+        self.condorOutput = handle.read()
+        handle.close()
+        return
+
+    def createJob(self, jobid, status = 'Idle', statusTime = 0):
+        """
+        _createJob_
+
+        Create a job like the ones BossAir tracks.
+        """
+        return {'id': jobid, 'jobid': jobid, 'status': status,
+                'status_time': statusTime, 'location': None}
+
+    def testParseClassAds(self):
+        """
+        _testParseClassAds_
+
+        Verify that the ads are parsed no matter how the output is chunked.
+        """
+        jobInfo = parseClassAds(StringIO.StringIO(self.condorOutput))
+        self.assertEqual(sorted(jobInfo.keys()), [101, 102, 103, 104, 105, 106, 108])
+
+        jobAd = jobInfo[101]
+        self.assertEqual(jobAd.get('JobStatus'), '2')
+        self.assertEqual(jobAd.get('runningCMSSite'), 'T1_US_FNAL')
+        self.assertEqual(jobAd.get('DESIRED_Sites').split(', '), ['T2_CH_CERN', 'T1_US_FNAL'])
+        self.assertEqual(jobAd.get('WMAgentID'), '101')
+        self.assertEqual(jobInfo[102].get('runningTime', 0), 0)
+        self.assertEqual(jobInfo[102].get('runningCMSSite'), None)
+        self.assertEqual(jobInfo[106].get('JobStatus'), 'undefined')
+        self.assertEqual(dict(jobInfo[102].items())['ExtDESIRED_Sites'],
+                         'T2_CH_CERN, T2_DE_DESY')
+        self.assertFalse('runningTime' in jobInfo[102].keys())
+
+        for chunkSize in [1, 2, 3, 7, 100]:
+            chunkedInfo = parseClassAds(StringIO.StringIO(self.condorOutput),
+                                        chunkSize = chunkSize)
+            self.assertEqual(chunkedInfo, jobInfo)
+
+        self.assertEqual(parseClassAds(StringIO.StringIO('')), {})
+        return
+
+    def testReconcileJobs(self):
+        """
+        _testReconcileJobs_
+
+        Verify the status updates of the jobs found in condor.
+        """
+        jobInfo = parseClassAds(StringIO.StringIO(self.condorOutput))
+        jobs = [self.createJob(101), self.createJob(102),
+                self.createJob(103, 'Running', 1400001500),
+                self.createJob(104, 'Running', 1400002000),
+                self.createJob(105, 'Running', 1400002500),
+                self.createJob(106), self.createJob(108),
+                self.createJob(200, 'Running', 1400000000)]
+
+        running, changed, complete = reconcileJobs(jobs, jobInfo, removeTime = 60)
+        self.assertEqual([job['id'] for job in running],
+                         [101, 102, 103, 104, 105, 106, 108])
+        self.assertEqual([job['id'] for job in changed], [101, 102, 103, 104, 106, 108])
+        self.assertEqual([job['id'] for job in complete], [200])
+
+        self.assertEqual((jobs[0]['status'], jobs[0]['status_time']), ('Running', 1400001200))
+        self.assertEqual((jobs[0]['globalState'], jobs[0]['location']), ('Running', 'T1_US_FNAL'))
+        self.assertEqual((jobs[1]['status'], jobs[1]['status_time']), ('Idle', 1400000000))
+        self.assertEqual(jobs[1]['globalState'], 'Pending')
+        self.assertEqual((jobs[2]['status'], jobs[2]['status_time']), ('Held', 1400003000))
+        self.assertEqual((jobs[3]['status'], jobs[3]['status_time']), ('Complete', 1400009000))
+        self.assertEqual((jobs[4]['status'], jobs[4]['status_time']), ('Running', 1400002500))
+        self.assertEqual((jobs[5]['status'], jobs[5]['status_time']), ('Unknown', 0))
+        self.assertEqual(jobs[5]['globalState'], 'Error')
+        self.assertEqual((jobs[6]['status'], jobs[6]['globalState']), ('Error', 'Error'))
+
+        # Nothing changed in condor, nothing to update
+        running, changed, complete = reconcileJobs(jobs[:5], jobInfo, removeTime = 60)
+        self.assertEqual(len(running), 5)
+        self.assertEqual(changed, [])
+        self.assertEqual(complete, [])
+        return
+
+    def testReconcileNoInfo(self):
+        """
+        _testReconcileNoInfo_
+
+        Verify that jobs go through Removed if condor_q has no jobs at all.
+        """
+        jobs = [self.createJob(1, 'Running', 1400000000),
+                self.createJob(2, 'Removed', int(time.time()) - 120),
+                self.createJob(3, 'Removed', int(time.time()))]
+
+        running, changed, complete = reconcileJobs(jobs, {}, removeTime = 60)
+        self.assertEqual(running, [])
+        self.assertEqual([job['id'] for job in changed], [1])
+        self.assertEqual([job['id'] for job in complete], [2])
+        self.assertEqual(jobs[0]['status'], 'Removed')
+        self.assertTrue(jobs[0]['status_time'] > 1400000000)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Parse and reconcile the recorded ads replicated to 150k jobs.
+        """
+        nJobs = 150000
+        ads = [ad for ad in self.condorOutput.split(':::') if 'WMAgentID:' in ad]
+        output = []
+        for jobid in range(nJobs):
+            ad = ads[jobid % len(ads)]
+            output.append(ad[:ad.index('(WMAgentID:')])
+            output.append('(WMAgentID:%i):::' % jobid)
+        output = ''.join(output)
+
+        startTime = time.time()
+        jobInfo = parseClassAds(StringIO.StringIO(output))
+        parseTime = time.time() - startTime
+        self.assertEqual(len(jobInfo), nJobs)
+
+        jobs = [self.createJob(jobid) for jobid in range(0, 2 * nJobs, 2)]
+        startTime = time.time()
+        running, changed, complete = reconcileJobs(jobs, jobInfo, removeTime = 60)
+        reconcileTime = time.time() - startTime
+        self.assertEqual(len(running) + len(complete), nJobs)
+
+        print("\n  %i jobs, %i bytes: parse %.2f secs, reconcile %.2f secs" % \
+              (nJobs, len(output), parseTime, reconcileTime))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
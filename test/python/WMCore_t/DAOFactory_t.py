@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+_DAOFactory_t_
+
+Unit tests for the DAOFactory class registry.
+"""
+
+import logging
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+import WMCore.DAOFactory
+from WMCore.DAOFactory import DAOFactory, loadDAOClass, clearDAOCache
+from WMCore.Database.DBFactory import DBFactory
+
+class DAOFactoryTest(unittest.TestCase):
+    """
+    _DAOFactoryTest_
+
+    Test the DAOFactory against an in memory SQLite database.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Connect to an in memory SQLite database and start from an empty
+        registry.
+        """
+        self.logger = logging.getLogger()
+        self.dbi = DBFactory(self.logger, "sqlite://").connect()
+        clearDAOCache()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Leave an empty registry behind.
+        """
+        clearDAOCache()
+        return
+
+    def testLoad(self):
+        """
+        _testLoad_
+
+        Verify DAOs are loaded for the right dialect and their classes are
+        only imported once.
+        """
+        daoFactory = DAOFactory(package = "WMCore.Agent.Database",
+                                logger = self.logger, dbinterface = self.dbi)
+        self.assertEqual(daoFactory.dialect, "SQLite")
+
+        first = daoFactory(classname = "UpdateWorker")
+        second = daoFactory(classname = "UpdateWorker")
+        self.assertEqual(first.__class__.__module__, "WMCore.Agent.Database.SQLite.UpdateWorker")
+        self.assertTrue(first.__class__ is second.__class__)
+        self.assertFalse(first is second)
+        self.assertTrue(first.dbi is self.dbi)
+        self.assertTrue(("WMCore.Agent.Database", "SQLite", "UpdateWorker") in WMCore.DAOFactory._daoClasses)
+
+        self.assertTrue(loadDAOClass("WMCore.Agent.Database", "SQLite", "UpdateWorker") is first.__class__)
+        self.assertRaises(ImportError, daoFactory, "NoSuchDAO")
+
+        couchFactory = DAOFactory(package = "WMCore.Agent.Database",
+                                  logger = self.logger, dbinterface = "http://localhost:5984")
+        self.assertEqual(couchFactory.dialect, "CouchDB")
+        return
+
+    def testInstanceCache(self):
+        """
+        _testInstanceCache_
+
+        Verify DAO objects are only reused when asked for, and not across
+        database interfaces.
+        """
+        daoFactory = DAOFactory(package = "WMCore.Agent.Database", logger = self.logger,
+                                dbinterface = self.dbi, cacheInstances = True)
+        first = daoFactory(classname = "GetHeartbeatInfo")
+        self.assertTrue(daoFactory(classname = "GetHeartbeatInfo") is first)
+        self.assertFalse(daoFactory(classname = "GetAllHeartbeatInfo") is first)
+
+        daoFactory.dbinterface = DBFactory(self.logger, "sqlite://").connect()
+        other = daoFactory(classname = "GetHeartbeatInfo")
+        self.assertFalse(other is first)
+        self.assertTrue(other.dbi is daoFactory.dbinterface)
+        return
+
+    def testPreload(self):
+        """
+        _testPreload_
+
+        Verify all the DAOs of a package are found and preloaded.
+        """
+        daoFactory = DAOFactory(package = "WMCore.Agent.Database",
+                                logger = self.logger, dbinterface = self.dbi)
+        classnames = daoFactory.listClassnames()
+        self.assertTrue("InsertWorker" in classnames)
+        self.assertTrue("UpdateWorkerError" in classnames)
+        self.assertFalse("__init__" in classnames)
+
+        self.assertEqual(daoFactory.preload(), len(classnames))
+        for classname in classnames:
+            self.assertTrue(("WMCore.Agent.Database", "SQLite", classname) in WMCore.DAOFactory._daoClasses)
+
+        self.assertEqual(daoFactory.preload(["InsertWorker", "NoSuchDAO"]), 1)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Measure the cost of acquiring a DAO with a cold registry, a warm
+        registry and reused instances.
+        """
+        nCalls = 20000
+        classnames = ["GetHeartbeatInfo", "GetAllHeartbeatInfo", "UpdateWorker", "ExistWorker"]
+        daoFactory = DAOFactory(package = "WMCore.Agent.Database",
+                                logger = self.logger, dbinterface = self.dbi)
+
+        # What every call cost before the registry
+        startTime = time.time()
+        for i in range(nCalls):
+            clearDAOCache()
+            daoFactory._dialect = None
+            daoFactory(classname = classnames[i % len(classnames)])
+        coldTime = time.time() - startTime
+
+        startTime = time.time()
+        for i in range(nCalls):
+            daoFactory(classname = classnames[i % len(classnames)])
+        warmTime = time.time() - startTime
+
+        daoFactory.cacheInstances = True
+        startTime = time.time()
+        for i in range(nCalls):
+            daoFactory(classname = classnames[i % len(classnames)])
+        instanceTime = time.time() - startTime
+
+        print("\n  %i DAO acquisitions: no registry %.2f usecs/call, registry %.2f usecs/call, cached instances %.2f usecs/call" % \
+              (nCalls, coldTime * 1e6 / nCalls, warmTime * 1e6 / nCalls, instanceTime * 1e6 / nCalls))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -88,6 +88,34 @@ class JobPackageTest(unittest.TestCase):
 
         return
 
+    def testPersistCompressed(self):
+        """
+        _testPersistCompressed_
+
+        Verify that compressed packages can be loaded and are smaller.
+        """
+        package = JobPackage(directory = "/some/dir")
+
+        for i in range(100):
+            newJob = Job("Job%s" % i)
+            newJob["id"] = i
+            package[i] = newJob
+
+        package.save(self.persistFile)
+        plainSize = os.path.getsize(self.persistFile)
+        package.save(self.persistFile, compress = True)
+        self.assertTrue(os.path.getsize(self.persistFile) < plainSize)
+
+        newPackage = JobPackage()
+        newPackage.load(self.persistFile)
+        self.assertEqual(len(newPackage.keys()), 101)
+        self.assertEqual(newPackage["directory"], "/some/dir")
+        for i in range(100):
+            self.assertEqual(newPackage[i]["id"], i)
+            self.assertEqual(newPackage[i]["name"], "Job%d" % i)
+
+        return
+
     def testBaggage(self):
         """
         _testBaggage_
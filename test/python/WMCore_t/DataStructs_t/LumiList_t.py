@@ -1,7 +1,14 @@
 #! /usr/bin/env python
 
+import os
+import random
+import shutil
+import tempfile
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 #import FWCore.ParameterSet.Config as cms
 from WMCore.DataStructs.LumiList import LumiList
 
@@ -12,10 +19,15 @@ class LumiListTest(unittest.TestCase):
     """
 
     def setUp(self):
-        jsonFile = open('lumiTest.json','w')
+        self.testDir = tempfile.mkdtemp()
+        self.jsonPath = os.path.join(self.testDir, 'lumiTest.json')
+        jsonFile = open(self.jsonPath,'w')
         jsonFile.write('{"1": [[1, 33], [35, 35], [37, 47]], "2": [[49, 75], [77, 130], [133, 136]]}')
         jsonFile.close()
 
+    def tearDown(self):
+        shutil.rmtree(self.testDir, ignore_errors = True)
+
 
     def notestRead(self):
         """
@@ -26,7 +38,7 @@ class LumiListTest(unittest.TestCase):
                     '2': [[49, 75], [77, 130], [133, 136]]}
         exVLBR   = cms.VLuminosityBlockRange('1:1-1:33', '1:35', '1:37-1:47', '2:49-2:75', '2:77-2:130', '2:133-2:136')
 
-        jsonList = LumiList(filename = 'lumiTest.json')
+        jsonList = LumiList(filename = self.jsonPath)
         lumiString = jsonList.getCMSSWString()
         lumiList = jsonList.getCompactList()
         lumiVLBR = jsonList.getVLuminosityBlockRange(True)
@@ -44,7 +56,7 @@ class LumiListTest(unittest.TestCase):
         listLs2 = range(49, 76) + range(77, 131) + range(133, 137)
         lumis = list(zip([1]*100, listLs1)) + list(zip([2]*100, listLs2))
 
-        jsonLister = LumiList(filename = 'lumiTest.json')
+        jsonLister = LumiList(filename = self.jsonPath)
         jsonString = jsonLister.getCMSSWString()
         jsonList = jsonLister.getCompactList()
 
@@ -73,7 +85,7 @@ class LumiListTest(unittest.TestCase):
             '2': []
         }
 
-        jsonLister = LumiList(filename = 'lumiTest.json')
+        jsonLister = LumiList(filename = self.jsonPath)
         jsonString = jsonLister.getCMSSWString()
         jsonList   = jsonLister.getCompactList()
 
@@ -286,7 +298,7 @@ class LumiListTest(unittest.TestCase):
                   '4' : range(1,100),
                  }
         a = LumiList(runsAndLumis = alumis)
-        a.writeJSON('newFile.json')
+        a.writeJSON(os.path.join(self.testDir, 'newFile.json'))
 
     def testCompact(self):
         acl = {'1': [[1, 2], [3, 4], [8, 9]]}
@@ -298,5 +310,85 @@ class LumiListTest(unittest.TestCase):
         self.assertEqual(LumiList(compactList=acl).getCMSSWString(), LumiList(compactList=ccl).getCMSSWString())
         self.assertEqual(LumiList(compactList=acl).getCMSSWString(), LumiList(compactList=dcl).getCMSSWString())
 
+    def testRandomSetOperations(self):
+        """
+        Compare the set operations and lookups with python sets of lumis
+        """
+        random.seed(42)
+        for _ in range(20):
+            aLumis = {}
+            bLumis = {}
+            for run in range(1, 5):
+                aLumis[run] = random.sample(range(1, 200), random.randint(0, 100))
+                bLumis[run + 1] = random.sample(range(1, 200), random.randint(0, 100))
+            a = LumiList(runsAndLumis = aLumis)
+            b = LumiList(runsAndLumis = bLumis)
+            aSet = set(a.getLumis())
+            bSet = set(b.getLumis())
+
+            self.assertEqual(set((a - b).getLumis()), aSet - bSet)
+            self.assertEqual(set((a & b).getLumis()), aSet & bSet)
+            self.assertEqual(set((a | b).getLumis()), aSet | bSet)
+            self.assertEqual((a | b).getCompactList(), LumiList(lumis = list(aSet | bSet)).getCompactList())
+
+            candidates = [(run, lumi) for run in range(0, 7) for lumi in range(0, 202)]
+            self.assertEqual(a.filterLumis(candidates), [x for x in candidates if x in aSet])
+            for candidate in candidates[::7]:
+                self.assertEqual(a.contains(candidate), candidate in aSet)
+                self.assertEqual(candidate in a, candidate in aSet)
+
+    def testContainsOpenRange(self):
+        """
+        A range ending in lumi 0 extends to the end of the run
+        """
+        lumis = LumiList(compactList = {'1': [[1, 10], [20, 0]]})
+        self.assertTrue(lumis.contains(1, 5))
+        self.assertFalse(lumis.contains(1, 15))
+        self.assertTrue(lumis.contains(1, 25))
+        self.assertTrue(lumis.contains((1, 1000)))
+        self.assertFalse(lumis.contains(2, 5))
+        self.assertTrue(lumis.contains(1))
+
+        lumis.removeRuns([1])
+        self.assertFalse(lumis.contains(1, 5))
+
+    def testFilterRunLumis(self):
+        """
+        Test filtering the lumis of a single run, sorted or not
+        """
+        lumis = LumiList(compactList = {'1': [[3, 5], [8, 8], [20, 24]],
+                                        '2': [[1, 2]]})
+        self.assertEqual(lumis.filterRunLumis(1, range(1, 30)),
+                         [3, 4, 5, 8, 20, 21, 22, 23, 24])
+        self.assertEqual(lumis.filterRunLumis('1', [8, 4, 1, 30, 5, 9, 22]), [8, 4, 5, 22])
+        self.assertEqual(lumis.filterRunLumis(2, [2, 2, 3]), [2, 2])
+        self.assertEqual(lumis.filterRunLumis(3, [1, 2]), [])
+        for run in [1, 2, 3]:
+            self.assertEqual(lumis.filterRunLumis(run, range(1, 50)),
+                             [lumi for (_, lumi) in lumis.filterLumis(zip([run] * 49, range(1, 50)))])
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        Time the set operations and filterLumis on a golden JSON sized mask
+        """
+        random.seed(42)
+        aRanges = {}
+        bRanges = {}
+        for run in range(100000, 100500):
+            aRanges[run] = [[x, x + random.randint(0, 20)] for x in range(1, 5000, 25)]
+            bRanges[run] = [[x, x + random.randint(0, 50)] for x in range(1, 5000, 60)]
+        a = LumiList(compactList = aRanges)
+        b = LumiList(compactList = bRanges)
+        candidates = [(run, lumi) for run in range(100000, 100500) for lumi in range(1, 5000, 5)]
+
+        for name, operation in [('and', lambda: a & b), ('or', lambda: a | b),
+                                ('sub', lambda: a - b),
+                                ('filterLumis', lambda: a.filterLumis(candidates)),
+                                ('contains', lambda: [a.contains(x) for x in candidates])]:
+            startTime = time.time()
+            operation()
+            print "%s: %.3f seconds" % (name, time.time() - startTime)
+
 if __name__ == '__main__':
     unittest.main()
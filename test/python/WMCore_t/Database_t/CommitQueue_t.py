@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+_CommitQueue_t_
+
+Unit tests for the background commits of CMSCouch.Database, run against a
+local HTTP server standing in for CouchDB.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import json
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Database.CMSCouch import Database, CouchInternalServerError
+from WMCore.Services.ConnectionPool import getConnectionPool
+
+class BulkDocsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    _BulkDocsHandler_
+
+    Answer bulk docs posts like CouchDB does, after a delay.
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "CouchStandIn/1.0"
+    sys_version = ""
+    # The headers are written one by one
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.delay)
+        self.server.lock.acquire()
+        try:
+            self.server.posts += 1
+            if self.server.errors > 0:
+                self.server.errors -= 1
+                self.reply(500, {'error': 'unknown_error', 'reason': 'badness'})
+                return
+            rows = []
+            for doc in json.loads(body)['docs']:
+                if doc['_id'] in self.server.docs and '_rev' not in doc:
+                    rows.append({'id': doc['_id'], 'error': 'conflict',
+                                 'reason': 'Document update conflict.'})
+                else:
+                    self.server.docs[doc['_id']] = doc
+                    rows.append({'id': doc['_id'], 'rev': '1-abc'})
+        finally:
+            self.server.lock.release()
+        self.reply(201, rows)
+
+    def reply(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class CouchStandIn(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    _CouchStandIn_
+
+    Threaded HTTP server keeping the documents posted to it.
+    """
+    daemon_threads = True
+
+    def __init__(self, delay):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), BulkDocsHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.docs = {}
+        self.posts = 0
+        self.errors = 0
+
+class CommitQueueTest(unittest.TestCase):
+    """
+    _CommitQueueTest_
+
+    Test the commit queue of CMSCouch.Database.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Start the CouchDB stand in and connect to a database in it.
+        """
+        self.server = CouchStandIn(delay = 0.01)
+        self.serverThread = threading.Thread(target = self.server.serve_forever)
+        self.serverThread.start()
+        self.url = 'http://127.0.0.1:%i' % self.server.server_address[1]
+        self.database = Database('commitqueue_t', self.url, size = 100)
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Stop the commit queue and the CouchDB stand in.
+        """
+        if self.database.commitQueue:
+            self.database.commitQueue.close()
+        getConnectionPool().clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.serverThread.join()
+        return
+
+    def testBatches(self):
+        """
+        _testBatches_
+
+        Verify the documents are committed in batches when there are enough
+        of them, when they have waited long enough and on flush.
+        """
+        self.database.queue({'_id': 'before'})
+        commitQueue = self.database.startCommitQueue(batchSize = 10, interval = 60)
+        self.assertTrue(self.database.startCommitQueue() is commitQueue)
+        for i in range(24):
+            self.database.queue({'_id': 'doc%i' % i}, timestamp = True)
+        time.sleep(0.5)
+        self.assertEqual(self.server.posts, 2)
+        self.assertEqual(commitQueue.stats()['pending'], 5)
+
+        self.assertEqual(self.database.commit({'_id': 'last'}), [])
+        self.assertEqual(len(self.server.docs), 26)
+        self.assertTrue('timestamp' in self.server.docs['doc0'])
+        stats = commitQueue.stats()
+        self.assertEqual(stats['committed'], 26)
+        self.assertEqual(stats['batches'], 3)
+
+        commitQueue.interval = 0.2
+        self.database.queue({'_id': 'late'})
+        time.sleep(0.6)
+        self.assertTrue('late' in self.server.docs)
+        self.assertEqual(self.server.posts, 4)
+
+        # Back to synchronous commits
+        self.assertEqual(self.database.stopCommitQueue(), [])
+        self.assertEqual(self.database.commitQueue, None)
+        self.assertRaises(RuntimeError, commitQueue.put, {'_id': 'closed'})
+        self.database.queue({'_id': 'sync'})
+        self.assertFalse('sync' in self.server.docs)
+        self.database.commit()
+        self.assertTrue('sync' in self.server.docs)
+        return
+
+    def testConflicts(self):
+        """
+        _testConflicts_
+
+        Verify the conflict callbacks are applied and the failed documents
+        returned.
+        """
+        self.server.docs['taken'] = {'_id': 'taken'}
+        self.server.docs['alsotaken'] = {'_id': 'alsotaken'}
+        conflicts = []
+        def callback(database, data, result):
+            conflicts.append(result['id'])
+            self.assertTrue(database is self.database)
+            return {'id': result['id'], 'rev': '2-def'}
+
+        self.database.startCommitQueue(batchSize = 10)
+        self.database.queue({'_id': 'taken'}, callback = callback)
+        self.database.queue({'_id': 'alsotaken'})
+        self.database.queue({'_id': 'free'}, callback = callback)
+        failed = self.database.flush()
+        self.assertEqual(conflicts, ['taken'])
+        self.assertEqual([x['id'] for x in failed], ['alsotaken'])
+        self.assertEqual(self.database.commitQueue.stats()['conflicts'], 2)
+        self.assertEqual(self.database.flush(), [])
+        return
+
+    def testBackpressure(self):
+        """
+        _testBackpressure_
+
+        Verify queueing blocks while too many documents are waiting.
+        """
+        self.server.delay = 0.3
+        commitQueue = self.database.startCommitQueue(batchSize = 5, maxPending = 5)
+        for i in range(5):
+            self.assertTrue(commitQueue.put({'_id': 'doc%i' % i}, timeout = 0.1))
+        # The first batch is being posted, there's room for another one
+        time.sleep(0.1)
+        for i in range(5, 10):
+            self.assertTrue(commitQueue.put({'_id': 'doc%i' % i}, timeout = 0.1))
+        self.assertFalse(commitQueue.put({'_id': 'doc10'}, timeout = 0.1))
+
+        startTime = time.time()
+        self.database.queue({'_id': 'doc10'})
+        self.assertTrue(time.time() - startTime > 0.05)
+        self.assertTrue(commitQueue.stats()['blocked_time'] > 0.05)
+        self.database.flush()
+        self.assertEqual(len(self.server.docs), 11)
+        return
+
+    def testErrors(self):
+        """
+        _testErrors_
+
+        Verify a batch that couldn't be posted is retried and the error
+        raised by flush.
+        """
+        self.server.errors = 1
+        self.database.startCommitQueue(batchSize = 10, interval = 0.2)
+        for i in range(3):
+            self.database.queue({'_id': 'doc%i' % i})
+        self.assertRaises(CouchInternalServerError, self.database.flush)
+        self.assertEqual(self.database.flush(), [])
+        self.assertEqual(sorted(self.server.docs.keys()), ['doc0', 'doc1', 'doc2'])
+        self.assertEqual(self.database.commitQueue.stats()['errors'], 1)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare the throughput of a producer queueing documents with
+        synchronous and background commits.
+        """
+        nDocs = 2000
+        self.server.delay = 0.05
+        for background in [False, True]:
+            database = Database('commitqueue_perf_t', self.url, size = 100)
+            if background:
+                database.startCommitQueue()
+            startTime = time.time()
+            for i in range(nDocs):
+                # the work making a document
+                time.sleep(0.0005)
+                database.queue({'_id': 'doc%i_%s' % (i, background)})
+            producerTime = time.time() - startTime
+            database.flush()
+            totalTime = time.time() - startTime
+            database.stopCommitQueue()
+            print("\n  %i docs, background=%s: producer %.2f secs (%.0f docs/sec), all committed after %.2f secs" % \
+                  (nDocs, background, producerTime, nDocs / producerTime, totalTime))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,15 @@ Unit tests for the DBInterface class
 import unittest
 import logging
 import threading
+import time
 
+from nose.plugins.attrib import attr
+
+from WMCore.Database.DBCore import bulkSelectTemplate
+from WMCore.Database.DBFactory import DBFactory
+from WMCore.WMBS.MySQL.Files.GetByID import GetByID
+from WMCore.WMBS.MySQL.Files.GetLocation import GetLocation
+from WMCore.WMBS.MySQL.Files.GetParentIDsByID import GetParentIDsByID
 from WMQuality.TestInit import TestInit
 
 class DBCoreTest(unittest.TestCase):
@@ -315,5 +323,200 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testBulkSelect(self):
+        """
+        _testBulkSelect_
+
+        Verify that a select with many binds returns the same rows, in the
+        same order, whether it runs in bulk or once per bind.
+        """
+        binds = []
+        for i in range(100):
+            binds.append({"one": i % 10, "two": i, "three": "row%i" % i})
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = """SELECT column2, column3 FROM test_tablea
+                       WHERE column1 = :one ORDER BY column2"""
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = [{"one": x} for x in [5, 3, 5, 42, 0]]
+        bulkResult = myThread.dbi.processData(selectSQL, selectBinds)
+        myThread.dbi.bulkSelectSize = 0
+        try:
+            plainResult = myThread.dbi.processData(selectSQL, selectBinds)
+        finally:
+            myThread.dbi.bulkSelectSize = 500
+
+        self.assertEqual(len(bulkResult), 1)
+        self.assertEqual([x.lower() for x in bulkResult[0].keys], ["column2", "column3"])
+        bulkRows = [tuple(x) for x in bulkResult[0].fetchall()]
+        self.assertEqual(bulkRows, [tuple(x) for x in plainResult[0].fetchall()])
+        self.assertEqual(len(bulkRows), 40)
+        self.assertEqual(bulkRows[0], (5, "row5"))
+        self.assertEqual(bulkRows[10], (3, "row3"))
+        return
+
+class DBCoreBulkSelectTest(unittest.TestCase):
+    """
+    _DBCoreBulkSelectTest_
+
+    Bulk select tests that run on an in memory SQLite database.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create the WMBS file tables used by the file DAOs in SQLite.
+        """
+        self.logger = logging.getLogger()
+        self.dbi = DBFactory(self.logger, "sqlite://").connect()
+        self.conn = self.dbi.connection()
+        for createSQL in ["""CREATE TABLE wmbs_file_details (id INTEGER PRIMARY KEY, lfn VARCHAR(500),
+                               filesize INTEGER, events INTEGER, first_event INTEGER, merged INTEGER)""",
+                          "CREATE TABLE wmbs_file_parent (child INTEGER, parent INTEGER)",
+                          "CREATE TABLE wmbs_location (id INTEGER PRIMARY KEY, site_name VARCHAR(255))",
+                          "CREATE TABLE wmbs_location_senames (location INTEGER, se_name VARCHAR(255))",
+                          "CREATE TABLE wmbs_file_location (fileid INTEGER, location INTEGER)",
+                          "CREATE INDEX wmbs_file_parent_child ON wmbs_file_parent (child)",
+                          "CREATE INDEX wmbs_file_details_lfn ON wmbs_file_details (lfn)",
+                          "CREATE INDEX wmbs_file_location_fileid ON wmbs_file_location (fileid)"]:
+            self.dbi.processData(createSQL, conn = self.conn)
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Close the connection, which drops the database.
+        """
+        self.conn.close()
+        return
+
+    def fillFiles(self, nFiles):
+        """
+        _fillFiles_
+
+        Insert nFiles files, each with two parents and two locations.
+        """
+        files = []
+        parents = []
+        locations = []
+        for i in range(nFiles):
+            files.append({"id": i + 1, "lfn": "/store/file%i.root" % i, "size": 1000,
+                          "events": 10, "first": 0, "merged": 1})
+            parents.append({"child": i + 1, "parent": nFiles + 2 * i})
+            parents.append({"child": i + 1, "parent": nFiles + 2 * i + 1})
+            locations.append({"fileid": i + 1, "location": 1 + i % 2})
+            locations.append({"fileid": i + 1, "location": 3})
+        self.dbi.processData("""INSERT INTO wmbs_file_details VALUES
+                                  (:id, :lfn, :size, :events, :first, :merged)""",
+                             files, conn = self.conn)
+        self.dbi.processData("INSERT INTO wmbs_file_parent VALUES (:child, :parent)",
+                             parents, conn = self.conn)
+        self.dbi.processData("INSERT INTO wmbs_file_location VALUES (:fileid, :location)",
+                             locations, conn = self.conn)
+        for i in range(1, 4):
+            self.dbi.processData("INSERT INTO wmbs_location VALUES (:id, :name)",
+                                 {"id": i, "name": "T2_Site%i" % i}, conn = self.conn)
+            self.dbi.processData("INSERT INTO wmbs_location_senames VALUES (:id, :name)",
+                                 {"id": i, "name": "se%i.example.com" % i}, conn = self.conn)
+        return
+
+    def testBulkSelectTemplate(self):
+        """
+        _testBulkSelectTemplate_
+
+        Verify which selects can be run in bulk.
+        """
+        self.assertEqual(bulkSelectTemplate("SELECT a, b FROM t WHERE c = :c ORDER BY b", "c"),
+                         ("c", "SELECT c AS wmcore_bulk_key, a, b FROM t WHERE c IN (", ") ORDER BY b"))
+        self.assertEqual(bulkSelectTemplate("select distinct t.a from t where t.b > 1 and t.c=:c", "c"),
+                         ("t.c", "select distinct t.c AS wmcore_bulk_key, t.a from t where t.b > 1 and t.c IN (", ")"))
+        self.assertEqual(bulkSelectTemplate("SELECT a, (SELECT MIN(d) FROM u WHERE u.a = t.a) AS d FROM t WHERE c = :c", "c"),
+                         ("c", "SELECT c AS wmcore_bulk_key, a, (SELECT MIN(d) FROM u WHERE u.a = t.a) AS d FROM t WHERE c IN (", ")"))
+        for sql in ["SELECT count(*) FROM t WHERE c = :c",
+                    "SELECT a FROM t WHERE c = :c GROUP BY a",
+                    "SELECT a FROM t WHERE b = 1 OR c = :c",
+                    "SELECT a FROM t WHERE c = :c AND d = :c",
+                    "SELECT a FROM t WHERE c > :c",
+                    "SELECT a FROM t WHERE a IN (SELECT a FROM u WHERE c = :c)",
+                    "SELECT a FROM t INNER JOIN u ON u.c = :c",
+                    "select * from t where c = :c",
+                    "SELECT a, t.* FROM t WHERE c = :c",
+                    "UPDATE t SET a = 1 WHERE c = :c"]:
+            self.assertEqual(bulkSelectTemplate(sql, "c"), None, sql)
+        return
+
+    def testBulkSelectFallback(self):
+        """
+        _testBulkSelectFallback_
+
+        Verify the binds are run one by one when the rows of a bulk select
+        can't be told apart or the bulk select fails.
+        """
+        self.dbi.processData("CREATE TABLE nocase (name VARCHAR(255) COLLATE NOCASE, n INTEGER)",
+                             conn = self.conn)
+        self.dbi.processData("INSERT INTO nocase VALUES (:name, :n)",
+                             [{"name": "abc", "n": 1}, {"name": "def", "n": 2}], conn = self.conn)
+        sql = "SELECT n FROM nocase WHERE name = :name"
+        binds = [{"name": "abc"}, {"name": "ABC"}, {"name": "def"}]
+        result = self.dbi.processData(sql, binds, conn = self.conn)
+        self.assertEqual([tuple(x) for x in result[0].fetchall()], [(1,), (1,), (2,)])
+
+        # A broken bulk statement
+        self.dbi.bulkSelectTemplates[(sql, "name")] = ("name", "SELECT nosuchcolumn FROM nocase WHERE name IN (", ")")
+        result = self.dbi.processData(sql, binds[1:], conn = self.conn)
+        self.assertEqual([tuple(x) for x in result[0].fetchall()], [(1,), (2,)])
+        self.assertEqual(self.dbi.bulkSelectTemplates[(sql, "name")], None)
+        return
+
+    def testFileDAOs(self):
+        """
+        _testFileDAOs_
+
+        Verify that the file DAOs return the same results with and without
+        bulk selects.
+        """
+        self.fillFiles(50)
+        fileIDs = range(1, 52) + [7, 7]
+        lfns = ["/store/file%i.root" % i for i in range(20)] + ["/store/nofile.root"]
+        results = []
+        for bulkSelectSize in [0, 500, 7]:
+            self.dbi.bulkSelectSize = bulkSelectSize
+            results.append((GetByID(self.logger, self.dbi).execute(fileIDs, conn = self.conn),
+                            sorted(GetParentIDsByID(self.logger, self.dbi).execute(fileIDs, conn = self.conn)),
+                            GetLocation(self.logger, self.dbi).execute(lfns, conn = self.conn)))
+
+        self.assertEqual(len(results[0][0]), 50)
+        self.assertEqual(results[0][0][7]["lfn"], "/store/file6.root")
+        self.assertEqual(len(results[0][1]), 100)
+        self.assertEqual(results[0][2], set(["se1.example.com", "se2.example.com", "se3.example.com"]))
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], results[0])
+        return
+
+    @attr('performance')
+    def testBulkSelectPerformance(self):
+        """
+        _testBulkSelectPerformance_
+
+        Time the file DAOs for 20000 files with and without bulk selects.
+        """
+        nFiles = 20000
+        self.fillFiles(nFiles)
+        fileIDs = range(1, nFiles + 1)
+        lfns = ["/store/file%i.root" % i for i in range(nFiles)]
+        print("")
+        for daoClass, arg in [(GetByID, fileIDs), (GetParentIDsByID, fileIDs), (GetLocation, lfns)]:
+            for bulkSelectSize in [0, 500]:
+                self.dbi.bulkSelectSize = bulkSelectSize
+                dao = daoClass(self.logger, self.dbi)
+                startTime = time.time()
+                dao.execute(arg, conn = self.conn)
+                print("  %s, bulkSelectSize=%i: %.2f secs" % (daoClass.__name__, bulkSelectSize,
+                                                             time.time() - startTime))
+        return
+
 if __name__ == "__main__":
     unittest.main()
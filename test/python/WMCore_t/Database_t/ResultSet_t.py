@@ -10,15 +10,45 @@ Unit tests for the Database/ResultSet class
 #Written to test the ResultSet class initially by mnorman
 #Dependent on DBCore, specifically DBCore.processData()
 
+import cPickle
+import multiprocessing
+import resource
 import unittest
 import logging
 import threading
 import os
+import time
+
+from nose.plugins.attrib import attr
 
 from WMCore.WMFactory import WMFactory
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.DBFactory import DBFactory
+from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet, resultRowType
 from WMQuality.TestInit import TestInit
 
+def formatJobs(dbPath, stream, results):
+    """
+    _formatJobs_
+
+    Format all the rows of the job table of a SQLite database in a separate
+    process and return the time it took and the memory high-water mark of
+    the process.
+    """
+    startTime = time.time()
+    dbi = DBFactory(logging.getLogger(), "sqlite:///%s" % dbPath).connect()
+    formatter = DBFormatter(logging.getLogger(), dbi)
+    sql = "SELECT id, fwjr_path, state FROM wmbs_job"
+    nRows = 0
+    if stream:
+        for _ in formatter.iterDict(dbi.streamData(sql)):
+            nRows += 1
+    else:
+        nRows = len(formatter.formatDict(dbi.processData(sql)))
+    results.put((nRows, time.time() - startTime,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    return
+
 
 class ResultSetTest(unittest.TestCase):
 
@@ -119,7 +149,133 @@ class ResultSetTest(unittest.TestCase):
 
         return
 
+class StreamingResultSetTest(unittest.TestCase):
+    """
+    _StreamingResultSetTest_
+
+    Result row and streaming tests that run on a SQLite database.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a job table with 100 jobs.
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        self.dbPath = os.path.join(self.testDir, "jobs.db")
+        self.logger = logging.getLogger()
+        self.dbi = DBFactory(self.logger, "sqlite:///%s" % self.dbPath).connect()
+        self.dbi.processData("CREATE TABLE wmbs_job (id INTEGER, fwjr_path VARCHAR(255), State INTEGER)")
+        self.insertJobs(100)
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Remove the database.
+        """
+        self.testInit.delWorkDir()
+        return
+
+    def insertJobs(self, nJobs):
+        """
+        _insertJobs_
+
+        Insert nJobs jobs in the job table.
+        """
+        binds = []
+        for i in range(nJobs):
+            binds.append({"id": i, "state": i % 3,
+                          "path": "/data/JobCollection_%i/job_%i/Report.0.pkl" % (i / 1000, i)})
+        self.dbi.processData("INSERT INTO wmbs_job VALUES (:id, :path, :state)", binds)
+        return
+
+    def testResultRow(self):
+        """
+        _testResultRow_
 
+        Verify that result rows can be used like SQLAlchemy rows.
+        """
+        result = self.dbi.processData("SELECT id, fwjr_path, State FROM wmbs_job WHERE id = :id",
+                                      {"id": 7})
+        self.assertEqual(result[0].keys, ["id", "fwjr_path", "State"])
+        row = result[0].fetchone()
+        self.assertEqual(row, (7, "/data/JobCollection_0/job_7/Report.0.pkl", 1))
+        self.assertEqual(row[0], 7)
+        self.assertEqual(row[-1], 1)
+        self.assertEqual(row[1:], ("/data/JobCollection_0/job_7/Report.0.pkl", 1))
+        self.assertEqual(row["id"], 7)
+        self.assertEqual(row["state"], 1)
+        self.assertEqual(row["State"], 1)
+        self.assertEqual(row.fwjr_path, "/data/JobCollection_0/job_7/Report.0.pkl")
+        self.assertEqual(row.keys(), ["id", "fwjr_path", "State"])
+        self.assertEqual(dict(row.items())["id"], 7)
+        self.assertTrue(row.has_key("state"))
+        self.assertRaises(KeyError, row.__getitem__, "outcome")
+        self.assertRaises(AttributeError, getattr, row, "outcome")
+        self.assertRaises(AttributeError, setattr, row, "id", 8)
+        self.assertTrue(type(row) is resultRowType(["id", "fwjr_path", "State"]))
+
+        for protocol in [0, 2]:
+            newRow = cPickle.loads(cPickle.dumps(row, protocol))
+            self.assertEqual(newRow, row)
+            self.assertEqual(newRow["state"], 1)
+        return
+
+    def testStreaming(self):
+        """
+        _testStreaming_
+
+        Verify that streamed results hold the same rows as plain results and
+        that both are formatted in the same way.
+        """
+        formatter = DBFormatter(self.logger, self.dbi)
+        sql = "SELECT id, fwjr_path, state FROM wmbs_job WHERE state = :state"
+        binds = [{"state": 1}, {"state": 2}]
+
+        dicts = formatter.formatDict(self.dbi.processData(sql, binds))
+        self.assertEqual(len(dicts), 66)
+        self.assertEqual(dicts[0], {"id": 1, "state": 1,
+                                    "fwjr_path": "/data/JobCollection_0/job_1/Report.0.pkl"})
+        self.assertEqual(list(formatter.iterDict(self.dbi.streamData(sql, binds, fetchSize = 7))),
+                         dicts)
+        self.assertEqual(formatter.format(self.dbi.streamData(sql, binds)),
+                         formatter.format(self.dbi.processData(sql, binds)))
+
+        conn = self.dbi.connection()
+        results = self.dbi.streamData("SELECT id FROM wmbs_job", conn = conn, fetchSize = 10)
+        result = results.next()
+        self.assertTrue(isinstance(result, StreamingResultSet))
+        self.assertEqual(result.keys, ["id"])
+        self.assertEqual(result.fetchone(), (0,))
+        self.assertEqual(len(result.fetchall()), 99)
+        self.assertEqual(result.fetchone(), [])
+        self.assertRaises(StopIteration, results.next)
+        self.assertFalse(conn.closed)
+        conn.close()
+        return
+
+    @attr('performance')
+    def testStreamingPerformance(self):
+        """
+        _testStreamingPerformance_
+
+        Compare time and memory used to format the 500k rows of a table with
+        and without streaming.
+        """
+        self.insertJobs(500000)
+        for stream in [False, True]:
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target = formatJobs,
+                                              args = (self.dbPath, stream, results))
+            process.start()
+            nRows, formatTime, maxRSS = results.get()
+            process.join()
+            print("\n  stream=%s: %i rows in %.2f secs, memory high-water mark %i kB" % \
+                  (stream, nRows, formatTime, maxRSS))
+        return
 
 if __name__ == "__main__":
     unittest.main()
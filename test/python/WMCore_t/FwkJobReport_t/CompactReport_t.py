@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""
+_CompactReport_t_
+
+Unit tests for the compact framework job report format.
+"""
+
+import cPickle
+import copy
+import os
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Configuration import ConfigSection
+from WMCore.DataStructs.Run import Run
+from WMCore.FwkJobReport.CompactReport import LazyReportSection, readReportHeader
+from WMCore.FwkJobReport.Report import Report
+from WMCore.WMBase import getTestBase
+from WMQuality.TestInit import TestInit
+
+class CompactReportTest(unittest.TestCase):
+    """
+    _CompactReportTest_
+
+    Unit tests for the compact framework job report format.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a work directory and find the CMSSW XML report.
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        self.xmlPath = os.path.join(getTestBase(),
+                                    "WMCore_t/FwkJobReport_t/CMSSWProcessingReport.xml")
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Remove the work directory.
+        """
+        self.testInit.delWorkDir()
+        return
+
+    def createReport(self, nSteps = 2, nFiles = 2, nLumis = 10):
+        """
+        _createReport_
+
+        Create a report with nSteps cmsRun steps, each with nFiles output
+        files holding nLumis lumi sections, and a failed logArch step.
+        """
+        report = Report()
+        for i in range(nSteps):
+            stepName = "cmsRun%i" % (i + 1)
+            report.addStep(stepName, status = 0)
+            report.setStepStartTime(stepName)
+            for j in range(nFiles):
+                run = Run(1)
+                run.extend(range(j * nLumis, (j + 1) * nLumis))
+                report.addOutputFile("RECO", {"LFN": "/store/file%i_%i.root" % (i, j),
+                                              "size": 1024, "events": nLumis,
+                                              "runs": [run]})
+            report.setStepStopTime(stepName)
+        report.addError("logArch1", 60312, "StageOutFailure", "Stage out failed")
+        report.setTaskName("/Workflow/Task")
+        report.setJobID(42)
+        return report
+
+    def testPersistCompact(self):
+        """
+        _testPersistCompact_
+
+        Verify that a report survives the round trip through the compact
+        format, with and without compression.
+        """
+        report = self.createReport()
+        for compress in [False, True]:
+            reportPath = os.path.join(self.testDir, "Report.%s.pkl" % compress)
+            report.persist(reportPath, compress = compress)
+
+            header = readReportHeader(reportPath)
+            self.assertEqual(header["steps"], ["cmsRun1", "cmsRun2", "logArch1"])
+            self.assertEqual(header["compressed"], compress)
+            self.assertEqual(header["summary"]["cmsRun2"]["outputFiles"], 2)
+            self.assertEqual(header["summary"]["logArch1"]["exitCode"], 60312)
+
+            newReport = Report()
+            newReport.load(reportPath)
+            self.assertTrue(isinstance(newReport.data, LazyReportSection))
+            self.assertEqual(newReport.getTaskName(), "/Workflow/Task")
+            self.assertEqual(newReport.getJobID(), 42)
+            self.assertEqual(newReport.data.dictionary_whole_tree_(),
+                             report.data.dictionary_whole_tree_())
+        return
+
+    def testLazyLoading(self):
+        """
+        _testLazyLoading_
+
+        Verify that exit codes, times and step status come from the header
+        and that the steps are only loaded when they are accessed.
+        """
+        report = self.createReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath)
+
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertEqual(newReport.getExitCode(), 60312)
+        self.assertEqual(newReport.getExitCodes(), set([60312]))
+        self.assertTrue(newReport.taskSuccessful())
+        self.assertFalse(newReport.stepSuccessful("logArch1"))
+        self.assertEqual(newReport.getFirstStartLastStop(),
+                         report.getFirstStartLastStop())
+        self.assertEqual(newReport.data._internal_pending,
+                         set(["cmsRun1", "cmsRun2", "logArch1"]))
+
+        self.assertEqual(len(newReport.getAllFilesFromStep("cmsRun1")), 2)
+        self.assertEqual(newReport.data._internal_pending,
+                         set(["cmsRun2", "logArch1"]))
+        self.assertTrue(newReport.data.cmsRun1._internal_parent_ref is newReport.data)
+
+        # Once a step is loaded changes to it are no longer hidden by the header
+        newReport.addError("cmsRun1", 8001, "CMSException", "Bad things")
+        self.assertEqual(newReport.getStepExitCode("cmsRun1"), 8001)
+        newReport.save(reportPath)
+
+        finalReport = Report()
+        finalReport.load(reportPath)
+        self.assertEqual(finalReport.getExitCode(), 8001)
+        self.assertEqual(len(finalReport.getAllFiles()), 4)
+        return
+
+    def testPickleLazyReport(self):
+        """
+        _testPickleLazyReport_
+
+        Verify that pickling or copying a lazily loaded report loads all the
+        steps and produces plain ConfigSections.
+        """
+        report = self.createReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath)
+
+        newReport = Report()
+        newReport.load(reportPath)
+        for data in [cPickle.loads(cPickle.dumps(newReport.data, 2)),
+                     copy.deepcopy(newReport.data)]:
+            self.assertEqual(type(data), ConfigSection)
+            self.assertTrue(data.cmsRun2._internal_parent_ref is data)
+            self.assertEqual(data.dictionary_whole_tree_(),
+                             report.data.dictionary_whole_tree_())
+        return
+
+    def testOldPickleFormat(self):
+        """
+        _testOldPickleFormat_
+
+        Verify that reports pickled by older versions can still be loaded.
+        """
+        report = self.createReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        handle = open(reportPath, 'w')
+        cPickle.dump(report.data, handle)
+        handle.close()
+
+        self.assertEqual(readReportHeader(reportPath), None)
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertFalse(isinstance(newReport.data, LazyReportSection))
+        self.assertEqual(newReport.getExitCode(), 60312)
+        self.assertEqual(len(newReport.getAllFiles()), 4)
+        return
+
+    def testPackReport(self):
+        """
+        _testPackReport_
+
+        Verify that a packed report, lazily loaded or not, is unpacked into
+        an identical tree of plain ConfigSections.
+        """
+        report = self.createReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath)
+        lazyReport = Report()
+        lazyReport.load(reportPath)
+
+        for packedReport in [report, lazyReport]:
+            newReport = Report()
+            newReport.unpack(packedReport.pack())
+            self.assertEqual(type(newReport.data), ConfigSection)
+            self.assertEqual(newReport.data._internal_parent_ref, None)
+            self.assertTrue(newReport.data.cmsRun2._internal_parent_ref is newReport.data)
+            self.assertEqual(newReport.data.dictionary_whole_tree_(),
+                             report.data.dictionary_whole_tree_())
+            self.assertEqual(newReport.__to_json__(None), report.__to_json__(None))
+            self.assertEqual(newReport.getExitCode(), 60312)
+            self.assertEqual(newReport.getTaskName(), "/Workflow/Task")
+
+            # The unpacked report can be changed and saved like any other
+            newReport.addStep("cmsRun3")
+            self.assertEqual(newReport.listSteps(), ["cmsRun1", "cmsRun2", "logArch1", "cmsRun3"])
+            newReport.persist(os.path.join(self.testDir, "NewReport.pkl"))
+
+        # Only plain values can be packed
+        report.data.cmsRun1.notPlain = []
+        report.data.cmsRun1.notPlain.append(object())
+        self.assertRaises(ValueError, report.pack)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare the old pickle format with the compact format for a large
+        multi step report, both for reading everything and for reading only
+        the exit codes.
+        """
+        report = self.createReport(nSteps = 5, nFiles = 50, nLumis = 200)
+        nLoops = 20
+
+        picklePath = os.path.join(self.testDir, "Report.pickle.pkl")
+        compactPath = os.path.join(self.testDir, "Report.compact.pkl")
+
+        startTime = time.time()
+        for _ in range(nLoops):
+            handle = open(picklePath, 'w')
+            cPickle.dump(report.data, handle)
+            handle.close()
+        print("\n  Pickle write: %.4f secs/report, %i bytes" % ((time.time() - startTime) / nLoops,
+                                                               os.path.getsize(picklePath)))
+
+        for compress in [False, True]:
+            startTime = time.time()
+            for _ in range(nLoops):
+                report.persist(compactPath, compress = compress)
+            print("  Compact write (compress=%s): %.4f secs/report, %i bytes" % \
+                  (compress, (time.time() - startTime) / nLoops, os.path.getsize(compactPath)))
+
+        report.persist(compactPath)
+        for path in [picklePath, compactPath]:
+            startTime = time.time()
+            for _ in range(nLoops):
+                newReport = Report()
+                newReport.load(path)
+                newReport.getExitCodes()
+                newReport.getFirstStartLastStop()
+            exitCodeTime = (time.time() - startTime) / nLoops
+
+            startTime = time.time()
+            for _ in range(nLoops):
+                newReport = Report()
+                newReport.load(path)
+                newReport.getAllFiles()
+            fullTime = (time.time() - startTime) / nLoops
+
+            print("  %s: exit codes %.4f secs/report, all files %.4f secs/report" % \
+                  (os.path.basename(path), exitCodeTime, fullTime))
+        return
+
+    @attr('performance')
+    def testPackPerformance(self):
+        """
+        _testPackPerformance_
+
+        Measure what the JobAccountant pays to get a report ready for
+        processing when it loads it itself and when a loader process sends it
+        over a queue, either as a pickled report or packed.
+        """
+        nLoops = 20
+        for nFiles, nLumis in [(5, 10), (50, 200)]:
+            report = self.createReport(nSteps = 2, nFiles = nFiles, nLumis = nLumis)
+            reportPath = os.path.join(self.testDir, "Report.pkl")
+            report.persist(reportPath)
+            pickledReport = cPickle.dumps(report, cPickle.HIGHEST_PROTOCOL)
+            packedReport = report.pack()
+
+            startTime = time.time()
+            for _ in range(nLoops):
+                newReport = Report()
+                newReport.load(reportPath)
+                newReport.data.loadAll_()
+            loadTime = (time.time() - startTime) / nLoops
+
+            startTime = time.time()
+            for _ in range(nLoops):
+                newReport = cPickle.loads(pickledReport)
+            pickleTime = (time.time() - startTime) / nLoops
+
+            startTime = time.time()
+            for _ in range(nLoops):
+                newReport = Report()
+                newReport.unpack(packedReport)
+            packTime = (time.time() - startTime) / nLoops
+
+            print("\n  %i files of %i lumis: load %.5f secs/report, pickled %.5f secs/report (%i bytes), packed %.5f secs/report (%i bytes)" % \
+                  (2 * nFiles, nLumis, loadTime, pickleTime, len(pickledReport),
+                   packTime, len(packedReport)))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
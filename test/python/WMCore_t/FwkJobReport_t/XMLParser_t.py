@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Unit tests for the CMSSW XML job report parsers.
+"""
+
+import multiprocessing
+import os
+import resource
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.XMLParser import xmlToJobReport
+from WMCore.WMBase import getTestBase
+from WMQuality.TestInit import TestInit
+
+def parseReport(xmlPath, streaming, results):
+    """
+    _parseReport_
+
+    Parse a report in a separate process and return the time it took and
+    the memory high-water mark of the process.
+    """
+    startTime = time.time()
+    report = Report("cmsRun1")
+    xmlToJobReport(report, xmlPath, streaming = streaming)
+    parseTime = time.time() - startTime
+    results.put((parseTime, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    return
+
+class XMLParserTest(unittest.TestCase):
+    """
+    _XMLParserTest_
+
+    Compare the streaming and the Node based XML parsers.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a work directory.
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        self.reportDir = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Remove the work directory.
+        """
+        self.testInit.delWorkDir()
+        return
+
+    def writeSyntheticReport(self, nLumis, nRuns = 10):
+        """
+        _writeSyntheticReport_
+
+        Write a CMSSW XML report with one input and one output file, each of
+        them holding nLumis lumi sections spread over nRuns runs.
+        """
+        runs = ["<Runs>\n"]
+        lumisPerRun = nLumis / nRuns
+        for run in range(nRuns):
+            runs.append("<Run ID=\"%i\">\n" % (run + 1))
+            for lumi in range(lumisPerRun):
+                runs.append("  <LumiSection ID=\"%i\"/>\n" % (lumi + 1))
+            runs.append("</Run>\n")
+        runs.append("</Runs>\n")
+        runs = "".join(runs)
+
+        xmlPath = os.path.join(self.testDir, "Synthetic.xml")
+        handle = open(xmlPath, 'w')
+        handle.write("<FrameworkJobReport>\n")
+        handle.write("<InputFile>\n<LFN>/store/input.root</LFN>\n<PFN>input.root</PFN>\n")
+        handle.write("<Catalog></Catalog>\n<ModuleLabel>source</ModuleLabel>\n<GUID></GUID>\n")
+        handle.write("<InputType>primaryFiles</InputType>\n<InputSourceClass>PoolSource</InputSourceClass>\n")
+        handle.write("<EventsRead>%i</EventsRead>\n" % nLumis)
+        handle.write(runs)
+        handle.write("</InputFile>\n")
+        handle.write("<File>\n<LFN></LFN>\n<PFN>output.root</PFN>\n<Catalog></Catalog>\n")
+        handle.write("<ModuleLabel>RECOoutput</ModuleLabel>\n<GUID></GUID>\n")
+        handle.write("<OutputModuleClass>PoolOutputModule</OutputModuleClass>\n")
+        handle.write("<TotalEvents>%i</TotalEvents>\n<BranchHash>0</BranchHash>\n" % nLumis)
+        handle.write(runs)
+        handle.write("<Inputs>\n<Input>\n<LFN>/store/input.root</LFN>\n<PFN>input.root</PFN>\n</Input>\n</Inputs>\n")
+        handle.write("</File>\n")
+        handle.write("</FrameworkJobReport>\n")
+        handle.close()
+        return xmlPath
+
+    def testParsersMatch(self):
+        """
+        _testParsersMatch_
+
+        Verify that both parsers produce the same report for all the sample
+        CMSSW reports.
+        """
+        for xmlName in ["CMSSWFailReport.xml", "CMSSWInputFallback.xml",
+                        "CMSSWMergeReport.xml", "CMSSWMultipleInput.xml",
+                        "CMSSWPileup.xml", "CMSSWProcessingReport.xml",
+                        "CMSSWSkippedAll.xml", "CMSSWSkippedNonExistentFile.xml",
+                        "CMSSWTwoFileLocal.xml", "CMSSWTwoFileRemote.xml",
+                        "PerformanceReport.xml"]:
+            xmlPath = os.path.join(self.reportDir, xmlName)
+            nodeReport = Report("cmsRun1")
+            xmlToJobReport(nodeReport, xmlPath, streaming = False)
+            streamReport = Report("cmsRun1")
+            xmlToJobReport(streamReport, xmlPath, streaming = True)
+            self.assertEqual(streamReport.data.dictionary_whole_tree_(),
+                             nodeReport.data.dictionary_whole_tree_(),
+                             "Error: parsers disagree on %s" % xmlName)
+        return
+
+    def testRunsAndLumis(self):
+        """
+        _testRunsAndLumis_
+
+        Verify the run and lumi information of a synthetic report.
+        """
+        xmlPath = self.writeSyntheticReport(nLumis = 100, nRuns = 4)
+        report = Report("cmsRun1")
+        xmlToJobReport(report, xmlPath, streaming = True)
+
+        inputFiles = report.getInputFilesFromStep("cmsRun1")
+        outputFiles = report.getFilesFromOutputModule("cmsRun1", "RECOoutput")
+        self.assertEqual(len(inputFiles), 1)
+        self.assertEqual(len(outputFiles), 1)
+        for fwjrFile in [inputFiles[0], outputFiles[0]]:
+            self.assertEqual(len(fwjrFile["runs"]), 4)
+            for run in fwjrFile["runs"]:
+                self.assertEqual(run.lumis, range(1, 26))
+        self.assertEqual(outputFiles[0]["input"], ["/store/input.root"])
+        return
+
+    def testCorruptReport(self):
+        """
+        _testCorruptReport_
+
+        Verify that a truncated report doesn't leave partial information in
+        the report.
+        """
+        xmlPath = self.writeSyntheticReport(nLumis = 100)
+        handle = open(xmlPath, 'r')
+        content = handle.read()
+        handle.close()
+        handle = open(xmlPath, 'w')
+        handle.write(content[:content.index("</File>")])
+        handle.close()
+
+        report = Report("cmsRun1")
+        self.assertRaises(Exception, xmlToJobReport, report, xmlPath)
+        self.assertEqual(report.getAllInputFiles(), [])
+        self.assertEqual(report.getAllFiles(), [])
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare time and memory used by both parsers for a report with
+        100k lumis per file.
+        """
+        xmlPath = self.writeSyntheticReport(nLumis = 100000, nRuns = 10)
+        for streaming in [False, True]:
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target = parseReport,
+                                              args = (xmlPath, streaming, results))
+            process.start()
+            parseTime, maxRSS = results.get()
+            process.join()
+            print("\n  streaming=%s: %.2f secs, memory high-water mark %i kB" % \
+                  (streaming, parseTime, maxRSS))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,12 @@ _LumiBased_t_
 Lumi based splitting test.
 """
 
+import random
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Fileset import Fileset
 from WMCore.DataStructs.Job import Job
@@ -14,8 +18,10 @@ from WMCore.DataStructs.Subscription import Subscription
 from WMCore.DataStructs.Workflow import Workflow
 from WMCore.DataStructs.Run import Run
 
+from WMCore.JobSplitting.LumiBased import LumiMask, isGoodLumi, isGoodRun
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 from WMCore.Services.UUID import makeUUID
+from WMCore.WMSpec.WMTask import buildLumiMask
 
 class LumiBasedTest(unittest.TestCase):
     """
@@ -302,5 +308,147 @@ class LumiBasedTest(unittest.TestCase):
         jobs = jobGroups[0].jobs
         self.assertEqual(len(jobs), 3)
 
+    def testD_LumiMask(self):
+        """
+        _LumiMask_
+
+        Verify that the compiled lumi mask agrees with the plain goodRunList
+        checks, including overlapping and invalid ranges.
+        """
+        random.seed(1234)
+        goodRunList = {}
+        for run in range(1, 20):
+            ranges = []
+            for _ in range(random.randint(0, 10)):
+                first = random.randint(1, 200)
+                ranges.append([first, first + random.randint(-2, 20)])
+            goodRunList[str(run)] = ranges
+        goodRunList['25'] = [[1, 5], [7]]
+
+        lumiMask = LumiMask(goodRunList)
+        self.assertTrue(lumiMask)
+        for run in range(0, 30):
+            self.assertEqual(lumiMask.isGoodRun(run), isGoodRun(goodRunList, run))
+            self.assertEqual(isGoodRun(lumiMask, run), isGoodRun(goodRunList, run))
+            goodLumis = []
+            for lumi in range(0, 250):
+                isGood = isGoodLumi(goodRunList, run, lumi)
+                self.assertEqual(lumiMask.isGoodLumi(run, lumi), isGood)
+                self.assertEqual(isGoodLumi(lumiMask, run, lumi), isGood)
+                if isGood:
+                    goodLumis.append(lumi)
+            self.assertEqual(lumiMask.filterLumis(run, range(0, 250)), goodLumis)
+            shuffled = range(0, 250)
+            random.shuffle(shuffled)
+            self.assertEqual(sorted(lumiMask.filterLumis(run, shuffled)), goodLumis)
+
+        runs = lumiMask.filterRuns([Run(25, 1, 3, 6, 7), Run(26, 1), Run(27)])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0].run, 25)
+        self.assertEqual(runs[0].lumis, [1, 3])
+
+        # An empty mask lets everything through
+        for lumiMask in [LumiMask({}), LumiMask(None)]:
+            self.assertFalse(lumiMask)
+            self.assertTrue(lumiMask.isGoodRun(1))
+            self.assertTrue(lumiMask.isGoodLumi(1, 1))
+            self.assertEqual(lumiMask.filterLumis(1, [3, 1]), [3, 1])
+        return
+
+    def testE_LumiMaskSplitting(self):
+        """
+        _LumiMaskSplitting_
+
+        Verify that only the lumis in the mask are assigned to jobs.
+        """
+        splitter = SplitterFactory()
+        testSubscription = self.createSubscription(nFiles = 5, lumisPerFile = 10)
+        jobFactory = splitter(package = "WMCore.DataStructs",
+                              subscription = testSubscription)
+
+        jobGroups = jobFactory(lumis_per_job = 100,
+                               halt_job_on_file_boundaries = False,
+                               splitOnRun = False,
+                               runs = ['1', '3', '7'],
+                               lumis = ['101,103,105,107', '300,300', '700,705'],
+                               performance = self.performanceParams)
+
+        self.assertEqual(len(jobGroups), 1)
+        jobs = jobGroups[0].jobs
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0]['mask'].getRunAndLumis(),
+                         {1: [[101, 103], [105, 107]], 3: [[300, 300]]})
+        self.assertEqual(len(jobs[0]['input_files']), 2)
+        return
+
+    def createLargeSubscription(self, nFiles, nRuns, lumisPerRun, splitAlgo):
+        """
+        _createLargeSubscription_
+
+        Create a subscription with nFiles files spread over nRuns runs, each
+        file holding lumisPerRun consecutive lumis of its run.
+        """
+        baseName = makeUUID()
+        testFileset = Fileset(name = baseName)
+        for i in range(nFiles):
+            newFile = File(lfn = '%s_%i' % (baseName, i), size = 1000,
+                           events = lumisPerRun * 100)
+            run = (i % nRuns) + 1
+            firstLumi = (i / nRuns) * lumisPerRun + 1
+            newFile.addRun(Run(run, *range(firstLumi, firstLumi + lumisPerRun)))
+            newFile.setLocation('blenheim')
+            testFileset.addFile(newFile)
+
+        return Subscription(fileset = testFileset, workflow = self.testWorkflow,
+                            split_algo = splitAlgo, type = "Processing")
+
+    @attr('performance')
+    def testF_LumiMaskPerformance(self):
+        """
+        _LumiMaskPerformance_
+
+        Time the lumi aware splitting algorithms for a fileset of 1000 files
+        with 1000 lumis each, masked by a lumi list with 10 ranges per run,
+        and compare the compiled mask with the plain goodRunList checks.
+        """
+        nFiles = 1000
+        nRuns = 100
+        lumisPerRun = 1000
+        lumisPerRunInDataset = nFiles / nRuns * lumisPerRun
+        runs = []
+        lumis = []
+        for run in range(1, nRuns + 1):
+            runs.append(str(run))
+            ranges = []
+            for first in range(1, lumisPerRunInDataset, lumisPerRunInDataset / 10):
+                ranges.extend([str(first), str(first + lumisPerRunInDataset / 20)])
+            lumis.append(",".join(ranges))
+
+        print("")
+        splitter = SplitterFactory()
+        for splitAlgo, args in [("LumiBased", {'lumis_per_job': 50}),
+                                ("EventAwareLumiBased", {'events_per_job': 5000}),
+                                ("FileBased", {'files_per_job': 10})]:
+            subscription = self.createLargeSubscription(nFiles, nRuns, lumisPerRun, splitAlgo)
+            jobFactory = splitter(package = "WMCore.DataStructs",
+                                  subscription = subscription)
+            startTime = time.time()
+            jobGroups = jobFactory(runs = runs, lumis = lumis,
+                                   performance = self.performanceParams, **args)
+            print("  %s: %i jobs in %.2f secs" % (splitAlgo, len(jobGroups[0].jobs),
+                                                  time.time() - startTime))
+
+        goodRunList = buildLumiMask(runs, lumis)
+        lumiMask = LumiMask(goodRunList)
+        for mask in [goodRunList, lumiMask]:
+            startTime = time.time()
+            for run in range(1, nRuns + 1):
+                for lumi in range(1, lumisPerRunInDataset / 10):
+                    isGoodLumi(mask, run, lumi)
+            print("  %s: %i lumi checks in %.2f secs" % (type(mask).__name__,
+                                                      nRuns * (lumisPerRunInDataset / 10 - 1),
+                                                      time.time() - startTime))
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -273,6 +273,79 @@ class TestChangeState(unittest.TestCase):
         self.assertTrue("1" in testJobADoc["states"])
         return
 
+    def testBulkStateTransitions(self):
+        """
+        _testBulkStateTransitions_
+
+        Verify that the transitions of jobs that are already in couch are
+        recorded in batches, that missing documents are created and that
+        transitions are appended to documents modified by someone else.
+        """
+        self.config.JobStateMachine.transitionBatchSize = 2
+        change = ChangeState(self.config, "changestate_t")
+
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", pnn = "T2_CH_CERN")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = self.taskName)
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow,
+                                        split_algo = "FileBased")
+        testSubscription.create()
+
+        for i in range(5):
+            testFile = File(lfn = "SomeLFN%i" % i, events = 1024, size = 2048,
+                            locations = set(["T2_CH_CERN"]))
+            testFile.create()
+            testFileset.addFile(testFile)
+        testFileset.commit()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+        jobs = jobGroup.jobs
+        self.assertEqual(len(jobs), 5)
+
+        for job in jobs:
+            job["user"] = "sfoulkes"
+            job["group"] = "DMWM"
+            job["taskType"] = "Processing"
+
+        # The last job has a couch record but no document
+        jobs[4]["couch_record"] = str(jobs[4]["id"])
+
+        change.propagate(jobs[:4], "new", "none")
+        change.propagate(jobs, "created", "new")
+        self.assertEqual([x["docs"] for x in change.transitionTimings], [2, 2, 1])
+
+        # Modify a document outside of ChangeState, the transitions must be
+        # appended after the ones it already has
+        conflictDoc = change.jobsdatabase.document(jobs[0]["couch_record"])
+        conflictDoc["states"]["3"] = {"oldstate": "created", "newstate": "created",
+                                      "location": "Agent", "timestamp": 0}
+        change.jobsdatabase.commitOne(conflictDoc)
+        change.propagate(jobs, "executing", "created")
+
+        for (i, job) in enumerate(jobs):
+            jobDoc = change.jobsdatabase.document(job["couch_record"])
+            transitions = [(x["oldstate"], x["newstate"]) for (_, x) in
+                           sorted(jobDoc["states"].items(), key = lambda x: int(x[0]))]
+            if i == 0:
+                self.assertEqual(transitions, [("none", "new"), ("new", "created"),
+                                               ("created", "created"),
+                                               ("created", "executing")])
+            elif i == 4:
+                self.assertEqual(transitions, [("new", "created"), ("created", "executing")])
+            else:
+                self.assertEqual(transitions, [("none", "new"), ("new", "created"),
+                                               ("created", "executing")])
+        return
+
     def testPersist(self):
         """
         _testPersist_
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+_Framing_t_
+
+Unit tests for the batched ProcessPool message framing.
+"""
+
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.File import File
+from WMCore.DataStructs.Job import Job
+from WMCore.DataStructs.Run import Run
+from WMCore.ProcessPool.Framing import isBatchFrame, isCompressedFrame, encodeBatch, decodeBatch
+from WMCore.Services.Requests import JSONRequests
+
+def createJob(jobID, nFiles = 5, nLumis = 50):
+    """
+    _createJob_
+
+    Create a job with nFiles input files of nLumis lumi sections each, like
+    the ones JobCreator hands to its workers.
+    """
+    job = Job(name = "/Workflow/Task/job_%i" % jobID)
+    job["id"] = jobID
+    job["task"] = "/Workflow/Task"
+    job["cache_dir"] = "/data/JobCreator/JobCache/Workflow/Task/JobCollection_1_0/job_%i" % jobID
+    for fileIndex in range(nFiles):
+        inputFile = File(lfn = "/store/data/Run2012A/MinimumBias/RAW/v1/000/%i/%i.root" % (jobID, fileIndex),
+                         size = 2048000000, events = 20000,
+                         checksums = {"cksum": "1234567", "adler32": "abcdef01"},
+                         locations = set(["T1_US_FNAL_Disk", "T2_CH_CERN"]))
+        inputFile.addRun(Run(190000 + fileIndex, *range(1, nLumis + 1)))
+        job.addFile(inputFile)
+    job["mask"].setMaxAndSkipEvents(None, 0)
+    return job
+
+class FramingTest(unittest.TestCase):
+    """
+    _FramingTest_
+
+    Test the batched ProcessPool message framing.
+    """
+    def testFraming(self):
+        """
+        _testFraming_
+
+        Verify that batches survive the round trip, compressed or not, and
+        are never mistaken for JSON messages.
+        """
+        jobs = [createJob(i, nFiles = 2, nLumis = 5) for i in range(3)]
+        for compress in [False, True]:
+            message = encodeBatch(jobs + ["STOP", None], compress = compress)
+            self.assertTrue(isBatchFrame(message))
+            self.assertEqual(isCompressedFrame(message), compress)
+            decoded = decodeBatch(message)
+            self.assertEqual(decoded[3:], ["STOP", None])
+            self.assertEqual(decoded[:3], jobs)
+            self.assertEqual(type(decoded[0]), Job)
+            self.assertEqual(decoded[0]["input_files"][1]["runs"],
+                             jobs[0]["input_files"][1]["runs"])
+
+        self.assertEqual(decodeBatch(encodeBatch([])), [])
+
+        jsonHandler = JSONRequests()
+        for item in ["STOP", {"type": "ERROR"}, [1, 2], 3, None, jobs[0]]:
+            self.assertFalse(isBatchFrame(jsonHandler.encode(item)))
+        self.assertRaises(ValueError, decodeBatch, jsonHandler.encode("STOP"))
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare one JSON message per job with batches of jobs, for the
+        encoding and decoding a job and its result go through.
+        """
+        nJobs = 2000
+        jobs = [createJob(i) for i in range(nJobs)]
+        jsonHandler = JSONRequests()
+
+        startTime = time.time()
+        messages = [jsonHandler.encode(job) for job in jobs]
+        decoded = [jsonHandler.decode(message) for message in messages]
+        jsonTime = time.time() - startTime
+        self.assertEqual(len(decoded), nJobs)
+        print("\n  JSON per job: %i messages, %i bytes, %.2f secs, %.0f jobs/sec" % \
+              (len(messages), sum([len(x) for x in messages]), jsonTime, nJobs / jsonTime))
+
+        for batchSize in [10, 100]:
+            for compress in [False, True]:
+                startTime = time.time()
+                messages = [encodeBatch(jobs[i:i + batchSize], compress)
+                            for i in range(0, nJobs, batchSize)]
+                decoded = []
+                for message in messages:
+                    decoded.extend(decodeBatch(message))
+                batchTime = time.time() - startTime
+                self.assertEqual(len(decoded), nJobs)
+                print("  Batches of %i (compress=%s): %i messages, %i bytes, %.2f secs, %.0f jobs/sec" % \
+                      (batchSize, compress, len(messages), sum([len(x) for x in messages]),
+                       batchTime, nJobs / batchTime))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
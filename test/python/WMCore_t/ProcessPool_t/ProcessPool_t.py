@@ -122,8 +122,39 @@ class ProcessPoolTest(unittest.TestCase):
             self.assertEqual(len(result), len(input),
                              "Error: Wrong number of results returned.")
 
+    def testD_BatchedPool(self):
+        """
+        _testBatchedPool_
 
+        Run a test with multiple workers and batched, compressed messages,
+        sending more batches than the workers can have in flight.
+        """
+        config = self.testInit.getConfiguration()
+        config.Agent.useHeartbeat = False
+        self.testInit.generateWorkDir(config)
 
+        processPool = ProcessPool("ProcessPool_t.ProcessPoolTestWorker",
+                                  totalSlaves = 2,
+                                  componentDir = config.General.workDir,
+                                  namespace = "WMCore_t",
+                                  config = config,
+                                  batchSize = 7, maxInFlight = 1,
+                                  compress = True)
+
+        input = ["COMMAND%s" % i for i in range(100)]
+        processPool.enqueue(input)
+        self.assertTrue(processPool.inFlight <= 2)
+        result = processPool.dequeue(60)
+        result.extend(processPool.dequeue(40))
+
+        self.assertEqual(sorted(result), sorted(input))
+        self.assertEqual(processPool.runningWork, 0)
+        self.assertEqual(processPool.inFlight, 0)
+
+        processPool.enqueue([["One", "Two"]], list = True)
+        self.assertEqual(processPool.dequeue(1), [["One", "Two"]])
+        processPool.close()
+        return
 
 
 if __name__ == "__main__":
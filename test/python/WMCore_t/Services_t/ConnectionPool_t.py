@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+_ConnectionPool_t_
+
+Unit tests for the connection pool shared by the Requests objects, run
+against a local HTTP server standing in for a data service.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import socket
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Services.ConnectionPool import ConnectionPool, getConnectionPool
+from WMCore.Services.Requests import Requests, JSONRequests
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    _KeepAliveHandler_
+
+    Answer requests on kept alive connections, timing out the ones the
+    server is asked to.
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "KeepAliveServer/1.0"
+    sys_version = ""
+    # The headers are written one by one
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.lock.acquire()
+        try:
+            self.server.connections.add(self.client_address)
+            timeout = self.server.timeouts > 0
+            if timeout:
+                self.server.timeouts -= 1
+        finally:
+            self.server.lock.release()
+        if timeout:
+            body = 'Request Timeout'
+            self.send_response(408)
+        else:
+            body = '{"path": "%s"}' % self.path
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class KeepAliveServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    _KeepAliveServer_
+
+    Threaded HTTP server that records the client connections it served.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), KeepAliveHandler)
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.timeouts = 0
+
+class ConnectionPoolTest(unittest.TestCase):
+    """
+    _ConnectionPoolTest_
+
+    Test the connections of the Requests objects are pooled.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Start the local HTTP server and start from an empty pool.
+        """
+        self.server = KeepAliveServer()
+        self.serverThread = threading.Thread(target = self.server.serve_forever)
+        self.serverThread.start()
+        self.url = 'http://127.0.0.1:%i' % self.server.server_address[1]
+        getConnectionPool().clear()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Close the pooled connections and stop the local HTTP server.
+        """
+        getConnectionPool().clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.serverThread.join()
+        return
+
+    def testReuse(self):
+        """
+        _testReuse_
+
+        Verify the Requests objects for a host share their connections.
+        """
+        first = Requests(self.url, {'cachepath': None})
+        second = JSONRequests(self.url, {'cachepath': None})
+        self.assertTrue(first.pool is second.pool)
+        self.assertEqual(first.poolKey(), second.poolKey())
+
+        before = first.connectionStats()
+        for i in range(5):
+            data = first.get('/first%i' % i, decode = False)[0]
+            self.assertEqual(data, '{"path": "/first%i"}' % i)
+            self.assertEqual(second.get('/second%i' % i)[0], {'path': '/second%i' % i})
+        stats = first.connectionStats()
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(stats['opened'] - before['opened'], 1)
+        self.assertEqual(stats['reused'] - before['reused'], 9)
+
+        # Another timeout is another kind of connection
+        third = Requests(self.url, {'cachepath': None, 'timeout': 10})
+        self.assertNotEqual(third.poolKey(), first.poolKey())
+        third.get('/third')
+        self.assertEqual(len(self.server.connections), 2)
+        return
+
+    def testThreads(self):
+        """
+        _testThreads_
+
+        Verify a Requests object can be used by many threads at once.
+        """
+        requests = JSONRequests(self.url, {'cachepath': None})
+        results = []
+        def worker(n):
+            for i in range(20):
+                results.append(requests.get('/thread%i/%i' % (n, i))[0]['path'])
+
+        threads = [threading.Thread(target = worker, args = (n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results),
+                         sorted(['/thread%i/%i' % (n, i) for n in range(8) for i in range(20)]))
+        self.assertTrue(len(self.server.connections) <= 8)
+        self.assertTrue(requests.connectionStats()['idle'] <= 8)
+        return
+
+    def testLimits(self):
+        """
+        _testLimits_
+
+        Verify idle connections are closed when there are too many of them
+        or they have been idle for too long.
+        """
+        requests = Requests(self.url, {'cachepath': None})
+        pool = ConnectionPool(maxSize = 1, idleTimeout = 0.2)
+        requests.pool = pool
+        key = requests.poolKey()
+
+        first, reused = pool.checkout(key, requests._getURLOpener)
+        self.assertFalse(reused)
+        second, reused = pool.checkout(key, requests._getURLOpener)
+        self.assertFalse(first is second)
+        pool.checkin(key, first)
+        pool.checkin(key, second)
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+        self.assertTrue(pool.checkout(key, requests._getURLOpener)[0] is first)
+        pool.checkin(key, first)
+        time.sleep(0.3)
+        self.assertFalse(pool.checkout(key, requests._getURLOpener)[0] is first)
+        self.assertEqual(pool.stats()['expired'], 1)
+        self.assertEqual(pool.stats()['idle'], 0)
+        return
+
+    def testRetry(self):
+        """
+        _testRetry_
+
+        Verify requests are retried on timeouts and connection errors, with
+        a backoff.
+        """
+        requests = Requests(self.url, {'cachepath': None, 'retry_backoff': 0.1})
+        pool = ConnectionPool()
+        requests.pool = pool
+
+        self.server.timeouts = 2
+        self.assertEqual(requests.get('/retried')[1], 200)
+        self.assertEqual(pool.stats()['retries'], 2)
+
+        self.server.timeouts = 3
+        self.assertRaises(Exception, requests.get, '/timeout')
+        self.assertEqual(pool.stats()['failures'], 0)
+
+        badRequests = Requests('http://127.0.0.1:1', {'cachepath': None, 'retry_backoff': 0.1})
+        badRequests.pool = pool
+        startTime = time.time()
+        self.assertRaises(socket.error, badRequests.get, '/nowhere')
+        self.assertTrue(time.time() - startTime >= 0.3)
+        self.assertEqual(pool.stats()['failures'], 1)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare many short lived Requests objects, as made by the Services of
+        a component, with and without pooled connections.
+        """
+        nRequests = 500
+        for maxSize in [0, 10]:
+            pool = ConnectionPool(maxSize = maxSize)
+            self.server.connections = set()
+            startTime = time.time()
+            for i in range(nRequests):
+                requests = JSONRequests(self.url, {'cachepath': None})
+                requests.pool = pool
+                requests.get('/dataset%i' % i)
+            elapsed = time.time() - startTime
+            stats = pool.stats()
+            print("\n  %i requests, pool size %i: %.3f secs, %i connections opened, %i reused" % \
+                  (nRequests, maxSize, elapsed, stats['opened'], stats['reused']))
+            pool.clear()
+        return
+
+if __name__ == '__main__':
+    unittest.main()
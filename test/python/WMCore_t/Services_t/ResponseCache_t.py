@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""
+_ResponseCache_t_
+
+Unit tests for the response cache of the Services, the conditional requests
+run against a local HTTP server standing in for a data service.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Services.ConnectionPool import getConnectionPool
+from WMCore.Services.ResponseCache import ResponseCache, getResponseCache, META_SUFFIX
+from WMCore.Services.Service import Service
+
+class DatasetHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    _DatasetHandler_
+
+    Serve a large document with an ETag, answering 304 to a request for an
+    unchanged one.
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "DatasetServer/1.0"
+    sys_version = ""
+    # The headers are written one by one
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        etag = '"%i"' % self.server.version
+        if self.headers.get('If-None-Match') == etag:
+            self.server.notModified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = self.server.body % self.server.version
+        self.server.bytesSent += len(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class DatasetServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    _DatasetServer_
+
+    Threaded HTTP server counting what it sent.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), DatasetHandler)
+        self.body = 'version %i ' + 'x' * 100000
+        self.version = 1
+        self.notModified = 0
+        self.bytesSent = 0
+
+class ResponseCacheTest(unittest.TestCase):
+    """
+    _ResponseCacheTest_
+
+    Test the response cache on its own and behind a Service.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a cache directory and start the local HTTP server.
+        """
+        self.cacheDir = tempfile.mkdtemp()
+        self.server = DatasetServer()
+        self.serverThread = threading.Thread(target = self.server.serve_forever)
+        self.serverThread.start()
+        self.url = 'http://127.0.0.1:%i' % self.server.server_address[1]
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Stop the local HTTP server and remove the cache directory.
+        """
+        getConnectionPool().clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.serverThread.join()
+        shutil.rmtree(self.cacheDir, ignore_errors = True)
+        return
+
+    def testMemory(self):
+        """
+        _testMemory_
+
+        Verify the memory tier keeps the most recently used responses that
+        fit in it.
+        """
+        cache = ResponseCache(self.cacheDir, memorySize = 250, diskSize = 10000)
+        paths = [os.path.join(self.cacheDir, 'file%i' % i) for i in range(4)]
+        for path in paths:
+            cache.store(path, path[-1] * 60, time.time() + 60)
+        self.assertEqual(cache.memory.keys(), paths)
+
+        # Using the first one saves it from the next drop
+        self.assertEqual(cache.open(paths[0]).read(), '0' * 60)
+        cache.store(os.path.join(self.cacheDir, 'file4'), '4' * 60, time.time() + 60)
+        self.assertFalse(paths[1] in cache.memory)
+        self.assertTrue(paths[0] in cache.memory)
+        self.assertTrue(cache.memoryUsed <= 250)
+
+        # Dropped from memory, still on disk
+        f = cache.open(paths[1])
+        self.assertEqual(f.read(), '1' * 60)
+        self.assertEqual(f.name, paths[1])
+
+        # Too big to be kept in memory
+        cache.store(paths[2], 'y' * 100, time.time() + 60)
+        self.assertFalse(paths[2] in cache.memory)
+        self.assertEqual(cache.open(paths[2]).read(), 'y' * 100)
+
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 6)
+        self.assertEqual(stats['memory_hits'], 1)
+        self.assertEqual(stats['memory_bytes'], cache.memoryUsed)
+
+        # Cache files written behind the cache's back aren't served from memory
+        with open(paths[0], 'w') as f:
+            f.write('changed')
+        self.assertEqual(cache.open(paths[0]).read(), 'changed')
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+        self.assertEqual(cache.open(paths[0]).read(), 'changed')
+        self.assertEqual(cache.stats()['memory_hits'], 2)
+        return
+
+    def testDisk(self):
+        """
+        _testDisk_
+
+        Verify the cache files are evicted least recently used first, and
+        that the metadata survives the process.
+        """
+        cache = ResponseCache(self.cacheDir, memorySize = 1000, diskSize = 250)
+        paths = [os.path.join(self.cacheDir, 'file%i' % i) for i in range(5)]
+        expires = time.time() + 600
+        for path in paths[:4]:
+            cache.store(path, 'z' * 60, expires, {'etag': '"%s"' % path[-1]})
+            time.sleep(0.01)
+        self.assertEqual(int(os.path.getmtime(paths[0])), int(expires))
+
+        cache.open(paths[0])
+        cache.store(paths[4], 'z' * 60, expires)
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertFalse(os.path.exists(paths[1] + META_SUFFIX))
+        for path in [paths[0], paths[2], paths[3], paths[4]]:
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['disk_bytes'], 240)
+
+        self.assertEqual(cache.validators(paths[2]), {'If-None-Match': '"2"'})
+        self.assertEqual(cache.validators(paths[1]), {})
+
+        # A new process picks up the cache files
+        other = ResponseCache(self.cacheDir, memorySize = 1000, diskSize = 250)
+        self.assertEqual(other.diskUsed, 240)
+        self.assertEqual(other.validators(paths[3]), {'If-None-Match': '"3"'})
+
+        other.remove(paths[3])
+        self.assertFalse(os.path.exists(paths[3] + META_SUFFIX))
+        self.assertEqual(other.validators(paths[3]), {})
+
+        shared = getResponseCache(self.cacheDir, 100, 300)
+        self.assertTrue(getResponseCache(self.cacheDir, 200, 200) is shared)
+        self.assertEqual((shared.memorySize, shared.diskSize), (200, 300))
+        return
+
+    def testConditionalRequests(self):
+        """
+        _testConditionalRequests_
+
+        Verify a Service revalidates its expired cache files instead of
+        downloading them again.
+        """
+        service = Service({'endpoint': self.url, 'cachepath': self.cacheDir,
+                           'cacheduration': 0, 'logger': logging.getLogger()})
+        body = service.refreshCache('dataset', '/dataset').read()
+        self.assertEqual(body, self.server.body % 1)
+        self.assertEqual(self.server.notModified, 0)
+
+        for _ in range(3):
+            self.assertEqual(service.refreshCache('dataset', '/dataset').read(), body)
+        self.assertEqual(self.server.notModified, 3)
+        self.assertEqual(self.server.bytesSent, len(body))
+
+        self.server.version = 2
+        self.assertEqual(service.refreshCache('dataset', '/dataset').read(),
+                         self.server.body % 2)
+
+        stats = service.cacheStats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['revalidated'], 3)
+        self.assertEqual(stats['bytes_saved'], 3 * len(body))
+        self.assertEqual(stats['bytes_downloaded'], 2 * len(body))
+
+        # A fresh cache file isn't asked for
+        service['cacheduration'] = 1
+        service.forceRefresh('dataset', '/dataset')
+        service.refreshCache('dataset', '/dataset').read()
+        self.assertEqual(service.cacheStats()['hits'], 1)
+        self.assertEqual(self.server.notModified, 3)
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Measure the traffic and time of refreshing an unchanged document with
+        and without the conditional requests.
+        """
+        nRequests = 50
+        service = Service({'endpoint': self.url, 'cachepath': self.cacheDir,
+                           'cacheduration': 0, 'logger': logging.getLogger()})
+        path = service.cacheFileName('dataset')
+
+        startTime = time.time()
+        for _ in range(nRequests):
+            service.clearCache('dataset')
+            service.refreshCache('dataset', '/dataset').read()
+        plainTime = time.time() - startTime
+        plainBytes = self.server.bytesSent
+        print("\n  %i refreshes without validators: %.3f secs, %i bytes downloaded" % \
+              (nRequests, plainTime, plainBytes))
+
+        self.server.bytesSent = 0
+        startTime = time.time()
+        for _ in range(nRequests):
+            service.refreshCache('dataset', '/dataset').read()
+        conditionalTime = time.time() - startTime
+        stats = service.cacheStats()
+        print("  %i refreshes with conditional GETs: %.3f secs, %i bytes downloaded, %i bytes saved" % \
+              (nRequests, conditionalTime, self.server.bytesSent, stats['bytes_saved']))
+        self.assertTrue(os.path.exists(path))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,7 +34,8 @@ class SlowServer(object):
 
 class CrappyRequest(Requests):
     def makeRequest(self, uri=None, data={}, verb='GET', incoming_headers={},
-                     encoder=True, decoder=True, contentType=None):
+                     encoder=True, decoder=True, contentType=None,
+                     responseHeaders=None):
         # METAL \m/
         raise BadStatusLine(666)
 
@@ -3,9 +3,18 @@
 Test case for SiteDB
 """
 
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.Services.SiteDB.SiteDB import SiteDBJSON
+import WMCore.Services.SiteDB.SiteDB
 
 class SiteDBTest(unittest.TestCase):
     """
@@ -117,5 +126,116 @@ class SiteDBTest(unittest.TestCase):
         self.failUnless(result == [u'cmssrm.fnal.gov', u'cmssrmdisk.fnal.gov'])
         
 
+class SiteTopologyTest(unittest.TestCase):
+    """
+    Unit tests for the SiteDB topology, run on SiteDB data left in the cache
+    """
+    siteNames = [['CERN', 'cms', 'T1_CH_CERN'], ['CERN', 'cms', 'T2_CH_CERN'],
+                 ['CERN', 'psn', 'T2_CH_CERN'], ['CERN', 'phedex', 'T2_CH_CERN'],
+                 ['FNAL', 'cms', 'T1_US_FNAL'], ['FNAL', 'psn', 'T1_US_FNAL'],
+                 ['FNAL', 'phedex', 'T1_US_FNAL_Disk'], ['FNAL', 'phedex', 'T1_US_FNAL_MSS'],
+                 ['FNAL', 'phedex', 'T1_US_FNAL_Buffer']]
+    siteResources = [['CERN', 'SE', 'srm-eoscms.cern.ch', 'y'], ['CERN', 'CE', 'ce.cern.ch', 'y'],
+                     ['FNAL', 'SE', 'cmssrm.fnal.gov', 'y'], ['FNAL', 'SE', 'cmssrmdisk.fnal.gov', 'n'],
+                     ['FNAL', 'CE', 'cmsosgce.fnal.gov', 'y']]
+    dataProcessing = [['T1_US_FNAL_Disk', 'T1_US_FNAL'], ['T2_CH_CERN', 'T2_CH_CERN'],
+                      ['T1_US_FNAL_Disk', 'T3_US_FNALLPC']]
+
+    def setUp(self):
+        """
+        Write the SiteDB data to the cache files
+        """
+        self.cacheDir = tempfile.mkdtemp()
+        self.mySiteDB = SiteDBJSON({'cachepath': self.cacheDir, 'cacheduration': 1,
+                                    'logger': logging.getLogger()})
+        self.writeCache('site-names.json', ['site_name', 'type', 'alias'], self.siteNames)
+        self.writeCache('site-resources.json', ['site_name', 'type', 'fqdn', 'is_primary'],
+                        self.siteResources)
+        self.writeCache('data-processing.json', ['phedex_name', 'psn_name'], self.dataProcessing)
+        WMCore.Services.SiteDB.SiteDB._topologies.clear()
+
+    def tearDown(self):
+        """
+        Remove the cache files
+        """
+        WMCore.Services.SiteDB.SiteDB._topologies.clear()
+        shutil.rmtree(self.cacheDir)
+
+    def writeCache(self, filename, columns, rows):
+        """
+        Write a cache file that stays valid for a day
+        """
+        cacheFile = self.mySiteDB.cacheFileName(filename)
+        if not os.path.isdir(os.path.dirname(cacheFile)):
+            os.makedirs(os.path.dirname(cacheFile))
+        with open(cacheFile, 'w') as f:
+            json.dump({'desc': {'columns': columns}, 'result': rows}, f)
+        validUntil = time.time() + 86400
+        os.utime(cacheFile, (validUntil, validUntil))
+
+    def testLookups(self):
+        """
+        Test the lookups against the topology
+        """
+        self.assertEqual(self.mySiteDB.seToPNNs('cmssrm.fnal.gov'),
+                         ['T1_US_FNAL_Disk', 'T1_US_FNAL_MSS', 'T1_US_FNAL_Buffer'])
+        self.assertEqual(self.mySiteDB.seToPNNs('unknown.se'), [])
+        self.assertEqual(self.mySiteDB.seToCMSName('srm-eoscms.cern.ch'), ['T1_CH_CERN', 'T2_CH_CERN'])
+        self.assertEqual(self.mySiteDB.ceToCMSName('cmsosgce.fnal.gov'), ['T1_US_FNAL'])
+        self.assertEqual(self.mySiteDB.cmsNametoPhEDExNode('T2_CH_CERN'), ['T2_CH_CERN'])
+        self.assertEqual(self.mySiteDB.cmsNametoPhEDExNode('T2_XX_Nowhere'), None)
+        self.assertEqual(self.mySiteDB.cmsNametoSE('T1_US*'), ['cmssrm.fnal.gov', 'cmssrmdisk.fnal.gov'])
+        self.assertEqual(self.mySiteDB.PNNtoPSN('T1_US_FNAL_Disk'), ['T1_US_FNAL', 'T3_US_FNALLPC'])
+        self.assertEqual(self.mySiteDB.PNNtoPSN('T1_US_FNAL_Tape'), [])
+        self.assertEqual(self.mySiteDB.PSNtoPNN('T2_CH_CERN'), ['T2_CH_CERN'])
+        self.assertEqual(sorted(self.mySiteDB.PNNstoPSNs(['T1_US_FNAL_Disk', 'T2_CH_CERN', 'T1_US_FNAL_MSS'])),
+                         ['T1_US_FNAL', 'T2_CH_CERN', 'T3_US_FNALLPC'])
+        self.assertEqual(self.mySiteDB.PSNtoPNNMap('T1'), {'T1_US_FNAL': set(['T1_US_FNAL_Disk'])})
+        self.assertEqual(self.mySiteDB.getAllSENames(),
+                         ['srm-eoscms.cern.ch', 'cmssrm.fnal.gov', 'cmssrmdisk.fnal.gov'])
+        self.assertEqual(self.mySiteDB.getAllPhEDExNodeNames(excludeBuffer = True),
+                         ['T2_CH_CERN', 'T1_US_FNAL_Disk', 'T1_US_FNAL_MSS'])
+
+        # Results can be changed without changing the topology
+        self.mySiteDB.PNNtoPSN('T1_US_FNAL_Disk').append('T2_XX_Nowhere')
+        self.assertEqual(self.mySiteDB.PNNtoPSN('T1_US_FNAL_Disk'), ['T1_US_FNAL', 'T3_US_FNALLPC'])
+
+    def testReload(self):
+        """
+        Test that the topology is shared and only rebuilt when it expires
+        """
+        topology = self.mySiteDB.topology()
+        otherSiteDB = SiteDBJSON({'cachepath': self.cacheDir, 'cacheduration': 1,
+                                  'logger': logging.getLogger()})
+        self.assertTrue(otherSiteDB.topology() is topology)
+
+        # Changes in SiteDB are only seen once the topology expires
+        self.writeCache('data-processing.json', ['phedex_name', 'psn_name'],
+                        [['T1_US_FNAL_Disk', 'T1_US_FNAL']])
+        self.assertEqual(self.mySiteDB.PNNtoPSN('T1_US_FNAL_Disk'), ['T1_US_FNAL', 'T3_US_FNALLPC'])
+        topology.expires = time.time() - 1
+        self.assertEqual(self.mySiteDB.PNNtoPSN('T1_US_FNAL_Disk'), ['T1_US_FNAL'])
+        self.assertFalse(self.mySiteDB.topology() is topology)
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        Compare reading the cache files and scanning them with the topology
+        """
+        nLookups = 2000
+        pnns = [x[0] for x in self.dataProcessing]
+
+        startTime = time.time()
+        for i in range(nLookups):
+            self.mySiteDB._dataProcessing(pnn = pnns[i % len(pnns)])
+        scanTime = time.time() - startTime
+
+        startTime = time.time()
+        for i in range(nLookups):
+            self.mySiteDB.PNNtoPSN(pnns[i % len(pnns)])
+        topologyTime = time.time() - startTime
+        print("\n  %i PNNtoPSN lookups: cache file scan %.1f usecs/lookup, topology %.1f usecs/lookup" % \
+              (nLookups, scanTime * 1e6 / nLookups, topologyTime * 1e6 / nLookups))
+
 if __name__ == '__main__':
     unittest.main()
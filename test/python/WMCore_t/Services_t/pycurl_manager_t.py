@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+_pycurl_manager_t_
+
+Unit tests for the concurrent requests of the pycurl RequestHandler, run
+against a local HTTP server standing in for a data service.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import httplib
+import json
+import threading
+import time
+import unittest
+import urlparse
+
+import pycurl
+from nose.plugins.attrib import attr
+
+from WMCore.Services.pycurl_manager import RequestHandler
+
+class BlockHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    _BlockHandler_
+
+    Answer /blocks?block=<name> after a delay, like a DBS or PhEDEx lookup.
+    """
+    protocol_version = "HTTP/1.1"
+    # ResponseHeader takes any line with HTTP in it for the status line
+    server_version = "BlockServer/1.0"
+    sys_version = ""
+    # The headers are written one by one
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        block = query.get('block', [''])[0]
+        time.sleep(self.server.delay)
+        if block.startswith('missing'):
+            body = 'No such block'
+            self.send_response(404)
+        else:
+            body = json.dumps([{'block_name': block, 'files': 10}])
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.connections.add(self.client_address)
+
+    def log_message(self, *args):
+        pass
+
+class BlockServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    _BlockServer_
+
+    Threaded HTTP server that records the client connections it served.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), BlockHandler)
+        self.delay = delay
+        self.connections = set()
+
+class PycurlManagerTest(unittest.TestCase):
+    """
+    _PycurlManagerTest_
+
+    Test the concurrent requests of the pycurl RequestHandler.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Start the local HTTP server.
+        """
+        self.server = BlockServer(delay = 0.05)
+        self.serverThread = threading.Thread(target = self.server.serve_forever)
+        self.serverThread.start()
+        self.url = 'http://127.0.0.1:%i/blocks' % self.server.server_address[1]
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Stop the local HTTP server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.serverThread.join()
+        return
+
+    def testMultiFetch(self):
+        """
+        _testMultiFetch_
+
+        Verify that requests run concurrently over a bounded number of
+        connections and that failures come back as errors.
+        """
+        handler = RequestHandler(config = {'max_connections': 5})
+        parray = [{'block': 'block%i' % i} for i in range(20)]
+        parray.append({'block': 'missing'})
+
+        startTime = time.time()
+        results = list(handler.multi_fetch(self.url, parray, decode = True))
+        elapsed = time.time() - startTime
+
+        self.assertEqual(sorted([x.index for x in results]), range(21))
+        # 21 requests of 0.05 secs, 5 at a time
+        self.assertTrue(elapsed < 21 * 0.05 * 0.75)
+        self.assertTrue(len(self.server.connections) <= 5)
+        for result in results:
+            self.assertEqual(result.params, parray[result.index])
+            self.assertTrue(result.timing['total'] >= 0.05)
+            if result.index < 20:
+                self.assertEqual(result.error, None)
+                self.assertEqual(result.header.status, 200)
+                self.assertEqual(result.data, [{'block_name': 'block%i' % result.index, 'files': 10}])
+            else:
+                self.assertTrue(isinstance(result.error, httplib.HTTPException))
+                self.assertEqual(result.error.status, 404)
+                self.assertEqual(result.data, 'No such block')
+
+        # Connection failures
+        badURL = 'http://127.0.0.1:1/blocks'
+        results = list(handler.multi_fetch(badURL, [{'block': 'block1'}]))
+        self.assertEqual(len(results), 1)
+        self.assertTrue(isinstance(results[0].error, pycurl.error))
+        return
+
+    def testMultiRequest(self):
+        """
+        _testMultiRequest_
+
+        Verify multirequest yields the records of all the requests.
+        """
+        handler = RequestHandler()
+        parray = [{'block': 'block%i' % i} for i in range(10)]
+        records = list(handler.multirequest(self.url, parray, max_connections = 3))
+        self.assertEqual(sorted([x['block'] for x in records]),
+                         sorted([x['block'] for x in parray]))
+        for record in records:
+            self.assertEqual(record['block_name'], record['block'])
+
+        self.assertRaises(httplib.HTTPException, list,
+                          handler.multirequest(self.url, [{'block': 'missing'}]))
+        return
+
+    @attr('performance')
+    def testPerformance(self):
+        """
+        _testPerformance_
+
+        Compare looking up blocks one request at a time with the concurrent
+        requests, for different numbers of connections.
+        """
+        nBlocks = 200
+        parray = [{'block': 'block%i' % i} for i in range(nBlocks)]
+        handler = RequestHandler()
+
+        startTime = time.time()
+        for params in parray:
+            handler.request(self.url, params, decode = True)
+        serialTime = time.time() - startTime
+        print("\n  %i lookups with %.2f secs latency, one at a time: %.2f secs" % \
+              (nBlocks, self.server.delay, serialTime))
+
+        for maxConnections in [1, 10, 50]:
+            self.server.connections = set()
+            startTime = time.time()
+            results = list(handler.multi_fetch(self.url, parray, decode = True,
+                                               max_connections = maxConnections))
+            multiTime = time.time() - startTime
+            self.assertEqual(len([x for x in results if x.error == None]), nBlocks)
+            print("  multi_fetch, max_connections=%i: %.2f secs, %i connections opened" % \
+                  (maxConnections, multiTime, sum([x.new_connections for x in results])))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
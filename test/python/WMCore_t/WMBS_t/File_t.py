@@ -10,7 +10,7 @@ import logging
 import threading
 
 from WMCore.DAOFactory         import DAOFactory
-from WMCore.WMBS.File          import File, addFilesToWMBSInBulk
+from WMCore.WMBS.File          import File, addFilesToWMBSInBulk, getAncestorsInBulk, getDescendantsInBulk
 from WMCore.WMBS.Fileset       import Fileset
 from WMCore.WMBS.Workflow      import Workflow
 from WMCore.WMBS.Subscription  import Subscription
@@ -704,6 +704,52 @@ class FileTest(unittest.TestCase):
 
         return
 
+    def testGetAncestorsInBulk(self):
+        """
+        _testGetAncestorsInBulk_
+
+        Create two families of files and verify that the ancestors and
+        descendants of several files are found at once.
+        """
+        testFiles = {}
+        for name in ["A", "B", "C", "D", "E", "X", "Y", "Z"]:
+            testFiles[name] = File(lfn = "/this/is/a/lfn%s" % name, size = 1024, events = 10,
+                                   checksums = {'cksum': 1}, locations = "T1_US_FNAL_Disk")
+            testFiles[name].create()
+
+        testFiles["A"].addParent(lfn = "/this/is/a/lfnB")
+        testFiles["A"].addParent(lfn = "/this/is/a/lfnC")
+        testFiles["B"].addParent(lfn = "/this/is/a/lfnD")
+        testFiles["C"].addParent(lfn = "/this/is/a/lfnD")
+        testFiles["D"].addParent(lfn = "/this/is/a/lfnE")
+        testFiles["X"].addParent(lfn = "/this/is/a/lfnY")
+        testFiles["Y"].addParent(lfn = "/this/is/a/lfnZ")
+
+        fileIDs = [testFiles[name]["id"] for name in ["A", "B", "X", "E"]]
+        ancestors = getAncestorsInBulk(fileIDs, level = 2, type = "lfn")
+        self.assertEqual(ancestors, {testFiles["A"]["id"]: ["/this/is/a/lfnD"],
+                                     testFiles["B"]["id"]: ["/this/is/a/lfnE"],
+                                     testFiles["X"]["id"]: ["/this/is/a/lfnZ"],
+                                     testFiles["E"]["id"]: []})
+
+        ancestors = getAncestorsInBulk(fileIDs, level = 1)
+        self.assertEqual(ancestors[testFiles["A"]["id"]],
+                         sorted([testFiles["B"]["id"], testFiles["C"]["id"]]))
+        self.assertEqual(ancestors[testFiles["E"]["id"]], [])
+
+        ancestors = getAncestorsInBulk(fileIDs, level = 3, type = "file")
+        self.assertEqual(len(ancestors[testFiles["A"]["id"]]), 1)
+        self.assertEqual(ancestors[testFiles["A"]["id"]][0]["lfn"], "/this/is/a/lfnE")
+        self.assertEqual(ancestors[testFiles["A"]["id"]][0]["checksums"], {'cksum': '1'})
+        self.assertEqual(ancestors[testFiles["X"]["id"]], [])
+
+        descendants = getDescendantsInBulk([testFiles["D"]["id"], testFiles["Z"]["id"]],
+                                           level = 2, type = "lfn")
+        self.assertEqual(descendants, {testFiles["D"]["id"]: ["/this/is/a/lfnA"],
+                                       testFiles["Z"]["id"]: ["/this/is/a/lfnX"]})
+        self.assertEqual(getAncestorsInBulk([], level = 2, type = "lfn"), {})
+        return
+
     def testGetBulkLocations(self):
         """
         _testGetBulkLocations_
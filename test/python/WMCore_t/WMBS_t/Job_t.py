@@ -638,6 +638,13 @@ class JobTest(unittest.TestCase):
         assert len(goldenIDs) == 0, \
                "Error: Jobs missing: %s" % len(goldenIDs)
 
+        # The streamed jobs are the same
+        streamedJobs = getJobsAction.execute(state = "complete",
+                                             conn = myThread.transaction.conn,
+                                             transaction = True, stream = True)
+        self.assertEqual(sorted([(x["id"], x["fwjr_path"]) for x in streamedJobs]),
+                         sorted([(x["id"], x["fwjr_path"]) for x in jobs]))
+
         return
 
     def testFailJobInput(self):
@@ -11,6 +11,8 @@ import random
 import threading
 import time
 
+from sqlalchemy import event
+
 from WMCore.DAOFactory import DAOFactory
 from WMQuality.TestInit import TestInit
 
@@ -1551,6 +1553,64 @@ class SubscriptionTest(unittest.TestCase):
         testFileF.delete()
         return
 
+    def testFilesOfStatusQueryCount(self):
+        """
+        _testFilesOfStatusQueryCount_
+
+        Verify that filesOfStatus() loads the files, their checksums,
+        locations and run/lumi information with a number of queries that
+        doesn't depend on the number of files.
+        """
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Simon",
+                                name = "wf001", task = 'Test')
+        testWorkflow.create()
+
+        queryCounts = []
+        for nFiles in [5, 50]:
+            testFileset = Fileset(name = "TestFileset%i" % nFiles)
+            testFileset.create()
+            for i in range(nFiles):
+                testFile = File(lfn = "/this/is/a/lfn%i_%i" % (nFiles, i), size = 1024,
+                                events = 20, checksums = {"cksum": str(i), "adler32": "abc"},
+                                locations = set(["goodse.cern.ch"]))
+                testFile.addRun(Run(i, *[45, 46]))
+                testFile.create()
+                testFileset.addFile(testFile)
+            testFileset.commit()
+
+            testSubscription = Subscription(fileset = testFileset,
+                                            workflow = testWorkflow)
+            testSubscription.create()
+            testSubscription.acquireFiles()
+
+            queries = []
+            def countQuery(conn, cursor, statement, parameters, context, executemany):
+                queries.append(statement)
+
+            myThread = threading.currentThread()
+            event.listen(myThread.dbi.engine, "before_cursor_execute", countQuery)
+            try:
+                files = testSubscription.filesOfStatus("Acquired", loadLocations = True,
+                                                       loadRunLumis = True)
+            finally:
+                event.remove(myThread.dbi.engine, "before_cursor_execute", countQuery)
+
+            self.assertEqual(len(files), nFiles)
+            for testFile in files:
+                i = int(testFile["lfn"].split("_")[-1])
+                self.assertEqual(testFile["checksums"], {"cksum": str(i), "adler32": "abc"})
+                self.assertEqual(testFile["locations"], set(["goodse.cern.ch"]))
+                self.assertEqual(len(testFile["runs"]), 1)
+                run = list(testFile["runs"])[0]
+                self.assertEqual(run.run, i)
+                self.assertEqual(sorted(run.lumis), [45, 46])
+            queryCounts.append(len(queries))
+
+        # Acquired files, file details, checksums, locations and run/lumis
+        self.assertEqual(queryCounts[0], queryCounts[1])
+        self.assertTrue(queryCounts[1] <= 5, "Error: %i queries" % queryCounts[1])
+        return
+
     def testJobs(self):
         """
         _testJobs_
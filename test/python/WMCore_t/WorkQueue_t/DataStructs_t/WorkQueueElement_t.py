@@ -73,5 +73,20 @@ class WorkQueueElementTest(unittest.TestCase):
         self.assertEqual('something_new', ele.id)
         self.assertNotEqual(before_id, ele.id)
 
+    def testPossibleSites(self):
+        """possibleSites agrees with passesSiteRestriction"""
+        sites = ['sitea', 'siteb', 'sitec', 'sited']
+        for inputs, whitelist, blacklist, pileup in itertools.product(Inputs,
+                                                                     [[], ['sitea', 'sitec']],
+                                                                     [[], ['sitea']],
+                                                                     [{}, {'/pileup/RAW' : ['sitea', 'sited']}]):
+            ele = WorkQueueElement(RequestName = 'test', Inputs = inputs,
+                                   SiteWhitelist = whitelist, SiteBlacklist = blacklist,
+                                   PileupData = pileup)
+            self.assertEqual(ele.possibleSites(sites),
+                             set([x for x in sites if ele.passesSiteRestriction(x)]))
+        ele['NoLocationUpdate'] = True
+        self.assertEqual(ele.possibleSites(sites), set(sites))
+
 if __name__ == '__main__':
     unittest.main()
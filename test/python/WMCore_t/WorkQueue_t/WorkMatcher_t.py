@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+    WorkMatcher unit tests
+"""
+
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import WorkQueueElement
+from WMCore.WorkQueue.WorkMatcher import WorkMatcher
+
+
+def naiveMatch(elements, thresholds, siteJobCounts):
+    """Match elements to sites checking every site for every element"""
+    matches = []
+    for element in elements:
+        prio = element['Priority']
+        sites = thresholds.keys()
+        random.shuffle(sites)
+        for site in sites:
+            if element.passesSiteRestriction(site):
+                curJobCount = sum(map(lambda x : x[1] if x[0] >= prio else 0, siteJobCounts.get(site, {}).items()))
+                if curJobCount < thresholds[site]:
+                    matches.append(element)
+                    siteJobCounts.setdefault(site, {})
+                    siteJobCounts[site][prio] = siteJobCounts[site].setdefault(prio, 0) + element['Jobs']
+                    break
+    return matches
+
+
+def indexedMatch(elements, thresholds, siteJobCounts):
+    """Match elements to sites with the WorkMatcher"""
+    matches = []
+    matcher = WorkMatcher(thresholds, siteJobCounts, [x['Priority'] for x in elements])
+    for element in elements:
+        if matcher.allFull(element['Priority']):
+            continue
+        if matcher.match(element['Priority'], element.possibleSites(matcher.sites),
+                         element['Jobs']):
+            matches.append(element)
+    return matches
+
+
+class WorkMatcherTest(unittest.TestCase):
+
+    def testJobCount(self):
+        """Jobs of greater or equal priority are counted"""
+        matcher = WorkMatcher({'sitea' : 100, 'siteb' : 100},
+                              {'sitea' : {1 : 10, 5 : 20, 10 : 30}}, [7])
+        self.assertEqual(matcher.jobCount('sitea', 1), 60)
+        self.assertEqual(matcher.jobCount('sitea', 5), 50)
+        self.assertEqual(matcher.jobCount('sitea', 7), 30)
+        self.assertEqual(matcher.jobCount('sitea', 11), 0)
+        self.assertEqual(matcher.jobCount('siteb', 1), 0)
+        matcher.addJobs('sitea', 7, 5)
+        self.assertEqual(matcher.jobCount('sitea', 6), 35)
+        self.assertEqual(matcher.jobCount('sitea', 3), 55)
+
+    def testMatch(self):
+        """Elements go to sites with free slots and counts are updated"""
+        thresholds = {'sitea' : 10, 'siteb' : 20}
+        siteJobCounts = {'sitea' : {10 : 5}}
+        matcher = WorkMatcher(thresholds, siteJobCounts, [10, 5])
+        self.assertEqual(matcher.match(10, set(['sitea']), 5), 'sitea')
+        self.assertEqual(siteJobCounts['sitea'][10], 10)
+        self.assertEqual(matcher.match(10, set(['sitea']), 5), None)
+        self.assertFalse(matcher.allFull(10))
+        self.assertEqual(matcher.match(10, set(['sitea', 'siteb', 'sitec']), 15), 'siteb')
+        self.assertEqual(siteJobCounts['siteb'], {10 : 15})
+        self.assertEqual(matcher.match(10, set(['siteb']), 15), 'siteb')
+        self.assertEqual(matcher.match(10, set(['siteb']), 15), None)
+        self.assertTrue(matcher.allFull(5))
+        self.assertFalse(matcher.allFull(11))
+        # Higher priority work still fits
+        self.assertEqual(matcher.match(20, set(['sitea']), 5), 'sitea')
+        self.assertEqual(siteJobCounts['sitea'], {10 : 10, 20 : 5})
+
+    def testSameMatches(self):
+        """Elements matched are the same as checking every site"""
+        sites = ['site%s' % x for x in range(10)]
+        thresholds = dict([(x, 100) for x in sites])
+        elements = []
+        for i in range(200):
+            elements.append(WorkQueueElement(RequestName = 'test%s' % i, Priority = 100 - i / 10,
+                                             Jobs = 10, SiteWhitelist = [sites[i % 10]]))
+        naive = naiveMatch(elements, thresholds, {})
+        indexed = indexedMatch(elements, thresholds, {})
+        self.assertEqual(len(naive), 100)
+        self.assertEqual([x['RequestName'] for x in naive], [x['RequestName'] for x in indexed])
+
+    @attr('performance')
+    def testPerformance(self):
+        """Time matching 50k elements to 300 sites"""
+        sites = ['T2_XX_Site%s' % x for x in range(300)]
+        thresholds = dict([(x, 2000) for x in sites])
+        siteJobCounts = dict([(x, {1 : 500}) for x in sites])
+        elements = []
+        for i in range(50000):
+            dataSites = random.sample(sites, 5)
+            elements.append(WorkQueueElement(RequestName = 'test%s' % (i / 100),
+                                             Priority = 100000 - i / 100, Jobs = 10,
+                                             Inputs = {'/dataset/RAW#%s' % i : dataSites},
+                                             SiteWhitelist = random.sample(sites, 150)))
+        for name, function in [('naive', naiveMatch), ('indexed', indexedMatch)]:
+            counts = dict([(x, y.copy()) for x, y in siteJobCounts.items()])
+            start = time.time()
+            matches = function(elements, thresholds, counts)
+            print "%s matching: %s elements matched in %.2f seconds" % (name, len(matches),
+                                                                        time.time() - start)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""
+_Wakeup_t_
+
+Unit tests for the worker thread wakeups.
+"""
+
+import logging
+import os
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Configuration import Configuration
+from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
+from WMCore.WorkerThreads.Wakeup import WakeupChannel, wakeupSocketPath, signalWakeup
+from WMQuality.TestInit import TestInit
+
+class FakeComponent(object):
+    """
+    _FakeComponent_
+
+    Holds the config like a component does.
+    """
+    def __init__(self, config):
+        self.config = config
+
+class SubmitterWorker(BaseWorkerThread):
+    """
+    _SubmitterWorker_
+
+    Worker that picks up the jobs created by a test and records how long
+    they waited.
+    """
+    def __init__(self, component, jobs, idleTime):
+        BaseWorkerThread.__init__(self)
+        self.component = component
+        self.jobs = jobs
+        self.idleTime = idleTime
+        self.latencies = []
+        self.stop = threading.Event()
+
+    def algorithm(self, parameters = None):
+        while self.jobs:
+            self.latencies.append(time.time() - self.jobs.pop(0))
+
+    def run(self):
+        """
+        Poll loop of BaseWorkerThread.__call__, without the database
+        """
+        self.initWakeup()
+        while not self.stop.isSet():
+            self.algorithm()
+            self.sleepThread()
+
+class WakeupTest(unittest.TestCase):
+    """
+    _WakeupTest_
+
+    Test the worker thread wakeups.
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a work directory and the config of two components.
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        myThread = threading.currentThread()
+        myThread.dbFactory = None
+        myThread.logger = logging.getLogger()
+
+        self.config = Configuration()
+        self.config.section_("Agent")
+        self.config.Agent.componentName = "JobSubmitter"
+        self.config.component_("JobSubmitter")
+        self.config.JobSubmitter.componentDir = os.path.join(self.testDir, "JobSubmitter")
+        self.config.component_("JobCreator")
+        self.config.JobCreator.componentDir = os.path.join(self.testDir, "JobCreator")
+        os.makedirs(self.config.JobSubmitter.componentDir)
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Remove the work directory.
+        """
+        self.testInit.delWorkDir()
+        return
+
+    def testChannel(self):
+        """
+        _testChannel_
+
+        Verify that a channel wakes up on a signal and only then.
+        """
+        path = wakeupSocketPath(self.config, "JobSubmitter")
+        self.assertEqual(path, os.path.join(self.testDir, "JobSubmitter", "wakeup.sock"))
+        self.assertEqual(wakeupSocketPath(self.config, "NoComponent"), None)
+
+        # Nobody listens yet
+        self.assertFalse(signalWakeup(path))
+        self.assertFalse(signalWakeup(None))
+
+        channel = WakeupChannel(path)
+        try:
+            self.assertFalse(channel.wait(0.1))
+            for _ in range(5):
+                self.assertTrue(signalWakeup(path))
+            startTime = time.time()
+            self.assertTrue(channel.wait(10))
+            self.assertTrue(time.time() - startTime < 1)
+            # All the pending wakeups are consumed at once
+            self.assertFalse(channel.wait(0.1))
+        finally:
+            channel.close()
+        self.assertFalse(os.path.exists(path))
+        return
+
+    def testWorkerWakeup(self):
+        """
+        _testWorkerWakeup_
+
+        Verify that a worker only listens for wakeups if configured to and
+        that a wakeup cuts its sleep short.
+        """
+        jobs = []
+        worker = SubmitterWorker(FakeComponent(self.config), jobs, idleTime = 30)
+        worker.initWakeup()
+        self.assertEqual(worker.wakeupChannel, None)
+
+        self.config.JobSubmitter.useWakeup = True
+        creator = SubmitterWorker(FakeComponent(self.config), [], idleTime = 30)
+        thread = threading.Thread(target = worker.run)
+        thread.start()
+        try:
+            time.sleep(0.2)
+            self.assertNotEqual(worker.wakeupChannel, None)
+            jobs.append(time.time())
+            self.assertTrue(creator.wakeupComponent("JobSubmitter"))
+            time.sleep(0.5)
+            self.assertEqual(len(worker.latencies), 1)
+            self.assertTrue(worker.latencies[0] < 0.5)
+        finally:
+            worker.stop.set()
+            creator.wakeupComponent("JobSubmitter")
+            thread.join()
+        return
+
+    def testWakeupWithoutComponent(self):
+        """
+        _testWakeupWithoutComponent_
+
+        Verify that a worker built without a component, like the pollers in
+        the unit tests, wakes up components with its own config and never
+        fails doing it.
+        """
+        worker = BaseWorkerThread()
+        self.assertEqual(worker.component, None)
+        self.assertFalse(worker.wakeupComponent("JobSubmitter"))
+
+        channel = WakeupChannel(wakeupSocketPath(self.config, "JobSubmitter"))
+        try:
+            worker.config = self.config
+            self.assertTrue(worker.wakeupComponent("JobSubmitter"))
+            self.assertTrue(channel.wait(1))
+            self.assertFalse(worker.wakeupComponent("NoComponent"))
+        finally:
+            channel.close()
+        return
+
+    @attr('performance')
+    def testLatency(self):
+        """
+        _testLatency_
+
+        Measure the time between a job being created and picked up for
+        submission, with and without wakeups.
+        """
+        nJobs = 10
+        idleTime = 2
+        for useWakeup in [False, True]:
+            self.config.JobSubmitter.useWakeup = useWakeup
+            jobs = []
+            worker = SubmitterWorker(FakeComponent(self.config), jobs, idleTime)
+            creator = SubmitterWorker(FakeComponent(self.config), [], idleTime)
+            thread = threading.Thread(target = worker.run)
+            thread.start()
+            try:
+                for i in range(nJobs):
+                    time.sleep(0.37 * (i % 4) + 0.1)
+                    jobs.append(time.time())
+                    creator.wakeupComponent("JobSubmitter")
+                while len(worker.latencies) < nJobs:
+                    time.sleep(0.1)
+            finally:
+                worker.stop.set()
+                creator.wakeupComponent("JobSubmitter")
+                thread.join()
+            print("\n  useWakeup=%s, idleTime=%i secs: creation to submit latency average %.3f secs, max %.3f secs" % \
+                  (useWakeup, idleTime, sum(worker.latencies) / nJobs, max(worker.latencies)))
+        return
+
+if __name__ == '__main__':
+    unittest.main()